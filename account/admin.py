@@ -1,7 +1,21 @@
 from django.contrib import admin
-from .models import Profile
+from .models import ApiKey, Profile
 
 @admin.register(Profile)
 class ProfileAdmin(admin.ModelAdmin):
     list_display = ['user', 'date_of_birth', 'photo']
-    raw_id_fields = ['user']
\ No newline at end of file
+    raw_id_fields = ['user']
+
+
+@admin.register(ApiKey)
+class ApiKeyAdmin(admin.ModelAdmin):
+    list_display = ['prefix', 'user', 'name', 'is_active', 'rate_limit',
+                    'request_count', 'last_used_at', 'expires_at']
+    list_filter = ['is_active']
+    search_fields = ['prefix', 'name', 'user__username', 'user__email']
+    raw_id_fields = ['user']
+    # ключи создаются командой create_api_key: ключ целиком виден только там
+    readonly_fields = ['prefix', 'key_hash', 'created_at', 'request_count', 'last_used_at']
+
+    def has_add_permission(self, request):
+        return False
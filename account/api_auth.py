@@ -0,0 +1,331 @@
+'''
+Аутентификация машинного API (/api/) по ключу, без сессии и CSRF.
+
+Ключ: "<prefix>.<secret>", передаётся в заголовке
+"Authorization: Bearer <ключ>" или "X-Api-Key: <ключ>". В базе — только
+prefix и SHA-256 от ключа (секрет случайный, 256 бит — медленный хеш
+не нужен).
+
+Проверка идёт через кэш в памяти процесса (prefix -> хеш, пользователь,
+лимит) с TTL ACCOUNT_API_KEY_CACHE_TTL секунд, так что на горячем пути
+запросов к БД нет. Отозванный/изменённый ключ сбрасывается из кэша
+сигналом сразу в этом процессе, в остальных воркерах — по истечении TTL.
+
+Лимит — запросов в минуту на ключ (токен-бакет, свой у каждого воркера).
+Счётчик запросов и last_used_at копятся в памяти и пишутся в БД не чаще
+раза в ACCOUNT_API_USAGE_FLUSH секунд.
+'''
+import hashlib
+import hmac
+import secrets
+import threading
+import time
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.http import JsonResponse
+from django.middleware.csrf import CsrfViewMiddleware
+from django.utils import timezone
+
+from .models import ApiKey
+
+PREFIX_BYTES = 4
+SECRET_BYTES = 32
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def hash_key(raw_key):
+    return hashlib.sha256(raw_key.encode()).hexdigest()
+
+
+def generate_key():
+    '''
+    Новый ключ: (ключ целиком, prefix, хеш). Ключ показывается один раз
+    '''
+    prefix = secrets.token_hex(PREFIX_BYTES)
+    raw_key = f'{prefix}.{secrets.token_urlsafe(SECRET_BYTES)}'
+    return raw_key, prefix, hash_key(raw_key)
+
+
+def create_api_key(user, name='', rate_limit=0, expires_at=None):
+    '''
+    Создаёт ключ пользователю. Возвращает (ApiKey, ключ целиком)
+    '''
+    raw_key, prefix, key_hash = generate_key()
+    api_key = ApiKey.objects.create(
+        user=user,
+        name=name,
+        prefix=prefix,
+        key_hash=key_hash,
+        rate_limit=rate_limit,
+        expires_at=expires_at,
+    )
+    return api_key, raw_key
+
+
+# ---------------------
+# КЭШ КЛЮЧЕЙ
+# ---------------------
+
+class _CachedKey:
+    __slots__ = ('key_id', 'key_hash', 'user', 'rate_limit', 'expires_at')
+
+    def __init__(self, api_key):
+        self.key_id = api_key.pk
+        self.key_hash = api_key.key_hash
+        self.user = api_key.user
+        self.rate_limit = api_key.rate_limit or int(_setting('ACCOUNT_API_RATE_LIMIT', 60))
+        self.expires_at = api_key.expires_at
+
+
+_lock = threading.Lock()
+# prefix -> (годен до, _CachedKey или None); отсутствие ключа тоже кэшируем,
+# чтобы перебор префиксов не бил в БД
+_keys = {}
+NEGATIVE_TTL = 5.0
+# key_id -> [токены, время последнего пополнения]
+_buckets = {}
+# key_id -> число запросов с последней записи в БД
+_usage = {}
+_last_flush = time.monotonic()
+
+
+def _split(raw_key):
+    prefix, sep, secret = raw_key.partition('.')
+    if not sep or not secret or len(prefix) != PREFIX_BYTES * 2:
+        return None
+    return prefix
+
+
+def _cached(prefix):
+    '''(найден в кэше, запись). Без обращения к БД'''
+    with _lock:
+        cached = _keys.get(prefix)
+        if cached is not None:
+            if cached[0] > time.monotonic():
+                return True, cached[1]
+            del _keys[prefix]
+    return False, None
+
+
+def _load(prefix):
+    ttl = float(_setting('ACCOUNT_API_KEY_CACHE_TTL', 60))
+    api_key = (
+        ApiKey.objects.select_related('user')
+        .filter(prefix=prefix, is_active=True, user__is_active=True)
+        .first()
+    )
+    if api_key is not None:
+        entry = _CachedKey(api_key)
+    else:
+        # отсутствие ключа помним недолго: его могут как раз создавать
+        entry, ttl = None, min(ttl, NEGATIVE_TTL)
+    with _lock:
+        _keys[prefix] = (time.monotonic() + ttl, entry)
+    return entry
+
+
+def _verify(entry, raw_key):
+    if entry is None or not hmac.compare_digest(entry.key_hash, hash_key(raw_key)):
+        return False
+    return entry.expires_at is None or entry.expires_at > timezone.now()
+
+
+def invalidate(prefix=None):
+    '''Сбросить ключ из кэша (или весь кэш)'''
+    with _lock:
+        if prefix is None:
+            _keys.clear()
+        else:
+            _keys.pop(prefix, None)
+
+
+@receiver([post_save, post_delete], sender=ApiKey)
+def _api_key_changed(sender, instance, **kwargs):
+    invalidate(instance.prefix)
+
+
+# ---------------------
+# ЛИМИТЫ И СЧЁТЧИКИ
+# ---------------------
+
+def _take_token(entry):
+    '''
+    Токен-бакет на ключ: rate_limit запросов в минуту, всплеск до rate_limit.
+    Возвращает 0, если запрос можно выполнять, иначе через сколько секунд повторить.
+    Лимит 0 (и в ключе, и в настройках) — без ограничения
+    '''
+    rate = entry.rate_limit / 60.0
+    now = time.monotonic()
+    with _lock:
+        if rate <= 0:
+            _usage[entry.key_id] = _usage.get(entry.key_id, 0) + 1
+            return 0
+        bucket = _buckets.get(entry.key_id)
+        if bucket is None:
+            bucket = _buckets[entry.key_id] = [float(entry.rate_limit), now]
+        tokens = min(float(entry.rate_limit), bucket[0] + (now - bucket[1]) * rate)
+        bucket[1] = now
+        if tokens >= 1.0:
+            bucket[0] = tokens - 1.0
+            _usage[entry.key_id] = _usage.get(entry.key_id, 0) + 1
+            return 0
+        bucket[0] = tokens
+    return max(1, int((1.0 - tokens) / rate) + 1)
+
+
+def _pending_usage():
+    '''Забирает накопленные счётчики, если подошло время записи'''
+    global _last_flush
+    interval = float(_setting('ACCOUNT_API_USAGE_FLUSH', 30))
+    now = time.monotonic()
+    with _lock:
+        if now - _last_flush < interval or not _usage:
+            return None
+        pending = dict(_usage)
+        _usage.clear()
+        _last_flush = now
+    return pending
+
+
+def flush_usage(pending=None):
+    '''Записывает счётчики использования в БД (по UPDATE на ключ)'''
+    if pending is None:
+        with _lock:
+            pending = dict(_usage)
+            _usage.clear()
+    now = timezone.now()
+    for key_id, count in pending.items():
+        ApiKey.objects.filter(pk=key_id).update(
+            request_count=F('request_count') + count,
+            last_used_at=now,
+        )
+
+
+def _flush_due():
+    interval = float(_setting('ACCOUNT_API_USAGE_FLUSH', 30))
+    return bool(_usage) and time.monotonic() - _last_flush >= interval
+
+
+def _maybe_flush():
+    pending = _pending_usage()
+    if pending:
+        flush_usage(pending)
+
+
+# ---------------------
+# ДЕКОРАТОР
+# ---------------------
+
+def _raw_key(request):
+    header = request.headers.get('Authorization', '')
+    if header[:7].lower() == 'bearer ':
+        return header[7:].strip()
+    return request.headers.get('X-Api-Key', '').strip()
+
+
+def _unauthorized(message):
+    response = JsonResponse({'success': False, 'error': message}, status=401)
+    response['WWW-Authenticate'] = 'Bearer'
+    return response
+
+
+def _rate_limited(retry_after):
+    response = JsonResponse(
+        {'success': False, 'error': 'Превышен лимит запросов для ключа'},
+        status=429
+    )
+    response['Retry-After'] = str(retry_after)
+    return response
+
+
+def _check(request, entry, raw_key):
+    '''Ответ-отказ или None, если ключ годен (тогда request.user/api_key заполнены)'''
+    if not _verify(entry, raw_key):
+        return _unauthorized('Неверный или просроченный API-ключ')
+    retry_after = _take_token(entry)
+    if retry_after:
+        return _rate_limited(retry_after)
+    request.user = entry.user
+    request.api_key = entry
+    return None
+
+
+def _csrf_rejected(request):
+    '''
+    Проверка CSRF для входа по сессии: такой запрос браузер шлёт сам,
+    с cookie пользователя. Ответ-отказ или None
+    '''
+    return CsrfViewMiddleware(lambda r: None).process_view(request, None, (), {})
+
+
+def api_key_required(view=None, *, allow_session=False):
+    '''
+    Декоратор view машинного API: нужен действующий API-ключ.
+    allow_session=True — без ключа пускаем и вошедшего пользователя
+    (страницы сайта, которые сами зовут /api/ из браузера).
+    Ставить вместе с @csrf_exempt: с ключом CSRF не нужен, а вход по
+    сессии декоратор проверяет на CSRF сам (небезопасные методы — с X-CSRFToken).
+    '''
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                raw_key = _raw_key(request)
+                if not raw_key:
+                    if allow_session and (await request.auser()).is_authenticated:
+                        rejected = await sync_to_async(_csrf_rejected)(request)
+                        if rejected is not None:
+                            return rejected
+                        return await view(request, *args, **kwargs)
+                    return _unauthorized('Нужен API-ключ')
+                prefix = _split(raw_key)
+                if prefix is None:
+                    return _unauthorized('Неверный или просроченный API-ключ')
+                found, entry = _cached(prefix)
+                if not found:
+                    entry = await sync_to_async(_load)(prefix)
+                denied = _check(request, entry, raw_key)
+                if denied is not None:
+                    return denied
+                if _flush_due():
+                    await sync_to_async(_maybe_flush)()
+                return await view(request, *args, **kwargs)
+
+            return async_wrapper
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            raw_key = _raw_key(request)
+            if not raw_key:
+                if allow_session and request.user.is_authenticated:
+                    rejected = _csrf_rejected(request)
+                    if rejected is not None:
+                        return rejected
+                    return view(request, *args, **kwargs)
+                return _unauthorized('Нужен API-ключ')
+            prefix = _split(raw_key)
+            if prefix is None:
+                return _unauthorized('Неверный или просроченный API-ключ')
+            found, entry = _cached(prefix)
+            if not found:
+                entry = _load(prefix)
+            denied = _check(request, entry, raw_key)
+            if denied is not None:
+                return denied
+            _maybe_flush()
+            return view(request, *args, **kwargs)
+
+        return wrapper
+
+    if view is not None:
+        return decorator(view)
+    return decorator
+
@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class AccountConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'account'
+
+
+    def ready(self):
+        # сброс кэша API-ключей по сигналам ApiKey
+        from . import api_auth  # noqa: F401
@@ -0,0 +1,60 @@
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+from django.utils import timezone
+
+from account.api_auth import create_api_key, flush_usage
+from account.models import ApiKey
+
+
+class Command(BaseCommand):
+    help = (
+        "Выпуск API-ключа для /api/ (ключ печатается один раз, в базе только хеш). "
+        "--revoke PREFIX — отозвать ключ, --list — ключи пользователя."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("user", nargs="?", help="username или email")
+        parser.add_argument("--name", default="", help="Подпись ключа (какая интеграция)")
+        parser.add_argument("--rate-limit", type=int, default=0,
+                            help="Запросов в минуту (0 — ACCOUNT_API_RATE_LIMIT)")
+        parser.add_argument("--days", type=int, default=0, help="Срок действия, дней (0 — бессрочно)")
+        parser.add_argument("--revoke", metavar="PREFIX", help="Отозвать ключ по префиксу")
+        parser.add_argument("--list", action="store_true", help="Показать ключи пользователя")
+
+    def handle(self, *args, **opts):
+        if opts["revoke"]:
+            updated = ApiKey.objects.filter(prefix=opts["revoke"]).update(is_active=False)
+            if not updated:
+                raise CommandError(f"Нет ключа {opts['revoke']}")
+            self.stdout.write(
+                f"Ключ {opts['revoke']} отозван "
+                f"(воркеры перестанут его принимать в пределах ACCOUNT_API_KEY_CACHE_TTL)"
+            )
+            return
+
+        if not opts["user"]:
+            raise CommandError("Укажите пользователя")
+        user = User.objects.filter(Q(username=opts["user"]) | Q(email=opts["user"])).first()
+        if user is None:
+            raise CommandError(f"Нет пользователя {opts['user']}")
+
+        if opts["list"]:
+            flush_usage()
+            for key in user.api_keys.all():
+                state = "активен" if key.is_active else "отозван"
+                self.stdout.write(
+                    f"{key.prefix}  {key.name or '-'}  {state}  "
+                    f"запросов {key.request_count}  последний {key.last_used_at or '-'}"
+                )
+            return
+
+        expires_at = timezone.now() + timedelta(days=opts["days"]) if opts["days"] else None
+        api_key, raw_key = create_api_key(
+            user, name=opts["name"], rate_limit=opts["rate_limit"], expires_at=expires_at
+        )
+        self.stdout.write(f"Ключ {api_key.prefix} для {user.username}:")
+        self.stdout.write(raw_key)
+        self.stdout.write("Сохраните его сейчас — повторно показать нельзя.")
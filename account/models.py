@@ -13,4 +13,32 @@ class Profile(models.Model):
     )
 
     def __str__(self):
-        return f'Profile of {self.user.username}'
\ No newline at end of file
+        return f'Profile of {self.user.username}'
+
+class ApiKey(models.Model):
+    '''
+    Ключ машинного API (/api/). Сам ключ не хранится — только префикс
+    (по нему ищем) и SHA-256 от ключа целиком. См. account/api_auth.py
+    '''
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='api_keys'
+    )
+    name = models.CharField(max_length=100, blank=True)
+    prefix = models.CharField(max_length=16, unique=True)
+    key_hash = models.CharField(max_length=64)
+    # запросов в минуту; 0 — ACCOUNT_API_RATE_LIMIT из настроек
+    rate_limit = models.PositiveIntegerField(default=0)
+    is_active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(blank=True, null=True)
+    # счётчики пишутся пачками, не на каждый запрос
+    request_count = models.PositiveBigIntegerField(default=0)
+    last_used_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f'{self.prefix} ({self.user.username})'
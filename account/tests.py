@@ -1,3 +1,124 @@
-from django.test import TestCase
+from datetime import timedelta
 
-# Create your tests here.
+from django.contrib.auth.models import AnonymousUser, User
+from django.http import JsonResponse
+from django.middleware.csrf import _get_new_csrf_string, _mask_cipher_secret
+from django.test import RequestFactory, TestCase
+from django.utils import timezone
+
+from . import api_auth
+from .api_auth import api_key_required, create_api_key
+
+
+@api_key_required
+def key_view(request):
+    return JsonResponse({'user': request.user.username})
+
+
+@api_key_required(allow_session=True)
+def session_view(request):
+    return JsonResponse({'user': request.user.username})
+
+
+class ApiKeyRequiredTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('robot', password='x')
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        api_auth.invalidate()
+        api_auth._buckets.clear()
+        api_auth._usage.clear()
+        self.api_key, self.raw_key = create_api_key(self.user, rate_limit=0)
+
+    def _get(self, view=key_view, key=None, **extra):
+        if key:
+            extra['HTTP_AUTHORIZATION'] = f'Bearer {key}'
+        request = self.factory.get('/api/x/', **extra)
+        request.user = AnonymousUser()
+        return view(request)
+
+    def test_valid_key(self):
+        response = self._get(key=self.raw_key)
+        self.assertEqual(response.status_code, 200)
+        self.assertJSONEqual(response.content, {'user': 'robot'})
+
+    def test_x_api_key_header(self):
+        self.assertEqual(self._get(HTTP_X_API_KEY=self.raw_key).status_code, 200)
+
+    def test_missing_key(self):
+        response = self._get()
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response['WWW-Authenticate'], 'Bearer')
+
+    def test_wrong_secret(self):
+        prefix = self.raw_key.split('.')[0]
+        self.assertEqual(self._get(key=f'{prefix}.wrong').status_code, 401)
+
+    def test_malformed_key(self):
+        self.assertEqual(self._get(key='no-dot').status_code, 401)
+
+    def test_expired_key(self):
+        self.api_key.expires_at = timezone.now() - timedelta(minutes=1)
+        self.api_key.save()
+        self.assertEqual(self._get(key=self.raw_key).status_code, 401)
+
+    def test_revoke_invalidates_cache(self):
+        self.assertEqual(self._get(key=self.raw_key).status_code, 200)
+        self.api_key.is_active = False
+        self.api_key.save()
+        self.assertEqual(self._get(key=self.raw_key).status_code, 401)
+
+    def test_cached_key_skips_database(self):
+        self._get(key=self.raw_key)
+        with self.settings(ACCOUNT_API_USAGE_FLUSH=3600), self.assertNumQueries(0):
+            self.assertEqual(self._get(key=self.raw_key).status_code, 200)
+
+    def test_rate_limit(self):
+        self.api_key.rate_limit = 2
+        self.api_key.save()
+        statuses = [self._get(key=self.raw_key) for _ in range(3)]
+        self.assertEqual([r.status_code for r in statuses], [200, 200, 429])
+        self.assertGreaterEqual(int(statuses[-1]['Retry-After']), 1)
+
+    def test_zero_rate_limit_is_unlimited(self):
+        with self.settings(ACCOUNT_API_RATE_LIMIT=0):
+            api_auth.invalidate()
+            for _ in range(5):
+                self.assertEqual(self._get(key=self.raw_key).status_code, 200)
+
+
+class SessionFallbackTests(TestCase):
+    '''Вход по сессии без ключа — обычный браузерный запрос, с проверкой CSRF'''
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('browser', password='x')
+
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def _post(self, user, token=None):
+        extra = {}
+        secret = _get_new_csrf_string()
+        if token:
+            extra['HTTP_X_CSRFTOKEN'] = _mask_cipher_secret(secret)
+        request = self.factory.post('/api/x/', data='{}', content_type='text/plain', **extra)
+        request.COOKIES['csrftoken'] = secret
+        request.user = user
+        return session_view(request)
+
+    def test_get_allowed(self):
+        request = self.factory.get('/api/x/')
+        request.user = self.user
+        self.assertEqual(session_view(request).status_code, 200)
+
+    def test_post_without_csrf_token_rejected(self):
+        self.assertEqual(self._post(self.user).status_code, 403)
+
+    def test_post_with_csrf_token(self):
+        self.assertEqual(self._post(self.user, token=True).status_code, 200)
+
+    def test_anonymous_rejected(self):
+        self.assertEqual(self._post(AnonymousUser(), token=True).status_code, 401)
@@ -14,3 +14,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'datas.settings')
 
 application = get_asgi_application()
+
+# Лимит размера загрузки до того, как Django спулит тело (см. documents/uploads.py)
+from documents.uploads import UploadSizeLimit  # noqa: E402
+
+application = UploadSizeLimit(application)
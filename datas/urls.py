@@ -1,7 +1,11 @@
+import re
+from urllib.parse import urlsplit
+
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, include, re_path
 from django.conf import settings
-from django.conf.urls.static import static
+
+from documents.media import protected_media
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -9,6 +13,10 @@ urlpatterns = [
     path('account/', include('account.urls')),
 ]
 
-# Для разработки - отдача медиа файлов
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
+# Медиа — через проверку доступа (documents/media.py), и в разработке, и в проде:
+# в проде view только проверяет права, а байты отдаёт front-сервер (X-Accel-Redirect)
+if not urlsplit(settings.MEDIA_URL).netloc:
+    urlpatterns += [
+        re_path(r'^%s(?P<path>.+)$' % re.escape(settings.MEDIA_URL.lstrip('/')),
+                protected_media, name='protected_media'),
+    ]
@@ -21,7 +21,7 @@ class DocumentAdmin(admin.ModelAdmin):
     has_photo.short_description = 'Фото'
 
     fieldsets = (
-        ('Загруженный файл', {'fields': ('pdf_file',)}),
+        ('Загруженный файл', {'fields': ('pdf_file', 'jpg_file')}),
         ('Личные данные', {
             'fields': ('last_name', 'first_name', 'patronymic', 'birth_date', 'iin', 'birth_place', 'nationality')
         }),
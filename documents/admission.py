@@ -0,0 +1,258 @@
+# admission.py
+"""
+Ограничение одновременных тяжёлых запросов (OCR и PDF-экспорт).
+
+Внутри процесса — DOCUMENTS_MAX_CONCURRENT слотов и очередь ожидания
+не длиннее DOCUMENTS_MAX_QUEUE; кто не влез в очередь или не дождался
+слота за DOCUMENTS_QUEUE_TIMEOUT секунд — получает 429 с Retry-After.
+
+Если задан DOCUMENTS_ADMISSION_LOCK_DIR, слоты ещё и общие для всех
+воркеров на машине: слот = файл slot-N.lock под flock (ядро само снимет
+блокировку, если воркер умер). Число общих слотов —
+DOCUMENTS_MAX_CONCURRENT_HOST (по умолчанию число ядер).
+
+Глубина очереди, занятые слоты и отказы — в /metrics.
+"""
+import asyncio
+import math
+import os
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from functools import wraps
+from typing import Optional
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse
+
+from .metrics import inc, observe, set_gauge
+
+try:
+    import fcntl
+except ImportError:  # Windows — только внутрипроцессный лимит
+    fcntl = None
+
+# Шаг опроса файловых слотов
+LOCK_POLL_SECONDS = 0.05
+
+
+class Overloaded(Exception):
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class _HostSlots:
+    """Межпроцессный семафор на flock: занятый слот — удерживаемый файл."""
+
+    def __init__(self, directory: str, slots: int):
+        self.directory = directory
+        self.slots = slots
+        os.makedirs(directory, exist_ok=True)
+
+    def try_acquire(self) -> Optional[int]:
+        for n in range(self.slots):
+            fd = os.open(os.path.join(self.directory, f"slot-{n}.lock"), os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return fd
+            except OSError:
+                os.close(fd)
+        return None
+
+    def acquire(self, deadline: float) -> Optional[int]:
+        while True:
+            fd = self.try_acquire()
+            if fd is not None or time.monotonic() >= deadline:
+                return fd
+            time.sleep(LOCK_POLL_SECONDS)
+
+    @staticmethod
+    def release(fd: int):
+        try:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+        finally:
+            os.close(fd)
+
+
+class Limiter:
+    def __init__(self, slots: int, max_queue: int, timeout: float, host_slots: Optional[_HostSlots] = None):
+        self.slots = slots
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.host_slots = host_slots
+        self.in_flight = 0
+        self.waiting = 0
+        # скользящее среднее времени удержания слота — для Retry-After
+        self.avg_hold = 5.0
+        self._cond = threading.Condition()
+
+    def _publish(self):
+        set_gauge("documents_admission_in_flight", self.in_flight)
+        set_gauge("documents_admission_queue_depth", self.waiting)
+
+    def retry_after(self) -> int:
+        """Оценка, через сколько секунд освободится место: очередь / слоты * среднее время."""
+        backlog = (self.waiting + self.in_flight) / max(1, self.slots)
+        return max(1, math.ceil(backlog * self.avg_hold))
+
+    def acquire(self, endpoint: str) -> Optional[int]:
+        """Занимает слот или бросает Overloaded. Возвращает fd межпроцессного слота (или None)."""
+        t0 = time.monotonic()
+        deadline = t0 + self.timeout
+        with self._cond:
+            if self.in_flight >= self.slots and self.waiting >= self.max_queue:
+                self._reject(endpoint, "queue_full")
+            self.waiting += 1
+            self._publish()
+            try:
+                while self.in_flight >= self.slots:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._reject(endpoint, "timeout")
+                    self._cond.wait(remaining)
+            finally:
+                self.waiting -= 1
+                self._publish()
+            self.in_flight += 1
+            self._publish()
+
+        fd = None
+        if self.host_slots is not None:
+            fd = self.host_slots.acquire(deadline)
+            if fd is None:
+                self._release_local()
+                self._reject(endpoint, "host_busy")
+
+        observe("documents_admission_wait_seconds", time.monotonic() - t0, endpoint=endpoint)
+        return fd
+
+    def release(self, fd: Optional[int], held: Optional[float] = None):
+        if fd is not None:
+            self.host_slots.release(fd)
+        if held is not None:
+            with self._cond:
+                self.avg_hold = 0.8 * self.avg_hold + 0.2 * held
+        self._release_local()
+
+    def _release_local(self):
+        with self._cond:
+            self.in_flight -= 1
+            self._publish()
+            self._cond.notify()
+
+    def _reject(self, endpoint: str, reason: str):
+        inc("documents_admission_rejected_total", endpoint=endpoint, reason=reason)
+        raise Overloaded(reason, self.retry_after())
+
+    @contextmanager
+    def admit(self, endpoint: str):
+        fd = self.acquire(endpoint)
+        t0 = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(fd, time.monotonic() - t0)
+
+
+_limiter: Optional[Limiter] = None
+_limiter_lock = threading.Lock()
+
+
+def get_limiter() -> Limiter:
+    global _limiter
+    if _limiter is None:
+        with _limiter_lock:
+            if _limiter is None:
+                cpus = os.cpu_count() or 2
+                slots = int(getattr(settings, "DOCUMENTS_MAX_CONCURRENT", cpus))
+                lock_dir = getattr(settings, "DOCUMENTS_ADMISSION_LOCK_DIR", None)
+                host = None
+                if lock_dir and fcntl is not None:
+                    host = _HostSlots(lock_dir, int(getattr(settings, "DOCUMENTS_MAX_CONCURRENT_HOST", cpus)))
+                _limiter = Limiter(
+                    slots=slots,
+                    max_queue=int(getattr(settings, "DOCUMENTS_MAX_QUEUE", slots * 2)),
+                    timeout=float(getattr(settings, "DOCUMENTS_QUEUE_TIMEOUT", 30.0)),
+                    host_slots=host,
+                )
+    return _limiter
+
+
+def overloaded_response(request, exc: Overloaded):
+    message = "Сервер перегружен, повторите запрос позже"
+    if request.path.startswith("/api/"):
+        resp = JsonResponse({"success": False, "error": message, "reason": exc.reason}, status=429)
+    else:
+        resp = HttpResponse(message, status=429, content_type="text/plain; charset=utf-8")
+    resp["Retry-After"] = str(exc.retry_after)
+    return resp
+
+
+@asynccontextmanager
+async def admit_async(endpoint: str):
+    """
+    Слот для async-кода (Overloaded, если не дали). Ожидание идёт в потоке,
+    event loop не блокируется.
+    """
+    limiter = get_limiter()
+    waiter = asyncio.ensure_future(asyncio.to_thread(limiter.acquire, endpoint))
+    try:
+        fd = await asyncio.shield(waiter)
+    except asyncio.CancelledError:
+        # клиент ушёл, пока ждали: поток всё равно займёт слот — сразу отдаём его
+        waiter.add_done_callback(
+            lambda w: w.exception() is None and limiter.release(w.result())
+        )
+        raise
+    t0 = time.monotonic()
+    try:
+        yield
+    finally:
+        limiter.release(fd, time.monotonic() - t0)
+
+
+def admit(endpoint: str):
+    """
+    Слот вокруг тяжёлой части view (Overloaded, если не дали). Загрузки берут
+    его только на OCR — после того как тело прочитано и проверено, иначе
+    медленный клиент держит слот всё время передачи файла.
+    """
+    return get_limiter().admit(endpoint)
+
+
+def admission_controlled(endpoint: str, methods=None):
+    """
+    Декоратор view: тяжёлая часть выполняется только в свободном слоте.
+    methods — только для этих HTTP-методов (форма загрузки по GET слот не занимает).
+    Для async-view ожидание слота идёт в потоке, event loop не блокируется.
+    """
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                if methods and request.method not in methods:
+                    return await view(request, *args, **kwargs)
+                try:
+                    async with admit_async(endpoint):
+                        return await view(request, *args, **kwargs)
+                except Overloaded as exc:
+                    return overloaded_response(request, exc)
+
+            return async_wrapper
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if methods and request.method not in methods:
+                return view(request, *args, **kwargs)
+            try:
+                with get_limiter().admit(endpoint):
+                    return view(request, *args, **kwargs)
+            except Overloaded as exc:
+                return overloaded_response(request, exc)
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,278 @@
+# api.py
+"""
+JSON API чтения документов (для интеграций вместо разбора document_list.html).
+
+GET /api/documents/
+    fields=iin,last_name,...   — какие поля отдать (в запрос идут только они, .only())
+    iin=...                    — точное совпадение
+    test_date_from/test_date_to, created_from/created_to — [from, to)
+    changed_since=<дата>       — изменённые после даты
+    order=-created (по умолчанию, новые сверху) | updated (для синхронизации)
+    limit=50 (не больше DOCUMENTS_API_MAX_LIMIT)
+    cursor=<next_cursor из прошлого ответа>
+GET /api/documents/<pk>/       — один документ, те же fields=
+
+Пагинация keyset: курсор — (значение ключа сортировки, id) последней
+строки, следующая страница — WHERE (key, id) > курсора по индексу, без
+OFFSET. Синхронизация: order=updated, и next_cursor есть всегда, даже
+на пустой странице — клиент периодически повторяет запрос с ним и
+получает только изменённое с прошлого раза. Удаления так не видны.
+updated_at ставит приложение, а не БД в момент коммита: строка со
+штампом раньше уже отданной может стать видна позже. Поэтому order=updated
+отдаёт только строки старше DOCUMENTS_API_SYNC_LAG секунд (по умолчанию
+30) — курсор не уходит дальше now - lag, и такие строки не теряются,
+если транзакция короче лага.
+
+Ответ с ETag (по id и updated_at строк страницы): повторный запрос с
+If-None-Match получает 304 без сериализации. Большие страницы — gzip.
+"""
+import base64
+import hashlib
+import json
+from datetime import datetime, time as dt_time, timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.http import Http404, JsonResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.dateparse import parse_date, parse_datetime
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.gzip import gzip_page
+from django.views.decorators.http import require_safe
+
+from account.api_auth import api_key_required
+
+from .jpg_parser import TEXT_FIELDS
+from .models import Document
+
+DEFAULT_LIMIT = 50
+
+# Поле ответа -> колонки модели, которые для него нужны
+API_FIELDS = {
+    'id': ('id',),
+    'test_date': ('test_date',),
+    'created_at': ('created_at',),
+    'updated_at': ('updated_at',),
+    'sha256': ('sha256',),
+    **{f: (f,) for f in TEXT_FIELDS},
+    'photo': ('photo', 'photo_variants'),
+    'source': ('pdf_file', 'jpg_file'),
+}
+
+# order= -> (колонка, по убыванию ли)
+ORDERS = {
+    '-created': ('created_at', True),
+    'updated': ('updated_at', False),
+}
+
+# Диапазонные фильтры: параметр -> lookup
+RANGE_FILTERS = {
+    'test_date_from': 'test_date__gte',
+    'test_date_to': 'test_date__lt',
+    'created_from': 'created_at__gte',
+    'created_to': 'created_at__lt',
+    'changed_since': 'updated_at__gt',
+}
+
+
+class BadRequest(Exception):
+    pass
+
+
+def max_limit():
+    return int(getattr(settings, 'DOCUMENTS_API_MAX_LIMIT', 500))
+
+
+def sync_lag():
+    return float(getattr(settings, 'DOCUMENTS_API_SYNC_LAG', 30))
+
+
+def _bad_request(message):
+    return JsonResponse({'success': False, 'error': message}, status=400)
+
+
+def _parse_fields(request):
+    raw = request.GET.get('fields')
+    if not raw:
+        return list(API_FIELDS)
+    fields = [f.strip() for f in raw.split(',') if f.strip()]
+    unknown = [f for f in fields if f not in API_FIELDS]
+    if unknown:
+        raise BadRequest(f"Неизвестные поля: {', '.join(unknown)}")
+    return fields
+
+
+def _columns(fields, order_column=None):
+    columns = {'id'}
+    for f in fields:
+        columns.update(API_FIELDS[f])
+    if order_column:
+        columns.add(order_column)
+    return sorted(columns)
+
+
+def _parse_moment(name, value):
+    """Дата или дата-время из параметра (дата — полночь в текущей зоне)."""
+    try:
+        moment = parse_datetime(value)
+        if moment is None:
+            day = parse_date(value)
+            moment = datetime.combine(day, dt_time.min) if day else None
+    except ValueError:
+        moment = None
+    if moment is None:
+        raise BadRequest(f"Неверная дата в {name}: {value}")
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment, timezone.get_current_timezone())
+    return moment
+
+
+def _encode_cursor(order, value, pk):
+    raw = json.dumps([order, value.isoformat(), pk], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def _decode_cursor(cursor, order):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        cursor_order, value, pk = json.loads(raw)
+        moment = datetime.fromisoformat(value)
+        pk = int(pk)
+    except (ValueError, TypeError):
+        raise BadRequest("Неверный cursor")
+    if cursor_order != order:
+        raise BadRequest("cursor выдан для другого order")
+    return moment, pk
+
+
+def _filtered(request):
+    qs = Document.objects.all()
+    iin = request.GET.get('iin')
+    if iin:
+        qs = qs.filter(iin=iin.strip())
+    for param, lookup in RANGE_FILTERS.items():
+        value = request.GET.get(param)
+        if value:
+            qs = qs.filter(**{lookup: _parse_moment(param, value)})
+    return qs
+
+
+def _after_cursor(qs, column, descending, moment, pk):
+    if descending:
+        return qs.filter(Q(**{f'{column}__lt': moment}) | Q(**{column: moment, 'id__lt': pk}))
+    return qs.filter(Q(**{f'{column}__gt': moment}) | Q(**{column: moment, 'id__gt': pk}))
+
+
+def serialize(document, fields):
+    data = {}
+    for f in fields:
+        if f == 'photo':
+            data['photo_url'] = document.photo.url if document.photo else None
+            data['photo_thumb_url'] = document.photo_thumb_url
+        elif f == 'source':
+            source = document.source_file
+            data['source_url'] = source.url if source else None
+        else:
+            data[f] = getattr(document, f)
+    return data
+
+
+def _etag(parts):
+    digest = hashlib.sha1()
+    for part in parts:
+        digest.update(str(part).encode())
+        digest.update(b'\0')
+    return f'"{digest.hexdigest()}"'
+
+
+def _not_modified(request, etag):
+    response = get_conditional_response(request, etag=etag)
+    if response is not None:
+        response['ETag'] = etag
+    return response
+
+
+def _with_etag(response, etag):
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+@gzip_page
+@csrf_exempt
+@require_safe
+@api_key_required(allow_session=True)
+def document_list(request):
+    try:
+        fields = _parse_fields(request)
+        order = request.GET.get('order') or '-created'
+        if order not in ORDERS:
+            raise BadRequest(f"order: одно из {', '.join(ORDERS)}")
+        column, descending = ORDERS[order]
+        try:
+            limit = int(request.GET.get('limit') or DEFAULT_LIMIT)
+        except ValueError:
+            raise BadRequest("limit должен быть числом")
+        limit = max(1, min(limit, max_limit()))
+
+        qs = _filtered(request)
+        if order == 'updated':
+            # ещё не закоммиченные транзакции могли взять штамп раньше этой границы
+            qs = qs.filter(updated_at__lt=timezone.now() - timedelta(seconds=sync_lag()))
+        cursor = request.GET.get('cursor')
+        if cursor:
+            qs = _after_cursor(qs, column, descending, *_decode_cursor(cursor, order))
+    except BadRequest as e:
+        return _bad_request(str(e))
+
+    direction = '-' if descending else ''
+    qs = (
+        qs.only(*_columns(fields + ['updated_at'], column))
+        .order_by(f'{direction}{column}', f'{direction}id')
+    )
+    rows = list(qs[:limit + 1])
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    if rows:
+        last = rows[-1]
+        next_cursor = _encode_cursor(order, getattr(last, column), last.pk)
+    else:
+        # синхронизация: на пустой странице остаёмся на том же месте
+        next_cursor = cursor if order == 'updated' else None
+    if not has_more and order != 'updated':
+        next_cursor = None
+
+    etag = _etag([request.GET.urlencode()] + [f'{d.pk}:{d.updated_at.isoformat()}' for d in rows])
+    not_modified = _not_modified(request, etag)
+    if not_modified is not None:
+        return not_modified
+
+    return _with_etag(JsonResponse({
+        'success': True,
+        'results': [serialize(d, fields) for d in rows],
+        'has_more': has_more,
+        'next_cursor': next_cursor,
+    }), etag)
+
+
+@gzip_page
+@csrf_exempt
+@require_safe
+@api_key_required(allow_session=True)
+def document_detail(request, pk):
+    try:
+        fields = _parse_fields(request)
+    except BadRequest as e:
+        return _bad_request(str(e))
+
+    document = Document.objects.only(*_columns(fields + ['updated_at'])).filter(pk=pk).first()
+    if document is None:
+        raise Http404("Документ не найден")
+
+    etag = _etag([request.GET.urlencode(), document.pk, document.updated_at.isoformat()])
+    not_modified = _not_modified(request, etag)
+    if not_modified is not None:
+        return not_modified
+    return _with_etag(JsonResponse({'success': True, 'data': serialize(document, fields)}), etag)
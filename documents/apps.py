@@ -1,6 +1,15 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class DocumentsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'documents'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+
+        # Прогрев тяжёлых зависимостей (см. documents/warmup.py)
+        if getattr(settings, 'DOCUMENTS_PREWARM', False):
+            from .warmup import prewarm
+            prewarm()
@@ -0,0 +1,101 @@
+# async_views.py
+"""
+Async-версии тяжёлых view для запуска под ASGI (datas/asgi.py).
+
+Тело запроса ASGI-сервер дочитывает асинхронно ещё до вызова view,
+а всё блокирующее (разбор multipart, рендер/OCR, WeasyPrint, ORM)
+уходит в ограниченный пул executor.run_blocking — поток event loop
+не занят, пока работают tesseract и poppler.
+
+Включаются в urls.py настройкой DOCUMENTS_ASYNC_VIEWS = True; логика —
+общая с views.py.
+"""
+from django.contrib import messages
+from django.contrib.auth.decorators import login_required
+from django.http import Http404, JsonResponse
+from django.shortcuts import redirect, render
+from django.views.decorators.csrf import csrf_exempt
+
+from account.api_auth import api_key_required
+
+from .executor import run_blocking
+from .forms import DocumentUploadForm
+from .models import Document
+from .admission import Overloaded, admission_controlled, admit_async, overloaded_response
+from .profiling import profile_request
+from .uploads import streaming_upload
+from .views import (
+    _requested_fields,
+    api_upload_form,
+    api_upload_payload,
+    export_pdf_response,
+    form_error,
+    process_upload,
+    upload_error,
+    upload_result_redirect,
+)
+
+
+def _bound_upload_form(request):
+    return DocumentUploadForm(request.POST, request.FILES)
+
+
+def _api_form_and_fields(request):
+    form = api_upload_form(request)
+    return form, (_requested_fields(request) if form is not None else None)
+
+
+@login_required
+@streaming_upload()
+@profile_request
+async def upload_document(request):
+    if request.method == 'POST':
+        form = await run_blocking(_bound_upload_form, request)
+        if await run_blocking(form.is_valid):
+            try:
+                # слот OCR — только когда файл уже принят и проверен
+                async with admit_async('upload'):
+                    document, extracted = await run_blocking(process_upload, form)
+            except Overloaded as exc:
+                return overloaded_response(request, exc)
+            except Exception as e:
+                messages.error(request, f'Ошибка при обработке документа: {str(e)}')
+                return redirect('upload_document')
+            return upload_result_redirect(request, document, extracted)
+        messages.error(request, upload_error(request) or 'Пожалуйста, исправьте ошибки в форме')
+    else:
+        form = DocumentUploadForm()
+
+    # контекст-процессоры трогают request.user (синхронный ORM) — рендер тоже в пуле
+    return await run_blocking(render, request, 'documents/upload.html', {'form': form})
+
+
+@csrf_exempt
+@api_key_required
+@streaming_upload(csrf=False)
+@profile_request
+async def api_upload_document(request):
+    form, fields = await run_blocking(_api_form_and_fields, request)
+    if form is None:
+        return JsonResponse({'success': False, 'error': upload_error(request) or 'Неправильный запрос'})
+    if not await run_blocking(form.is_valid):
+        return JsonResponse(form_error(form))
+    try:
+        async with admit_async('api_upload'):
+            document, extracted = await run_blocking(process_upload, form, fields)
+    except Overloaded as exc:
+        return overloaded_response(request, exc)
+    except Exception as e:
+        return JsonResponse({'success': False, 'error': str(e)})
+    return JsonResponse(api_upload_payload(document, extracted))
+
+
+@login_required
+@admission_controlled('export_pdf')
+@profile_request
+async def document_export_pdf(request, pk):
+    try:
+        document = await Document.objects.aget(pk=pk)
+    except Document.DoesNotExist:
+        raise Http404("Документ не найден")
+    return await run_blocking(export_pdf_response, request, document)
@@ -0,0 +1,208 @@
+# benchmark.py
+"""
+Прогон размеченного корпуса через извлечение: латентность по стадиям,
+документы/сек и точность по полям. Результат — JSON, который можно
+сравнивать между коммитами.
+"""
+import os
+import platform
+import subprocess
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional
+
+# Поля, которые сравниваем с эталоном (фото не сравнивается)
+DEFAULT_FIELDS = ("last_name", "first_name", "patronymic", "iin")
+
+# ---------------------
+# СТАТИСТИКА
+# ---------------------
+
+def percentile(values: List[float], q: float) -> float:
+    """Перцентиль с линейной интерполяцией, q в [0, 100]."""
+    if not values:
+        return 0.0
+    data = sorted(values)
+    if len(data) == 1:
+        return data[0]
+    pos = (len(data) - 1) * q / 100.0
+    lo = int(pos)
+    hi = min(lo + 1, len(data) - 1)
+    return data[lo] + (data[hi] - data[lo]) * (pos - lo)
+
+
+def summarize(values: List[float]) -> Dict[str, float]:
+    """Сводка по латентности в миллисекундах."""
+    ms = [v * 1000.0 for v in values]
+    return {
+        "count": len(ms),
+        "mean_ms": round(sum(ms) / len(ms), 3) if ms else 0.0,
+        "p50_ms": round(percentile(ms, 50), 3),
+        "p90_ms": round(percentile(ms, 90), 3),
+        "p95_ms": round(percentile(ms, 95), 3),
+        "p99_ms": round(percentile(ms, 99), 3),
+        "max_ms": round(max(ms), 3) if ms else 0.0,
+    }
+
+
+def _norm(value) -> str:
+    return " ".join(str(value or "").split()).casefold()
+
+
+def score_fields(result: Dict, truth: Dict, fields: Iterable[str]) -> Dict[str, bool]:
+    """Точное совпадение (без учёта регистра/пробелов) по каждому полю с эталоном."""
+    return {f: _norm(result.get(f)) == _norm(truth.get(f)) for f in fields if f in truth}
+
+# ---------------------
+# ПРОГОН
+# ---------------------
+
+def _git_revision(cwd: str) -> Optional[str]:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=cwd, capture_output=True, text=True, timeout=5,
+        )
+        return out.stdout.strip() or None
+    except Exception:
+        return None
+
+
+def _tesseract_version() -> Optional[str]:
+    try:
+        import pytesseract
+        return str(pytesseract.get_tesseract_version())
+    except Exception:
+        return None
+
+
+def run_one(sample: Dict, fields: Iterable[str] = DEFAULT_FIELDS) -> Dict:
+    """
+    Один документ через extract_data_from_pdf.
+    Стадии берутся из debug_info["timings"] (мс), плюс общее время.
+    """
+    from .utils import extract_data_from_pdf
+
+    t0 = time.perf_counter()
+    # OCR только сравниваемых полей — остальные не влияют на замер
+    result = extract_data_from_pdf(sample["pdf"], fields=tuple(fields))
+    total = time.perf_counter() - t0
+
+    timings = {
+        stage: ms / 1000.0
+        for stage, ms in result.get("debug_info", {}).get("timings", {}).items()
+    }
+    timings["total"] = total
+
+    return {
+        "id": sample["id"],
+        "timings": timings,
+        "fields": score_fields(result, sample.get("truth", {}), fields),
+        "values": {f: result.get(f, "") for f in fields},
+    }
+
+
+def aggregate(runs: List[Dict], wall_time: float) -> Dict:
+    """Сводит результаты отдельных документов в отчёт."""
+    stages: Dict[str, List[float]] = {}
+    field_hits: Dict[str, List[bool]] = {}
+    docs_ok = 0
+
+    for run in runs:
+        for stage, seconds in run["timings"].items():
+            stages.setdefault(stage, []).append(seconds)
+        for field, ok in run["fields"].items():
+            field_hits.setdefault(field, []).append(ok)
+        if run["fields"] and all(run["fields"].values()):
+            docs_ok += 1
+
+    total_checks = sum(len(v) for v in field_hits.values())
+    total_hits = sum(sum(v) for v in field_hits.values())
+
+    return {
+        "documents": len(runs),
+        "wall_time_s": round(wall_time, 3),
+        "docs_per_sec": round(len(runs) / wall_time, 3) if wall_time > 0 else 0.0,
+        "stages": {stage: summarize(v) for stage, v in stages.items()},
+        "accuracy": {
+            "fields": {f: round(sum(v) / len(v), 4) for f, v in field_hits.items()},
+            "overall": round(total_hits / total_checks, 4) if total_checks else 0.0,
+            "documents_all_correct": round(docs_ok / len(runs), 4) if runs else 0.0,
+        },
+    }
+
+
+def run_benchmark(samples: List[Dict], fields: Iterable[str] = DEFAULT_FIELDS, warmup: int = 1) -> Dict:
+    """
+    Прогоняет корпус последовательно. Первые warmup документов прогреваются
+    (загрузка traineddata и т.п.) и в статистику не попадают.
+    """
+    fields = tuple(fields)
+    for sample in samples[:warmup]:
+        run_one(sample, fields)
+
+    runs = []
+    start = time.perf_counter()
+    for sample in samples:
+        runs.append(run_one(sample, fields))
+    wall = time.perf_counter() - start
+
+    report = aggregate(runs, wall)
+    report["meta"] = {
+        "revision": _git_revision(os.path.dirname(os.path.abspath(__file__))),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "tesseract": _tesseract_version(),
+        "warmup": warmup,
+    }
+    report["runs"] = runs
+    return report
+
+
+def _init_worker():
+    # дочерние процессы при spawn не наследуют настроенный Django
+    import django
+    django.setup()
+
+
+def run_parallel(samples: List[Dict], fields: Iterable[str] = DEFAULT_FIELDS, workers: int = 2) -> Dict:
+    """
+    Прогоняет корпус в пуле процессов (каждый процесс прогревается на своём
+    первом документе, поэтому латентность первых run'ов выше — смотрим p95).
+    """
+    fields = tuple(fields)
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        runs = list(pool.map(run_one, samples, [fields] * len(samples)))
+    wall = time.perf_counter() - start
+
+    report = aggregate(runs, wall)
+    report["meta"] = {
+        "revision": _git_revision(os.path.dirname(os.path.abspath(__file__))),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "tesseract": _tesseract_version(),
+        "workers": workers,
+    }
+    report["runs"] = runs
+    return report
+
+
+def compare(current: Dict, baseline: Dict) -> Dict:
+    """Разница ключевых метрик текущего отчёта относительно базового."""
+    diff = {
+        "docs_per_sec": round(current.get("docs_per_sec", 0) - baseline.get("docs_per_sec", 0), 3),
+        "accuracy_overall": round(
+            current.get("accuracy", {}).get("overall", 0) - baseline.get("accuracy", {}).get("overall", 0), 4
+        ),
+        "stages": {},
+    }
+    for stage, stats in current.get("stages", {}).items():
+        base = baseline.get("stages", {}).get(stage)
+        if not base:
+            continue
+        diff["stages"][stage] = {
+            k: round(stats[k] - base.get(k, 0), 3) for k in ("p50_ms", "p95_ms", "p99_ms")
+        }
+    return diff
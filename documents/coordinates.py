@@ -0,0 +1,56 @@
+# coordinates.py
+"""
+Версии координат ROI.
+
+Версия поля — короткий хеш его рамки из coordinate_config.json (после
+округления, чтобы шум калибровки в последних знаках не считался правкой).
+Парсер пишет версии использованных рамок в debug_info["coordinate_versions"],
+документ хранит их в extraction_meta["coordinates"]. После перекалибровки
+поле документа устарело, если его версия не совпадает с текущей —
+manage.py reocr_fields перечитывает только такие поля.
+"""
+import hashlib
+import json
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence
+
+# Знаков после запятой в долях кадра: 1e-4 ~ 0.2 px на 2000 px
+PRECISION = 4
+
+
+def box_version(box: Sequence[float]) -> str:
+    rounded = [round(float(v), PRECISION) for v in box]
+    return hashlib.sha1(json.dumps(rounded).encode()).hexdigest()[:12]
+
+
+def field_versions(coordinates: Mapping[str, Sequence[float]],
+                   fields: Optional[Iterable[str]] = None) -> Dict[str, str]:
+    """{поле: версия} для полей, у которых есть рамка (fields=None — для всех)."""
+    names = coordinates.keys() if fields is None else fields
+    return {f: box_version(coordinates[f]) for f in names if f in coordinates}
+
+
+def changed_fields(old: Mapping[str, Sequence[float]], new: Mapping[str, Sequence[float]]) -> List[str]:
+    """Поля, рамка которых добавлена, удалена или сдвинута."""
+    old_v, new_v = field_versions(old), field_versions(new)
+    return sorted(f for f in set(old_v) | set(new_v) if old_v.get(f) != new_v.get(f))
+
+
+def stale_fields(document, current: Mapping[str, str], fields: Optional[Iterable[str]] = None,
+                 include_unversioned: bool = False) -> List[str]:
+    """
+    Поля документа, распознанные не с текущими рамками.
+    Поля без записанной версии (документы до версионирования) —
+    только при include_unversioned.
+    """
+    stored = (document.extraction_meta or {}).get("coordinates", {})
+    names = current.keys() if fields is None else fields
+    stale = []
+    for f in names:
+        if f not in current:
+            continue
+        if f not in stored:
+            if include_unversioned:
+                stale.append(f)
+        elif stored[f] != current[f]:
+            stale.append(f)
+    return stale
@@ -0,0 +1,113 @@
+# derivatives.py
+"""
+Фото из документа в нескольких размерах: миниатюра для списка, размер
+для карточки и версия для печати (PDF-экспорт). Все три делаются за один
+проход из уже декодированного кропа страницы.
+
+Имена детерминированы: photos/<sha1 пикселей кропа>_<размер>.<ext> —
+одинаковый кроп даёт те же файлы, повторная запись пропускается.
+Удаление — documents/signals.py (вместе с документом).
+"""
+import hashlib
+import io
+import logging
+import re
+from typing import Dict, Iterable, Optional, Tuple
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, features
+
+logger = logging.getLogger(__name__)
+
+PHOTO_DIR = "photos"
+
+# Размер -> (длинная сторона в px, качество). Больше исходного кропа не растягиваем.
+SIZES = {
+    "print": (1200, 90),
+    "detail": (600, 85),
+    "thumb": (250, 75),
+}
+
+# Основной файл (Document.photo) — для печати, всегда JPEG (WeasyPrint)
+MAIN_SIZE = "print"
+
+# Длина ключа (начало sha1 пикселей) и разбор имени размера: photos/<ключ>_<размер>.<ext>
+KEY_LENGTH = 20
+DERIVATIVE_NAME = re.compile(
+    rf"^{PHOTO_DIR}/(?P<key>[0-9a-f]{{{KEY_LENGTH}}})_(?P<size>[a-z]+)\.(?P<ext>[a-z]+)$"
+)
+
+
+def main_name(key: str) -> str:
+    """Имя основного файла (Document.photo) для ключа кропа (он всегда JPEG)."""
+    return f"{PHOTO_DIR}/{key}_{MAIN_SIZE}.jpg"
+
+
+def use_webp() -> bool:
+    """DOCUMENTS_PHOTO_WEBP: миниатюра и размер для карточки в WebP (если Pillow умеет)."""
+    return bool(getattr(settings, "DOCUMENTS_PHOTO_WEBP", False)) and features.check("webp")
+
+
+def _encode(img: Image.Image, fmt: str, quality: int) -> bytes:
+    bio = io.BytesIO()
+    if fmt == "WEBP":
+        img.save(bio, format="WEBP", quality=quality, method=4)
+    else:
+        img.save(bio, format="JPEG", quality=quality, optimize=True, progressive=True)
+    return bio.getvalue()
+
+
+class PhotoDerivatives:
+    """Закодированные размеры одного кропа; store() кладёт их в хранилище."""
+
+    def __init__(self, key: str, files: Dict[str, Tuple[str, bytes]]):
+        self.key = key
+        self.files = files  # размер -> (имя в хранилище, байты)
+
+    @classmethod
+    def from_image(cls, region: Image.Image, webp: Optional[bool] = None) -> "PhotoDerivatives":
+        region = region.convert("RGB")
+        key = hashlib.sha1(region.tobytes()).hexdigest()[:KEY_LENGTH]
+        webp = use_webp() if webp is None else webp
+
+        files = {}
+        current = region
+        # от большего к меньшему: каждый размер уменьшается из предыдущего
+        for size, (side, quality) in SIZES.items():
+            current = current.copy()
+            current.thumbnail((side, side), Image.Resampling.LANCZOS)
+            fmt = "WEBP" if webp and size != MAIN_SIZE else "JPEG"
+            ext = "webp" if fmt == "WEBP" else "jpg"
+            files[size] = (f"{PHOTO_DIR}/{key}_{size}.{ext}", _encode(current, fmt, quality))
+        return cls(key, files)
+
+    @property
+    def nbytes(self) -> Dict[str, int]:
+        return {size: len(data) for size, (_, data) in self.files.items()}
+
+    def store(self, storage=None) -> Dict[str, str]:
+        """Сохраняет все размеры (существующие не перезаписываются). Возвращает размер -> имя."""
+        storage = storage or default_storage
+        names = {}
+        for size, (name, data) in self.files.items():
+            if not storage.exists(name):
+                saved = storage.save(name, ContentFile(data))
+                if saved != name:
+                    logger.warning("Photo derivative stored as %s instead of %s", saved, name)
+                name = saved
+            names[size] = name
+        return names
+
+
+def delete_files(names: Iterable[str], storage=None):
+    """Удаляет файлы из хранилища, ошибки только логируются."""
+    storage = storage or default_storage
+    for name in names:
+        if not name:
+            continue
+        try:
+            storage.delete(name)
+        except Exception:
+            logger.warning("Failed to delete %s", name, exc_info=True)
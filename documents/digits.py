@@ -0,0 +1,190 @@
+# digits.py
+"""
+Быстрый распознаватель ИИН без tesseract.
+
+ИИН — всегда 12 печатных цифр одним шрифтом в известном месте, поэтому:
+1) бинаризуем ROI (порог Оцу),
+2) режем на столбцы-символы по вертикальной проекции,
+3) каждый глиф сравниваем (нормированная корреляция) с эталонами цифр,
+   отрисованными из шрифтов static/fonts.
+
+Только PIL, без numpy/GPU. Результат проверяется контрольной суммой
+(при необходимости — перебором через iin.decode_iin); если распознаватель
+не уверен, вызывающий код откатывается на tesseract.
+"""
+import math
+import os
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from django.conf import settings
+from PIL import Image, ImageDraw, ImageFont
+
+from .iin import IIN_LENGTH, decode_iin
+
+GLYPH_SIZE = (12, 18)
+
+# Ниже этой корреляции глиф считаем нераспознанным
+MIN_SCORE = 0.6
+# Минимальная уверенность итогового ИИН (произведение вероятностей цифр)
+MIN_CONFIDENCE = 0.5
+# «Температура» перевода корреляций в вероятности
+SOFTMAX_SCALE = 25.0
+
+TEMPLATE_FONTS = ("HelveticaNeue-Bold.otf", "HelveticaNeue-Roman.otf")
+
+
+def _otsu_threshold(hist: Sequence[int]) -> int:
+    total = sum(hist)
+    sum_all = sum(i * h for i, h in enumerate(hist))
+    sum_b = w_b = 0
+    best_t, best_var = 127, -1.0
+    for t in range(256):
+        w_b += hist[t]
+        if w_b == 0:
+            continue
+        w_f = total - w_b
+        if w_f == 0:
+            break
+        sum_b += t * hist[t]
+        m_b = sum_b / w_b
+        m_f = (sum_all - sum_b) / w_f
+        var = w_b * w_f * (m_b - m_f) ** 2
+        if var > best_var:
+            best_var, best_t = var, t
+    return best_t
+
+
+def _binarize(img: Image.Image) -> Image.Image:
+    """Чернила = 255, фон = 0."""
+    gray = img if img.mode == "L" else img.convert("L")
+    thr = _otsu_threshold(gray.histogram())
+    return gray.point(lambda p: 255 if p <= thr else 0)
+
+
+def _projection(ink: Image.Image, axis: int) -> List[float]:
+    """Средняя доля чернил по столбцам (axis=0) или строкам (axis=1) — через BOX-ресайз."""
+    w, h = ink.size
+    size = (w, 1) if axis == 0 else (1, h)
+    return [v / 255.0 for v in ink.resize(size, Image.Resampling.BOX).getdata()]
+
+
+def _runs(profile: List[float], min_value: float) -> List[Tuple[int, int]]:
+    runs, start = [], None
+    for i, v in enumerate(profile):
+        if v > min_value and start is None:
+            start = i
+        elif v <= min_value and start is not None:
+            runs.append((start, i))
+            start = None
+    if start is not None:
+        runs.append((start, len(profile)))
+    return runs
+
+
+def _normalize_glyph(ink: Image.Image) -> Optional[List[float]]:
+    """Обрезка по чернилам, приведение к GLYPH_SIZE, вектор с нулевым средним и единичной нормой."""
+    box = ink.getbbox()
+    if not box:
+        return None
+    glyph = ink.crop(box)
+    # узкие глифы («1») дополняем до пропорций GLYPH_SIZE, а не растягиваем
+    gw, gh = glyph.size
+    want_w = int(round(gh * GLYPH_SIZE[0] / GLYPH_SIZE[1]))
+    if gw < want_w:
+        padded = Image.new("L", (want_w, gh), 0)
+        padded.paste(glyph, ((want_w - gw) // 2, 0))
+        glyph = padded
+    glyph = glyph.resize(GLYPH_SIZE, Image.Resampling.BILINEAR)
+    vec = [v / 255.0 for v in glyph.getdata()]
+    mean = sum(vec) / len(vec)
+    vec = [v - mean for v in vec]
+    norm = math.sqrt(sum(v * v for v in vec)) or 1.0
+    return [v / norm for v in vec]
+
+
+def segment_digits(img: Image.Image) -> List[Image.Image]:
+    """Глифы слева направо (бинарные, чернила = 255)."""
+    ink = _binarize(img)
+
+    # строки: берём самую «чернильную» полосу (отсекаем подписи/мусор сверху-снизу)
+    row_profile = _projection(ink, 1)
+    rows = _runs(row_profile, 0.02)
+    if rows:
+        top, bottom = max(rows, key=lambda r: sum(row_profile[r[0]:r[1]]))
+        ink = ink.crop((0, top, ink.width, bottom))
+
+    cols = _runs(_projection(ink, 0), 0.0)
+    # отбрасываем точечный шум уже 1 px
+    cols = [c for c in cols if c[1] - c[0] > 1]
+    return [ink.crop((l, 0, r, ink.height)) for l, r in cols]
+
+
+@lru_cache(maxsize=4)
+def _templates(fonts_dir: str) -> Dict[str, List[List[float]]]:
+    """Эталоны цифр из шрифтов проекта (по одному на шрифт)."""
+    result: Dict[str, List[List[float]]] = {d: [] for d in "0123456789"}
+    for name in TEMPLATE_FONTS:
+        path = os.path.join(fonts_dir, name)
+        try:
+            font = ImageFont.truetype(path, 64)
+        except OSError:
+            continue
+        for d in result:
+            canvas = Image.new("L", (64, 96), 0)
+            ImageDraw.Draw(canvas).text((8, 8), d, fill=255, font=font)
+            vec = _normalize_glyph(canvas)
+            if vec:
+                result[d].append(vec)
+    return result
+
+
+def _classify(vec: List[float], templates: Dict[str, List[List[float]]]) -> Tuple[List[Tuple[str, float]], float]:
+    """Варианты (цифра, вероятность) по убыванию и лучшая корреляция."""
+    scores = []
+    for d, tpls in templates.items():
+        if tpls:
+            scores.append((d, max(sum(a * b for a, b in zip(vec, t)) for t in tpls)))
+    scores.sort(key=lambda x: -x[1])
+    exps = [math.exp(SOFTMAX_SCALE * (s - scores[0][1])) for _, s in scores]
+    z = sum(exps)
+    return [(d, e / z) for (d, _), e in zip(scores, exps)], scores[0][1] if scores else 0.0
+
+
+def recognize_iin(img: Image.Image, fonts_dir: Optional[str] = None) -> Dict:
+    """
+    Распознаёт ИИН в ROI.
+    Возвращает {"iin", "sure", "confidence", "glyphs", "reason"?}; sure=False — нужен tesseract.
+    """
+    fonts_dir = fonts_dir or os.path.join(settings.BASE_DIR, "static", "fonts")
+    templates = _templates(fonts_dir)
+    if not any(templates.values()):
+        return {"iin": "", "sure": False, "confidence": 0.0, "glyphs": 0, "reason": "no templates"}
+
+    glyphs = segment_digits(img)
+    if len(glyphs) != IIN_LENGTH:
+        return {"iin": "", "sure": False, "confidence": 0.0, "glyphs": len(glyphs), "reason": "segmentation"}
+
+    candidates = []
+    worst = 1.0
+    for glyph in glyphs:
+        vec = _normalize_glyph(glyph)
+        if vec is None:
+            return {"iin": "", "sure": False, "confidence": 0.0, "glyphs": len(glyphs), "reason": "empty glyph"}
+        probs, best_score = _classify(vec, templates)
+        worst = min(worst, best_score)
+        candidates.append(probs[:3])
+
+    decoded = decode_iin(candidates)
+    if not decoded:
+        return {"iin": "", "sure": False, "confidence": 0.0, "glyphs": len(glyphs), "reason": "checksum"}
+
+    sure = worst >= MIN_SCORE and decoded["confidence"] >= MIN_CONFIDENCE
+    return {
+        "iin": decoded["iin"],
+        "sure": sure,
+        "confidence": decoded["confidence"],
+        "corrected": decoded["corrected"],
+        "glyphs": len(glyphs),
+        "min_score": round(worst, 3),
+    }
@@ -0,0 +1,61 @@
+# executor.py
+"""
+Ограниченный пул для блокирующей работы из async-view (см. async_views.py):
+разбор multipart, рендер PDF (poppler), OCR (tesseract), WeasyPrint, ORM.
+
+Event loop только ждёт результат, поэтому один ASGI-воркер держит много
+медленных клиентов, а тяжёлой работы одновременно идёт не больше
+DOCUMENTS_EXECUTOR_WORKERS (по умолчанию — число ядер).
+"""
+import asyncio
+import contextvars
+import functools
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from django.conf import settings
+from django.db import close_old_connections
+
+_executor: Optional[ThreadPoolExecutor] = None
+_lock = threading.Lock()
+
+
+def max_workers() -> int:
+    return int(getattr(settings, "DOCUMENTS_EXECUTOR_WORKERS", 0) or os.cpu_count() or 2)
+
+
+def get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=max_workers(), thread_name_prefix="documents-blocking")
+    return _executor
+
+
+def _call(fn, args, kwargs):
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        # потоки пула живут долго — соединения с БД закрываем по тем же правилам, что и после запроса
+        close_old_connections()
+
+
+async def run_blocking(fn, *args, **kwargs):
+    """
+    Выполняет fn в пуле и ждёт результат. Контекст (collect_spans профилировщика)
+    переносится в поток пула.
+    """
+    loop = asyncio.get_running_loop()
+    ctx = contextvars.copy_context()
+    return await loop.run_in_executor(get_executor(), ctx.run, functools.partial(_call, fn, args, kwargs))
+
+
+def shutdown(wait: bool = True):
+    global _executor
+    with _lock:
+        if _executor is not None:
+            _executor.shutdown(wait=wait)
+            _executor = None
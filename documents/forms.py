@@ -1,31 +1,72 @@
+import os
+
 from django import forms
 from .models import Document
+from .imaging import probe_image, ImageRejected
+from .uploads import MISMATCH_MESSAGE, file_sha256, kind_for_name, max_upload_size, sniff
+
+PDF_EXTENSIONS = ('.pdf',)
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
 
 
 class DocumentUploadForm(forms.ModelForm):
+    # Один input: PDF уходит в pdf_file, фото/скан — в jpg_file
+    file = forms.FileField(label='Файл удостоверения')
+
     class Meta:
         model = Document
-        fields = ['pdf_file']
+        fields = []
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self.fields['pdf_file'].widget.attrs.update({
+        self.fields['file'].widget.attrs.update({
             'class': 'form-control',
-            'accept': '.pdf',
+            'accept': ','.join(PDF_EXTENSIONS + IMAGE_EXTENSIONS),
             'required': True
         })
-        self.fields['pdf_file'].help_text = 'Выберите PDF файл удостоверения личности'
+        self.fields['file'].help_text = 'Выберите PDF, JPG или PNG файл удостоверения личности'
 
-    def clean_pdf_file(self):
-        pdf_file = self.cleaned_data.get('pdf_file')
+    def clean_file(self):
+        upload = self.cleaned_data.get('file')
 
-        if pdf_file:
-            # Проверяем размер файла (максимум 10 МБ)
-            if pdf_file.size > 10 * 1024 * 1024:
-                raise forms.ValidationError('Файл слишком большой. Максимальный размер: 10 МБ')
+        if upload:
+            # Проверяем размер файла (DOCUMENTS_MAX_UPLOAD_SIZE, по умолчанию 10 МБ)
+            limit = max_upload_size()
+            if upload.size > limit:
+                raise forms.ValidationError(
+                    f'Файл слишком большой. Максимальный размер: {limit // (1024 * 1024)} МБ'
+                )
 
             # Проверяем расширение
-            if not pdf_file.name.lower().endswith('.pdf'):
-                raise forms.ValidationError('Файл должен быть в формате PDF')
+            ext = os.path.splitext(upload.name)[1].lower()
+            if ext not in PDF_EXTENSIONS + IMAGE_EXTENSIONS:
+                raise forms.ValidationError('Файл должен быть в формате PDF, JPG или PNG')
+
+            # И сигнатуру (DocumentUploadHandler уже проверил её в потоке — тут дёшево повторяем)
+            head = upload.read(1024)
+            upload.seek(0)
+            if sniff(head) != kind_for_name(upload.name):
+                raise forms.ValidationError(MISMATCH_MESSAGE)
+
+            # Для изображений читаем только заголовок: формат и число пикселей
+            if ext in IMAGE_EXTENSIONS:
+                try:
+                    probe_image(upload)
+                except ImageRejected as e:
+                    raise forms.ValidationError(str(e))
+                finally:
+                    upload.seek(0)
+
+        return upload
 
-        return pdf_file
\ No newline at end of file
+    def save(self, commit=True):
+        document = super().save(commit=False)
+        upload = self.cleaned_data['file']
+        if upload.name.lower().endswith(PDF_EXTENSIONS):
+            document.pdf_file = upload
+        else:
+            document.jpg_file = upload
+        document.sha256 = file_sha256(upload)
+        if commit:
+            document.save()
+        return document
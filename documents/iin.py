@@ -0,0 +1,215 @@
+# iin.py
+"""
+ИИН: контрольная сумма и восстановление по альтернативам символов.
+
+Tesseract (LSTM, lstm_choice_mode=2) в hOCR отдаёт для каждого символа
+несколько вариантов с уверенностью. decode_iin() перебирает варианты
+в наименее уверенных позициях в порядке убывания вероятности и берёт
+первый ИИН, который проходит проверку mod 11. Перебор ограничен
+(MAX_EXPANSIONS проверок), поэтому укладывается в доли миллисекунды.
+
+Перебираются только цифры, которые предложил сам распознаватель
+(не больше MAX_CHOICES на позицию, не ниже MIN_ALTERNATIVE_PROB), и
+исправление принимается, только если его уверенность не ниже
+MIN_CORRECTED_CONFIDENCE. Иначе контрольная сумма ловит почти любую
+ошибку «исправлением» в чужой валидный ИИН — лучше вернуть None и
+оставить строку как есть (с предупреждением о контрольной сумме).
+"""
+import heapq
+import math
+import re
+from html.parser import HTMLParser
+from typing import Dict, List, Optional, Tuple
+
+IIN_LENGTH = 12
+
+# Сколько позиций перебираем и сколько проверок делаем максимум
+MAX_POSITIONS = 3
+MAX_EXPANSIONS = 200
+
+# Позиции с уверенностью выше порога не трогаем
+CONFIDENCE_THRESHOLD = 0.97
+
+# Какие альтернативы распознавателя перебираем
+MAX_CHOICES = 3
+MIN_ALTERNATIVE_PROB = 0.05
+
+# Ниже этой уверенности исправленный ИИН не принимаем
+MIN_CORRECTED_CONFIDENCE = 0.1
+
+RE_X_CONFS = re.compile(r"x_confs?\s+([\d.]+)")
+
+Candidates = List[List[Tuple[str, float]]]
+
+
+def check_digit(first11: str) -> Optional[int]:
+    """
+    Контрольный разряд по первым 11 цифрам.
+    None — если и вторая последовательность весов даёт 10 (такой ИИН не выдаётся).
+    """
+    digits = [int(d) for d in first11]
+    s = sum(digits[i] * (i + 1) for i in range(11)) % 11
+    if s == 10:
+        s = sum(digits[i] * (i + 3) for i in range(11)) % 11
+        if s == 10:
+            return None
+    return s
+
+
+def validate_iin(iin: str) -> bool:
+    if not re.fullmatch(r'\d{12}', iin):
+        return False
+    digits = [int(d) for d in iin]
+    s = sum(digits[i] * (i + 1) for i in range(11)) % 11
+    if s == 10:
+        s = sum(digits[i] * (i + 3) for i in range(11)) % 11
+    return s == digits[11]
+
+# ---------------------
+# hOCR -> альтернативы символов
+# ---------------------
+
+class _HocrChoices(HTMLParser):
+    """
+    Собирает для каждого символа список (символ, уверенность 0..1).
+    Понимает оба вида вывода tesseract:
+    - ocr_symbol с вложенными вариантами (title 'x_confs N') — lstm_choice_mode=2;
+    - ocrx_cinfo с 'x_conf N' — только лучший вариант (hocr_char_boxes=1).
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.symbols: Candidates = []
+        self.cinfo: Candidates = []
+        self._stack: List[str] = []
+        self._in_symbol = False
+        self._choice_conf: Optional[float] = None
+        self._cinfo_conf: Optional[float] = None
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        cls = attrs.get("class") or ""
+        title = attrs.get("title") or ""
+        self._stack.append(cls)
+
+        if cls == "ocr_symbol":
+            self._in_symbol = True
+            self.symbols.append([])
+            return
+
+        m = RE_X_CONFS.search(title)
+        if not m:
+            return
+        conf = float(m.group(1)) / 100.0
+        if self._in_symbol:
+            self._choice_conf = conf
+        elif cls == "ocrx_cinfo":
+            self._cinfo_conf = conf
+
+    def handle_endtag(self, tag):
+        cls = self._stack.pop() if self._stack else ""
+        if cls == "ocr_symbol":
+            self._in_symbol = False
+        self._choice_conf = None
+        self._cinfo_conf = None
+
+    def handle_data(self, data):
+        ch = data.strip()
+        if not ch:
+            return
+        if self._in_symbol and self._choice_conf is not None:
+            self.symbols[-1].append((ch, self._choice_conf))
+        elif self._cinfo_conf is not None:
+            self.cinfo.append([(ch, self._cinfo_conf)])
+
+
+def parse_hocr_choices(hocr: str) -> Candidates:
+    """Альтернативы по символам (только цифры), отсортированные по убыванию уверенности."""
+    parser = _HocrChoices()
+    parser.feed(hocr)
+    raw = [s for s in parser.symbols if s] or parser.cinfo
+
+    result: Candidates = []
+    for choices in raw:
+        best: Dict[str, float] = {}
+        for ch, conf in choices:
+            if ch.isdigit() and len(ch) == 1:
+                best[ch] = max(best.get(ch, 0.0), conf)
+        if best:
+            result.append(sorted(best.items(), key=lambda x: -x[1]))
+    return result
+
+# ---------------------
+# ПЕРЕБОР ПО КОНТРОЛЬНОЙ СУММЕ
+# ---------------------
+
+def _alternatives(choices: List[Tuple[str, float]]) -> List[Tuple[str, float]]:
+    """Лучший вариант и правдоподобные альтернативы распознавателя (других цифр не выдумываем)."""
+    best = choices[0]
+    alts = [(ch, p) for ch, p in choices[1:MAX_CHOICES] if p >= MIN_ALTERNATIVE_PROB]
+    return [(best[0], max(best[1], 1e-6))] + alts
+
+
+def decode_iin(
+    candidates: Candidates,
+    max_positions: int = MAX_POSITIONS,
+    max_expansions: int = MAX_EXPANSIONS,
+    min_confidence: float = MIN_CORRECTED_CONFIDENCE,
+) -> Optional[Dict]:
+    """
+    Самый вероятный валидный ИИН.
+    Возвращает {"iin", "confidence", "corrected": [позиции], "checked": N} или None.
+    None — и когда лучшая строка не проходит проверку, а исправление
+    из предложенных вариантов не находится или маловероятно (< min_confidence).
+    """
+    if len(candidates) != IIN_LENGTH:
+        return None
+
+    top = [c[0] for c in candidates]
+    base = "".join(ch for ch, _ in top)
+    base_conf = math.prod(p for _, p in top)
+    if validate_iin(base):
+        return {"iin": base, "confidence": round(base_conf, 4), "corrected": [], "checked": 1}
+
+    # Перебираем только наименее уверенные позиции
+    order = sorted(range(IIN_LENGTH), key=lambda i: top[i][1])
+    positions = [i for i in order if top[i][1] < CONFIDENCE_THRESHOLD][:max_positions] or order[:1]
+    alts = [_alternatives(candidates[i]) for i in positions]
+    logp = [[math.log(p) for _, p in a] for a in alts]
+
+    # k-best перебор комбинаций: состояние — индексы вариантов по выбранным позициям
+    start = (0,) * len(positions)
+    heap = [(-sum(lp[0] for lp in logp), start)]
+    seen = {start}
+    checked = 0
+    chars = list(base)
+
+    while heap and checked < max_expansions:
+        neg_score, state = heapq.heappop(heap)
+        for pos, idx, a in zip(positions, state, alts):
+            chars[pos] = a[idx][0]
+        candidate = "".join(chars)
+        checked += 1
+        if validate_iin(candidate):
+            fixed = [pos for pos, idx in zip(positions, state) if idx != 0]
+            # уверенность: вероятность комбинации относительно исходной строки
+            others = math.prod(top[i][1] for i in range(IIN_LENGTH) if i not in positions)
+            confidence = math.exp(-neg_score) * others
+            if confidence < min_confidence:
+                return None
+            return {
+                "iin": candidate,
+                "confidence": round(confidence, 4),
+                "corrected": sorted(fixed),
+                "checked": checked,
+            }
+
+        for j in range(len(state)):
+            if state[j] + 1 < len(alts[j]):
+                nxt = state[:j] + (state[j] + 1,) + state[j + 1:]
+                if nxt not in seen:
+                    seen.add(nxt)
+                    score = -neg_score - logp[j][state[j]] + logp[j][state[j] + 1]
+                    heapq.heappush(heap, (-score, nxt))
+
+    return None
@@ -0,0 +1,77 @@
+# imaging.py
+"""
+Загрузка фото/сканов удостоверений (JPEG/PNG) с предсказуемой памятью:
+- лимит на число пикселей (защита от decompression bomb) — проверяем по заголовку;
+- JPEG декодируется в draft-режиме сразу в уменьшенном масштабе (1/2, 1/4, 1/8);
+- ориентация по EXIF;
+- итоговый размер не больше DOCUMENTS_IMAGE_MAX_SIDE по длинной стороне.
+"""
+from typing import IO, Union
+
+from django.conf import settings
+from PIL import Image, ImageOps
+
+ALLOWED_IMAGE_FORMATS = ("JPEG", "PNG")
+
+# 12 МП телефона ~ 4000x3000; 64 МП — с запасом, но не бесконечно
+DEFAULT_MAX_PIXELS = 64_000_000
+
+# ROI рассчитаны на рендер PDF при 220 DPI — ~2000 px по длинной стороне хватает
+DEFAULT_MAX_SIDE = 2000
+
+
+class ImageRejected(ValueError):
+    """Изображение не подходит: формат, размер, битый файл."""
+
+
+def max_pixels() -> int:
+    return getattr(settings, "DOCUMENTS_MAX_IMAGE_PIXELS", DEFAULT_MAX_PIXELS)
+
+
+def max_side() -> int:
+    return getattr(settings, "DOCUMENTS_IMAGE_MAX_SIDE", DEFAULT_MAX_SIDE)
+
+
+def probe_image(fp: Union[str, IO[bytes]]) -> Image.Image:
+    """
+    Открывает изображение «лениво» (читается только заголовок) и проверяет
+    формат и число пикселей. Пиксели не декодируются.
+    """
+    try:
+        img = Image.open(fp)
+    except Image.DecompressionBombError as e:
+        raise ImageRejected(str(e))
+    except Exception:
+        raise ImageRejected("Не удалось прочитать изображение")
+
+    if img.format not in ALLOWED_IMAGE_FORMATS:
+        raise ImageRejected(f"Неподдерживаемый формат: {img.format}")
+
+    w, h = img.size
+    if w * h > max_pixels():
+        raise ImageRejected(f"Слишком большое изображение: {w}x{h}")
+    return img
+
+
+def open_for_ocr(fp: Union[str, IO[bytes]], target_side: int = None) -> Image.Image:
+    """
+    Декодирует изображение в RGB с длинной стороной не больше target_side.
+    Для JPEG декодер сразу работает в уменьшенном масштабе (draft), поэтому
+    12-МП фото не разворачивается в память целиком.
+    """
+    target_side = target_side or max_side()
+    img = probe_image(fp)
+
+    w, h = img.size
+    if img.format == "JPEG" and max(w, h) > target_side:
+        # draft выбирает наименьший масштаб DCT, при котором обе стороны >= запрошенных
+        ratio = target_side / max(w, h)
+        img.draft("RGB", (max(1, int(w * ratio)), max(1, int(h * ratio))))
+
+    img = ImageOps.exif_transpose(img)
+    if max(img.size) > target_side:
+        img.thumbnail((target_side, target_side), Image.Resampling.LANCZOS, reducing_gap=2.0)
+
+    if img.mode != "RGB":
+        img = img.convert("RGB")
+    return img
@@ -0,0 +1,222 @@
+# ingest.py
+"""
+Запись результатов распознавания в Document.
+
+Одиночная загрузка (views.process_upload): INSERT в form.save(), затем
+UPDATE только тех колонок, что заполнил OCR (apply_extracted их возвращает).
+
+Пакетная загрузка каталога (ingest_files, manage.py ingest_documents):
+1) документы создаются bulk_create пачками в транзакции (файлы кладутся
+   в хранилище в pre_save полей);
+2) OCR идёт в пуле процессов, без обращений к БД;
+3) результаты пишутся bulk_update пачками в транзакции.
+per_row=True — прежний путь (save() на каждую строку) для сравнения rows/sec.
+"""
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, List, Optional
+
+from django.core.files import File
+from django.db import transaction
+from django.utils import timezone
+
+from .derivatives import MAIN_SIZE
+from .jpg_parser import TEXT_FIELDS
+from .lifecycle import discard_failed
+from .uploads import file_sha256, kind_for_name
+from .utils import extract_data_from_image, extract_data_from_pdf
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 100
+
+
+def extract_for(document, fields=None):
+    """
+    Извлечение из загруженного оригинала: PDF или фото/скан.
+    fields — какие поля распознавать (None — DOCUMENTS_EXTRACT_FIELDS).
+    """
+    if document.pdf_file:
+        logger.info("Обрабатываем PDF: %s", document.pdf_file.path)
+        return extract_data_from_pdf(document.pdf_file.path, fields)
+    logger.info("Обрабатываем изображение: %s", document.jpg_file.path)
+    return extract_data_from_image(document.jpg_file.path, fields)
+
+
+def apply_extracted(document, extracted) -> List[str]:
+    """
+    Переносит результат OCR в документ (без сохранения).
+    Трогаем только распознанные поля; исходный файл не меняется.
+    Возвращает имена изменённых колонок — для save(update_fields=...) / bulk_update.
+    """
+    changed = []
+    for field in TEXT_FIELDS:
+        if field in extracted:
+            setattr(document, field, extracted[field] or '')
+            changed.append(field)
+
+    # Сохраняем фото (все размеры), если извлеклось
+    photo = extracted.get('photo')
+    if photo:
+        document.photo_variants = photo.store()
+        document.photo = document.photo_variants[MAIN_SIZE]
+        changed += ['photo', 'photo_variants']
+
+    # Промежуточные файлы, которые остались после OCR (см. lifecycle.py)
+    if extracted.get('artifacts'):
+        document.artifacts = {**(document.artifacts or {}), **extracted['artifacts']}
+        changed.append('artifacts')
+
+    # Версии рамок, с которыми читались поля (для reocr_fields)
+    versions = (extracted.get('debug_info') or {}).get('coordinate_versions')
+    if versions:
+        meta = dict(document.extraction_meta or {})
+        meta['coordinates'] = {**meta.get('coordinates', {}), **versions}
+        document.extraction_meta = meta
+        changed.append('extraction_meta')
+
+    # auto_now не срабатывает в bulk_update и не попадает в update_fields сам
+    if changed:
+        document.updated_at = timezone.now()
+        changed.append('updated_at')
+    return changed
+
+# ---------------------
+# ПАКЕТНАЯ ЗАГРУЗКА
+# ---------------------
+
+def _batches(items: List, size: int):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def _new_document(path: str, opened: List[File]):
+    """Document с исходником; в хранилище файл запишет pre_save при вставке."""
+    from .models import Document
+
+    upload = File(open(path, 'rb'), name=os.path.basename(path))
+    opened.append(upload)
+
+    document = Document(sha256=file_sha256(upload))
+    if kind_for_name(path) == 'pdf':
+        document.pdf_file = upload
+    else:
+        document.jpg_file = upload
+    return document
+
+
+def _extract_source(path: str, is_pdf: bool, fields) -> Optional[Dict]:
+    """Для пула процессов: только OCR по пути, без БД. None — файл не разобрался."""
+    try:
+        if is_pdf:
+            return extract_data_from_pdf(path, fields)
+        return extract_data_from_image(path, fields)
+    except Exception:
+        # один битый файл не должен обрывать пакет (исключение из pool.map — обрывает)
+        logger.exception("Ingest: extraction failed for %s", path)
+        return None
+
+
+def _init_worker():
+    # дочерние процессы при spawn не наследуют настроенный Django
+    import django
+    django.setup()
+
+
+def ingest_files(
+    paths: Iterable[str],
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    workers: int = 1,
+    fields: Optional[Iterable[str]] = None,
+    per_row: bool = False,
+) -> Dict:
+    """
+    Загружает файлы как документы и распознаёт их.
+    Возвращает тайминги и rows/sec по фазам (вставка, OCR, запись результата).
+    Файл, который не удалось разобрать, не обрывает пакет: его документ
+    удаляется (discard_failed), число таких — в "failed".
+    """
+    from .models import Document
+
+    paths = [p for p in paths if kind_for_name(p)]
+    fields = tuple(fields) if fields is not None else None
+    stats = {"files": len(paths), "mode": "per_row" if per_row else "bulk", "batch_size": batch_size}
+
+    # 1) вставка
+    t0 = time.perf_counter()
+    documents = []
+    opened: List[File] = []
+    try:
+        if per_row:
+            for path in paths:
+                document = _new_document(path, opened)
+                document.save()
+                documents.append(document)
+        else:
+            for chunk in _batches(paths, batch_size):
+                objs = [_new_document(p, opened) for p in chunk]
+                with transaction.atomic():
+                    documents += Document.objects.bulk_create(objs)
+                for f in opened:
+                    f.close()
+                opened.clear()
+    finally:
+        for f in opened:
+            f.close()
+    insert_s = time.perf_counter() - t0
+    inserted = len(documents)
+
+    # 2) OCR (БД не трогаем)
+    t0 = time.perf_counter()
+    jobs = [
+        ((d.pdf_file or d.jpg_file).path, bool(d.pdf_file), fields)
+        for d in documents
+    ]
+    if workers > 1 and jobs:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+            results = list(pool.map(_extract_source, *zip(*jobs)))
+    else:
+        results = [_extract_source(*job) for job in jobs]
+    ocr_s = time.perf_counter() - t0
+
+    # 3) запись результатов; неразобранные документы удаляем, как при загрузке через сайт
+    t0 = time.perf_counter()
+    changed_fields = set()
+    done, failed = [], 0
+    for document, extracted in zip(documents, results):
+        if extracted is not None:
+            try:
+                changed = apply_extracted(document, extracted)
+                if per_row:
+                    document.save()
+            except Exception:
+                logger.exception("Ingest: failed to store result for document %s", document.pk)
+                extracted = None
+        if extracted is None:
+            discard_failed(document)
+            failed += 1
+            continue
+        changed_fields.update(changed)
+        done.append(document)
+    documents = done
+    if not per_row and changed_fields:
+        for chunk in _batches(documents, batch_size):
+            with transaction.atomic():
+                Document.objects.bulk_update(chunk, sorted(changed_fields))
+    update_s = time.perf_counter() - t0
+
+    n = len(documents)
+    stats.update({
+        "documents": n,
+        "failed": failed,
+        "insert_s": round(insert_s, 3),
+        "ocr_s": round(ocr_s, 3),
+        "update_s": round(update_s, 3),
+        "insert_rows_per_sec": round(inserted / insert_s, 1) if insert_s else 0.0,
+        "update_rows_per_sec": round(n / update_s, 1) if update_s else 0.0,
+        "docs_per_sec": round(n / (insert_s + ocr_s + update_s), 3) if n else 0.0,
+        "document_ids": [d.pk for d in documents],
+    })
+    return stats
@@ -1,16 +1,22 @@
 # jpg_parser.py
 import os
 import re
-import io
 import json
 import logging
 import unicodedata
-from typing import Dict, Tuple, Optional
+from collections.abc import Mapping
+from typing import Dict, Iterable, Tuple, Optional
 
 from PIL import Image, ImageEnhance, ImageOps
-import pytesseract
 from django.conf import settings
-from django.core.files.base import ContentFile
+
+from .metrics import inc, span
+from .quality import assess_quality, gate_mode
+from .iin import validate_iin, parse_hocr_choices, decode_iin
+from . import registration
+from .derivatives import PhotoDerivatives
+from .coordinates import field_versions
+from . import lexicon as name_lexicon
 
 logger = logging.getLogger(__name__)
 
@@ -21,15 +27,6 @@ logger = logging.getLogger(__name__)
 RE_IIN = re.compile(r'(?<!\d)(\d{12})(?!\d)')
 RE_DATE = re.compile(r'(\d{1,2})[./](\d{1,2})[./](\d{2,4})')
 
-def validate_iin(iin: str) -> bool:
-    if not re.fullmatch(r'\d{12}', iin):
-        return False
-    digits = [int(d) for d in iin]
-    s = sum(digits[i] * (i + 1) for i in range(11)) % 11
-    if s == 10:
-        s = sum(digits[i] * (i + 3) for i in range(11)) % 11
-    return s == digits[11]
-
 def normalize_date(s: str) -> str:
     m = RE_DATE.search(s)
     if not m:
@@ -42,6 +39,26 @@ def normalize_date(s: str) -> str:
         return f"{d:02d}.{mth:02d}.{y}"
     return ""
 
+# ---------------------
+# ПОЛЯ
+# ---------------------
+
+NAME_FIELDS = ("last_name", "first_name", "patronymic")
+DATE_FIELDS = ("birth_date", "issue_date", "expiry_date")
+FREE_TEXT_FIELDS = ("birth_place", "nationality", "issued_by")
+
+# Поля, которые есть на любом удостоверении: пустой результат — повод для эскалации.
+# Остальные (нет отчества, не пропечаталась дата) бывают пустыми законно.
+REQUIRED_FIELDS = ("last_name", "first_name", "iin", "document_number")
+
+# Все текстовые поля, которые умеет читать парсер (порядок = порядок OCR при eager-извлечении)
+TEXT_FIELDS = NAME_FIELDS + ("iin", "document_number") + DATE_FIELDS + FREE_TEXT_FIELDS
+
+
+def default_fields() -> Tuple[str, ...]:
+    """Поля по умолчанию (DOCUMENTS_EXTRACT_FIELDS), если вызывающий код не указал свои."""
+    return tuple(getattr(settings, "DOCUMENTS_EXTRACT_FIELDS", TEXT_FIELDS + ("photo",)))
+
 # ---------------------
 # ВСПОМОГАТЕЛЬНОЕ
 # ---------------------
@@ -72,44 +89,71 @@ def _titlecase_cyr(s: str) -> str:
 
 class JPGCoordinateParser:
     """
-    Извлекаем ТОЛЬКО текстовые: last_name, first_name, patronymic, iin
-    + фото по ROI (photo)
+    Извлекаем текстовые поля (TEXT_FIELDS) + фото по ROI (photo).
+    Распознаются только запрошенные поля; extract_lazy() откладывает OCR
+    каждого поля до первого обращения к нему.
     """
     def __init__(
         self,
         lang_text: str = "kaz+rus",
         lang_digits: str = "eng",
         default_psm: int = 7,
+        iin_engine: Optional[str] = None,
     ):
         self.lang_text = lang_text
         self.lang_digits = lang_digits
         self.default_psm = default_psm
 
+        # Движок ИИН: "tesseract" или "template" (digits.py, с откатом на tesseract)
+        self.iin_engine = iin_engine or getattr(settings, "DOCUMENTS_IIN_ENGINE", "tesseract")
+
         # Разделяем наборы: текстовые поля и полный набор (включая фото)
-        self.allowed_text_fields = {"last_name", "first_name", "patronymic", "iin"}
+        self.allowed_text_fields = set(TEXT_FIELDS)
         self.allowed_all_fields  = set(self.allowed_text_fields) | {"photo"}
 
         self.coordinates = self.load_coordinates()
 
         # PSM под поля (7 — одна строка)
-        self.psm_by_field = {
-            "iin": 7,
-            "last_name": 7,
-            "first_name": 7,
-            "patronymic": 7,
-        }
+        self.psm_by_field = {field: 7 for field in TEXT_FIELDS}
 
-        # Вайтлист только для цифр ИИН
+        # Вайтлист для цифровых полей (они же читаются lang_digits)
         self.whitelist_by_field = {
             "iin": "0123456789",
+            "document_number": "0123456789",
+            **{field: "0123456789./" for field in DATE_FIELDS},
         }
 
+        # Ступени OCR: сначала дешёвая, следующая — только если поле не прошло проверку
+        # (ИИН — контрольная сумма, ФИО — пусто или остались подписи).
+        # Каталоги traineddata: tessdata_fast / tessdata_best (None — системный).
+        # Без отдельной best-модели старшие ступени — та же модель с апскейлом,
+        # они почти ничего не дают и только утраивают OCR: оставляем одну ступень.
+        fast_dir = getattr(settings, "DOCUMENTS_TESSDATA_FAST_DIR", None)
+        best_dir = getattr(settings, "DOCUMENTS_TESSDATA_BEST_DIR", None)
+        self.ocr_tiers = [
+            {"name": "fast",    "tessdata_dir": fast_dir, "upscale": 1.0, "psm": None},
+        ]
+        if best_dir and best_dir != fast_dir:
+            self.ocr_tiers += [
+                {"name": "best",    "tessdata_dir": best_dir, "upscale": 2.0, "psm": None},
+                {"name": "alt_psm", "tessdata_dir": best_dir, "upscale": 2.0, "psm": 13},
+            ]
+
         # Служебные слова, которые надо убрать из ФИО (в верхнем регистре)
         self.bad_labels = {"ТЕГІ", "ФАМИЛИЯ", "АТЫ", "ИМЯ", "ӘКЕСІНІҢ", "ОТЧЕСТВО"}
+        # То же для места рождения, национальности и органа выдачи
+        self.free_text_labels = {
+            "ТУҒАН", "ЖЕРІ", "МЕСТО", "РОЖДЕНИЯ", "ҰЛТЫ", "НАЦИОНАЛЬНОСТЬ",
+            "ҚҰЖАТТЫ", "БЕРГЕН", "ОРГАН", "ВЫДАЧИ", "КЕМ", "ВЫДАН",
+        }
 
         # Разрешённые символы: латиница A-Z, расширенная кириллица \u0400-\u052F, дефис и апострофы
         self.name_keep_re = re.compile(r"[^A-Z\u0400-\u052F\-ʼ'’]")
 
+        # Словарь имён для исправления путаницы букв (lexicon.py); None — без коррекции
+        self.lexicon = name_lexicon.get_lexicon()
+        self.lexicon_min_confidence = name_lexicon.min_confidence()
+
     def load_coordinates(self) -> Dict[str, Tuple[float, float, float, float]]:
         """
         Загружаем координаты, оставляем только нужные ключи (в т.ч. photo).
@@ -138,52 +182,126 @@ class JPGCoordinateParser:
             "photo":       [0.105, 0.163, 0.357, 0.391],
         }
 
-    def extract_data_from_jpg(self, jpg_path: str) -> Dict:
-        result = {
-            "first_name": "", "last_name": "", "patronymic": "", "iin": "",
-            "photo": None,
-            "debug_info": {}
-        }
-
+    def extract_data_from_jpg(self, jpg_path: str, fields: Optional[Iterable[str]] = None) -> Dict:
+        debug = {}
         try:
-            image = Image.open(jpg_path)
-            width, height = image.size
+            with span("decode", debug):
+                image = Image.open(jpg_path)
+                image.load()
+        except Exception:
+            logger.exception("extract_data_from_jpg failed for %s", jpg_path)
+            return self._empty_result(debug, fields)
 
-            # Текстовые поля
-            for field, coords in self.coordinates.items():
-                if field not in self.allowed_text_fields:
-                    continue
+        return self.extract_data_from_image(image, debug, fields)
 
-                l, t, r, b = self._to_pixels(coords, width, height)
-                if not self._is_valid_box(l, t, r, b, width, height):
-                    logger.warning("Invalid ROI %s: %s", field, coords)
-                    continue
+    def resolve_fields(self, fields: Optional[Iterable[str]] = None) -> Tuple[str, ...]:
+        """Запрошенные поля (None — default_fields()), без неизвестных и повторов."""
+        requested = default_fields() if fields is None else fields
+        return tuple(f for f in dict.fromkeys(requested) if f in self.allowed_all_fields)
 
-                roi = image.crop((l, t, r, b))
-                enhanced = self._enhance_for_ocr(roi, field)
-                text = self._ocr(enhanced, field)
-                cleaned = self._clean(field, text)
+    def _empty_result(self, debug: Optional[Dict] = None, fields: Optional[Iterable[str]] = None) -> Dict:
+        result = {f: ("" if f != "photo" else None) for f in self.resolve_fields(fields)}
+        result["debug_info"] = debug if debug is not None else {}
+        return result
+
+    def extract_lazy(
+        self,
+        image: Image.Image,
+        fields: Optional[Iterable[str]] = None,
+        debug: Optional[Dict] = None,
+    ) -> "LazyExtraction":
+        """
+        Дешёвая подготовка сразу (привязка ROI, проверка качества),
+        OCR — по полю при первом обращении к результату.
+        """
+        debug = {} if debug is None else debug
+        fields = self.resolve_fields(fields)
+
+        # Привязка ROI к фактическому положению карты (двигаем координаты, не картинку)
+        coordinates = self.coordinates
+        if registration.enabled():
+            with span("register", debug):
+                transform = registration.estimate_transform(image)
+            if transform:
+                coordinates = registration.warp_coordinates(self.coordinates, transform)
+                debug["registration"] = transform
+
+        # Быстрая проверка качества на миниатюре — до любого вызова tesseract
+        mode = gate_mode()
+        if mode != "off":
+            with span("quality", debug):
+                quality = assess_quality(image, coordinates)
+            debug["quality"] = quality
+            for reason in quality["reasons"]:
+                inc("documents_quality_issues_total", reason=reason)
+            if quality["reasons"]:
+                debug.setdefault("warnings", []).append("Quality: " + ", ".join(quality["reasons"]))
+            if quality["reject"] and mode == "reject":
+                debug["rejected"] = True
+
+        # с какими рамками читались поля (см. coordinates.py); отклонённый скан не читался
+        if not debug.get("rejected"):
+            debug["coordinate_versions"] = field_versions(self.coordinates, fields)
+
+        return LazyExtraction(self, image, coordinates, fields, debug)
+
+    def extract_data_from_image(
+        self,
+        image: Image.Image,
+        debug: Optional[Dict] = None,
+        fields: Optional[Iterable[str]] = None,
+    ) -> Dict:
+        """
+        То же, что extract_data_from_jpg, но для уже декодированного изображения
+        (загруженные фото, страницы PDF в памяти). Все запрошенные поля распознаются сразу.
+        """
+        result = self._empty_result(debug, fields)
+        try:
+            result.update(self.extract_lazy(image, fields, result["debug_info"]).to_dict())
+        except Exception:
+            logger.exception("extract_data_from_image failed")
+        return result
 
-                result[field] = cleaned
-                result["debug_info"][field] = {"bbox": [l, t, r, b], "raw": text}
+    def _read_roi(self, image: Image.Image, coordinates: Dict, field: str, debug: Dict) -> str:
+        """OCR одного текстового поля по его ROI; пишет debug[field] и счётчики."""
+        coords = coordinates.get(field)
+        if not coords:
+            return ""
 
-            # Фото
-            if "photo" in self.coordinates:
-                photo_file = self._extract_photo(image)
-                if photo_file:
-                    result["photo"] = photo_file
-                    # для дебага положим bbox
-                    l, t, r, b = self._to_pixels(self.coordinates["photo"], width, height)
-                    result["debug_info"]["photo"] = {"bbox": [l, t, r, b]}
+        width, height = image.size
+        l, t, r, b = self._to_pixels(coords, width, height)
+        if not self._is_valid_box(l, t, r, b, width, height):
+            logger.warning("Invalid ROI %s: %s", field, coords)
+            return ""
 
-            # финальная валидация ИИН
-            if result["iin"] and not validate_iin(result["iin"]):
-                result["debug_info"].setdefault("warnings", []).append("IIN checksum failed")
+        roi = image.crop((l, t, r, b))
+        cleaned, text, info = self._read_field(roi, field, debug)
 
-        except Exception:
-            logger.exception("extract_data_from_jpg failed for %s", jpg_path)
+        debug[field] = {"bbox": [l, t, r, b], "raw": text, **info}
+        if info.get("corrected"):
+            debug.setdefault("warnings", []).append(
+                f"IIN corrected by checksum at positions {info['corrected']}"
+            )
+        if not cleaned:
+            inc("documents_empty_fields_total", field=field)
 
-        return result
+        # финальная валидация ИИН
+        if field == "iin" and cleaned and not validate_iin(cleaned):
+            inc("documents_iin_checksum_failures_total")
+            debug.setdefault("warnings", []).append("IIN checksum failed")
+
+        return cleaned
+
+    def _read_photo(self, image: Image.Image, coordinates: Dict, debug: Dict) -> Optional[PhotoDerivatives]:
+        if "photo" not in coordinates:
+            return None
+        with span("photo", debug):
+            photo_file = self._extract_photo(image, coordinates)
+        if photo_file:
+            # для дебага положим bbox
+            l, t, r, b = self._to_pixels(coordinates["photo"], *image.size)
+            debug["photo"] = {"bbox": [l, t, r, b], "bytes": photo_file.nbytes}
+        return photo_file
 
     # --- помощьники ---
 
@@ -199,13 +317,58 @@ class JPGCoordinateParser:
     def _is_valid_box(l, t, r, b, W, H):
         return 0 <= l < r <= W and 0 <= t < b <= H
 
-    def _enhance_for_ocr(self, img: Image.Image, field: str) -> Image.Image:
+    def _read_field(self, roi: Image.Image, field: str, debug: Dict) -> Tuple[str, str, Dict]:
+        """
+        OCR поля по ступеням self.ocr_tiers. Возвращает (очищенное, сырое, инфо для debug).
+        """
+        best = None
+        for level, tier in enumerate(self.ocr_tiers):
+            with span("enhance", debug, field=field):
+                enhanced = self._enhance_for_ocr(roi, field, upscale=tier["upscale"])
+            with span("ocr", debug, field=field):
+                if field == "iin":
+                    text, info = self._read_iin(enhanced, tier)
+                else:
+                    text, info = self._ocr(enhanced, field, tier), {}
+            cleaned = self._clean(field, text)
+
+            info = {**(info or {}), "tier": tier["name"], "tiers_tried": level + 1}
+            # запоминаем последний непустой результат — на случай, если не пройдёт ни одна ступень
+            if cleaned or best is None:
+                best = (cleaned, text, info)
+            if self._is_acceptable(field, cleaned):
+                break
+            # необязательное поле, где вообще нет текста (нет отчества) — старшие ступени не помогут
+            if not text.strip() and field not in REQUIRED_FIELDS:
+                break
+
+        inc("documents_ocr_tier_total", field=field, tier=best[2]["tier"])
+        return best
+
+    def _is_acceptable(self, field: str, cleaned: str) -> bool:
+        """Проверка, после которой эскалация на следующую ступень не нужна."""
+        if field == "iin":
+            return validate_iin(cleaned)
+        if not cleaned:
+            return False
+        if field in NAME_FIELDS:
+            up = cleaned.upper()
+            # короткие подписи (АТЫ, ИМЯ) _clean уже убрал; длинные могли «прилипнуть» к имени
+            if any(lbl in up for lbl in self.bad_labels if len(lbl) >= 5):
+                return False
+            return len(cleaned) >= 2
+        if field == "document_number":
+            return len(cleaned) >= 8
+        return True
+
+    def _enhance_for_ocr(self, img: Image.Image, field: str, upscale: float = 1.0) -> Image.Image:
         """
         Лёгкая предобработка:
         - градации серого
         - автоконтраст
         - немного контраста/резкости
         - апскейл при мелких ROI (особенно для числовых полей)
+        - дополнительный апскейл upscale на старших ступенях OCR
         """
         try:
             if img.mode != "L":
@@ -222,6 +385,7 @@ class JPGCoordinateParser:
                 scale = 1.5
             else:
                 scale = 1.2 if field in ("iin",) else 1.0
+            scale *= upscale
 
             if scale > 1.0:
                 new_size = (int(img.width * scale), int(img.height * scale))
@@ -232,26 +396,101 @@ class JPGCoordinateParser:
             logger.warning("Enhance failed for %s: %s", field, e)
             return img
 
-    def _ocr(self, img: Image.Image, field: str) -> str:
-        # psm под поле
-        psm = self.psm_by_field.get(field, self.default_psm)
-        # whitelist и выбор языка
-        wl = self.whitelist_by_field.get(field)
-        # Текст: kaz+rus+eng; Цифры: eng
-        lang = self.lang_digits if wl else (self.lang_text + "+eng")
-
+    def _tess_config(self, field: str, tier: Optional[Dict] = None) -> str:
+        tier = tier or {}
+        # psm под поле (ступень может переопределить)
+        psm = tier.get("psm") or self.psm_by_field.get(field, self.default_psm)
         cfg = f"--oem 1 --psm {psm}"
+        if tier.get("tessdata_dir"):
+            cfg += f' --tessdata-dir "{tier["tessdata_dir"]}"'
+        wl = self.whitelist_by_field.get(field)
         if wl:
             cfg += f" -c tessedit_char_whitelist={wl}"
+        return cfg
+
+    def _ocr(self, img: Image.Image, field: str, tier: Optional[Dict] = None) -> str:
+        # pytesseract тянет за собой pandas/numpy (если стоят) — импортируем по месту
+        import pytesseract
+
+        # Текст: kaz+rus+eng; Цифры: eng
+        lang = self.lang_digits if self.whitelist_by_field.get(field) else (self.lang_text + "+eng")
+        cfg = self._tess_config(field, tier)
 
         return pytesseract.image_to_string(img, lang=lang, config=cfg).strip()
 
-    def _extract_photo(self, image: Image.Image) -> Optional[ContentFile]:
+    def _ocr_with_confidence(self, img: Image.Image, field: str, tier: Optional[Dict] = None) -> Tuple[str, float]:
+        """
+        Как _ocr, но через image_to_data: текст и средняя уверенность по словам (0..100)
+        за один вызов tesseract. Для предпросмотра калибровки (preview.py).
+        """
+        import pytesseract
+
+        lang = self.lang_digits if self.whitelist_by_field.get(field) else (self.lang_text + "+eng")
+        data = pytesseract.image_to_data(
+            img, lang=lang, config=self._tess_config(field, tier), output_type=pytesseract.Output.DICT
+        )
+        words, confs = [], []
+        for word, conf in zip(data.get("text", []), data.get("conf", [])):
+            word = (word or "").strip()
+            conf = float(conf)
+            if word and conf >= 0:
+                words.append(word)
+                confs.append(conf)
+        confidence = round(sum(confs) / len(confs), 1) if confs else 0.0
+        return " ".join(words), confidence
+
+    def _read_iin(self, img: Image.Image, tier: Optional[Dict] = None) -> Tuple[str, Optional[Dict]]:
+        """
+        ИИН выбранным движком. Шаблонный распознаватель (только на первой ступени)
+        отдаёт результат, только если уверен; иначе — tesseract.
+        """
+        if self.iin_engine == "template" and (tier is None or tier is self.ocr_tiers[0]):
+            from .digits import recognize_iin
+
+            fast = recognize_iin(img)
+            if fast["sure"]:
+                return fast["iin"], {"engine": "template", **{k: v for k, v in fast.items() if k != "iin"}}
+            text, info = self._ocr_iin(img, tier)
+            return text, {**(info or {}), "engine": "tesseract", "template_fallback": fast.get("reason", "unsure")}
+
+        text, info = self._ocr_iin(img, tier)
+        return text, {**(info or {}), "engine": "tesseract"}
+
+    def _ocr_iin(self, img: Image.Image, tier: Optional[Dict] = None) -> Tuple[str, Optional[Dict]]:
+        """
+        ИИН одним вызовом tesseract в hOCR с альтернативами по символам
+        (lstm_choice_mode=2). Если лучшая строка не проходит контрольную сумму —
+        перебираем альтернативы в неуверенных позициях (iin.decode_iin).
         """
-        Вырезает ROI 'photo' и возвращает ContentFile(JPEG).
+        import pytesseract
+
+        cfg = self._tess_config("iin", tier) + " -c lstm_choice_mode=2 -c hocr_char_boxes=1"
+        hocr = pytesseract.image_to_pdf_or_hocr(img, lang=self.lang_digits, config=cfg, extension="hocr")
+        candidates = parse_hocr_choices(hocr.decode("utf-8", "ignore"))
+        text = "".join(c[0][0] for c in candidates)
+
+        if not candidates:
+            # старый tesseract без посимвольного вывода — обычный путь
+            return self._ocr(img, "iin", tier), None
+
+        decoded = decode_iin(candidates)
+        if not decoded:
+            return text, {"decoded": False}
+        return decoded["iin"], {
+            "decoded": True,
+            "top1": text,
+            "confidence": decoded["confidence"],
+            "corrected": decoded["corrected"],
+            "checked": decoded["checked"],
+        }
+
+    def _extract_photo(self, image: Image.Image, coordinates: Optional[Dict] = None) -> Optional[PhotoDerivatives]:
+        """
+        Вырезает ROI 'photo' и возвращает его размеры (миниатюра, карточка, печать).
+        Сохраняются в хранилище позже — PhotoDerivatives.store().
         """
         try:
-            coords = self.coordinates.get("photo")
+            coords = (coordinates or self.coordinates).get("photo")
             if not coords:
                 return None
             w, h = image.size
@@ -259,11 +498,7 @@ class JPGCoordinateParser:
             if not self._is_valid_box(l, t, r, b, w, h):
                 return None
 
-            region = image.crop((l, t, r, b)).convert("RGB")
-            bio = io.BytesIO()
-            region.save(bio, format="JPEG", quality=90)
-            bio.seek(0)
-            return ContentFile(bio.getvalue(), name="extracted_photo.jpg")
+            return PhotoDerivatives.from_image(image.crop((l, t, r, b)))
         except Exception:
             logger.exception("extract_photo failed")
             return None
@@ -282,7 +517,19 @@ class JPGCoordinateParser:
             m = RE_IIN.search(text)
             return m.group(1) if m else ""
 
-        if field in ("last_name", "first_name", "patronymic"):
+        if field in DATE_FIELDS:
+            return normalize_date(text)
+
+        if field == "document_number":
+            return re.sub(r"\D", "", text)
+
+        if field in FREE_TEXT_FIELDS:
+            # убираем подписи и мусорную пунктуацию по краям, регистр не трогаем
+            tokens = [w.strip(".,:;|_-") for w in text.split()]
+            tokens = [w for w in tokens if w and w.upper() not in self.free_text_labels and w != "/"]
+            return " ".join(tokens)
+
+        if field in NAME_FIELDS:
             # Сохраняем латиницу + всю кириллицу (включая расширенную \u0400-\u052F),
             # а также дефис и варианты апострофа.
             up = text.upper()
@@ -293,6 +540,11 @@ class JPGCoordinateParser:
                     continue
                 if w2 in self.bad_labels:
                     continue
+                if self.lexicon is not None:
+                    snapped = self.lexicon.snap(w2, self.lexicon_min_confidence)
+                    if snapped != w2:
+                        inc("documents_name_corrections_total", field=field)
+                        w2 = snapped
                 tokens.append(w2)
 
             cleaned = " ".join(tokens)
@@ -301,7 +553,63 @@ class JPGCoordinateParser:
         return text
 
 
+class LazyExtraction(Mapping):
+    """
+    Результат extract_lazy(): ведёт себя как словарь extract_data_from_image
+    (ключи — запрошенные поля и debug_info), но каждое поле распознаётся
+    только при первом обращении и кэшируется.
+    """
+
+    def __init__(self, parser: JPGCoordinateParser, image: Image.Image, coordinates: Dict,
+                 fields: Tuple[str, ...], debug: Dict):
+        self.parser = parser
+        self.image = image
+        self.coordinates = coordinates
+        self.fields = fields
+        self.debug_info = debug
+        self._values: Dict[str, object] = {}
+
+    @property
+    def rejected(self) -> bool:
+        return bool(self.debug_info.get("rejected"))
+
+    def __getitem__(self, key):
+        if key == "debug_info":
+            return self.debug_info
+        if key not in self.fields:
+            raise KeyError(key)
+        if key not in self._values:
+            self._values[key] = self._resolve(key)
+        return self._values[key]
+
+    def __iter__(self):
+        yield from self.fields
+        yield "debug_info"
+
+    def __len__(self):
+        return len(self.fields) + 1
+
+    def _resolve(self, field: str):
+        if self.rejected:
+            return None if field == "photo" else ""
+        try:
+            if field == "photo":
+                return self.parser._read_photo(self.image, self.coordinates, self.debug_info)
+            return self.parser._read_roi(self.image, self.coordinates, field, self.debug_info)
+        except Exception:
+            logger.exception("lazy extraction failed for %s", field)
+            return None if field == "photo" else ""
+
+    def resolved(self) -> Dict[str, object]:
+        """Уже распознанные поля (без запуска OCR)."""
+        return dict(self._values)
+
+    def to_dict(self) -> Dict:
+        """Распознаёт все запрошенные поля и возвращает обычный словарь."""
+        return {key: self[key] for key in self}
+
+
 # Удобная функция-обёртка
-def extract_data_from_jpg_coordinates(jpg_path: str) -> Dict:
+def extract_data_from_jpg_coordinates(jpg_path: str, fields: Optional[Iterable[str]] = None) -> Dict:
     parser = JPGCoordinateParser()
-    return parser.extract_data_from_jpg(jpg_path)
+    return parser.extract_data_from_jpg(jpg_path, fields)
@@ -0,0 +1,307 @@
+# lexicon.py
+"""
+Словарь имён для пост-коррекции ФИО после OCR.
+
+Типичные ошибки tesseract на казахских именах — путаница похожих букв
+(Ә/А, Қ/К, Ұ/Ү/У, І/Ї/I, Ғ/Г, Ң/Н, Ө/О, Һ/Х, латиница вместо кириллицы)
+и одна-две потерянные/лишние буквы. Поэтому:
+
+1) слово «сворачивается» (fold): каждая буква заменяется представителем
+   своего класса путаницы — такие замены ничего не стоят;
+2) по свёрнутым словам строится индекс symmetric delete (как в SymSpell):
+   все варианты префикса слова с удалением до max_distance букв -> слова.
+   Поиск — те же удаления у токена, пересечение по словарю, проверка
+   расстоянием Дамерау-Левенштейна (OSA) по свёрнутым строкам.
+
+Индекс строится один раз (manage.py build_name_lexicon) и хранится
+pickle-файлом DOCUMENTS_NAME_LEXICON (по умолчанию BASE_DIR/name_lexicon.pkl).
+Загружается при первом обращении (или в prewarm); нет файла — коррекции нет.
+Токен заменяется словарным, только если уверенность
+1 - расстояние / длина не ниже DOCUMENTS_NAME_LEXICON_MIN_CONFIDENCE
+(по умолчанию 0.85: правка вне классов путаницы — только у слов от
+7 букв, иначе реальные имена вне словаря стягиваются к соседним —
+ДАНИЯ -> ДАНИЯР) и лучший кандидат однозначен. Е и Ё путаются, но
+написание через Е не ошибка: токен, который отличается от словарного
+слова только Е/Ё, не трогаем.
+"""
+import logging
+import os
+import pickle
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 1
+DEFAULT_MAX_DISTANCE = 2
+# удаления считаем только в префиксе: индекс компактнее, отбор кандидатов тот же
+DEFAULT_PREFIX_LENGTH = 7
+DEFAULT_MIN_CONFIDENCE = 0.85
+# короче — не трогаем: у двух-трёхбуквенных токенов слишком много соседей
+MIN_TOKEN_LENGTH = 4
+
+# Классы путаницы OCR: буква -> представитель класса
+CONFUSION_CLASSES = (
+    "АӘA",
+    "КҚK",
+    "УҰҮY",
+    "ІЇIÏ",
+    "ГҒ",
+    "НҢH",
+    "ОӨO0",
+    "ХҺX",
+    "ЕЁE",
+    "ВB",
+    "СC",
+    "РP",
+    "ТT",
+    "МM",
+)
+FOLD = {ch: cls[0] for cls in CONFUSION_CLASSES for ch in cls}
+
+
+def fold(word: str) -> str:
+    return "".join(FOLD.get(ch, ch) for ch in word.upper())
+
+
+def _without_yo(word: str) -> str:
+    return word.upper().replace("Ё", "Е")
+
+
+def osa_distance(a: str, b: str, limit: int) -> int:
+    """Дамерау-Левенштейн (optimal string alignment); больше limit — limit + 1."""
+    if a == b:
+        return 0
+    la, lb = len(a), len(b)
+    if abs(la - lb) > limit:
+        return limit + 1
+    prev2: List[int] = []
+    prev = list(range(lb + 1))
+    for i in range(1, la + 1):
+        cur = [i] + [0] * lb
+        row_min = i
+        ca = a[i - 1]
+        for j in range(1, lb + 1):
+            cost = 0 if ca == b[j - 1] else 1
+            v = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + cost)
+            if i > 1 and j > 1 and ca == b[j - 2] and a[i - 2] == b[j - 1]:
+                v = min(v, prev2[j - 2] + 1)
+            cur[j] = v
+            if v < row_min:
+                row_min = v
+        if row_min > limit:
+            return limit + 1
+        prev2, prev = prev, cur
+    return prev[lb] if prev[lb] <= limit else limit + 1
+
+
+def _deletes(word: str, max_distance: int) -> set:
+    """Все варианты word с удалением от 0 до max_distance букв."""
+    out = {word}
+    frontier = {word}
+    for _ in range(max_distance):
+        nxt = set()
+        for w in frontier:
+            if len(w) <= 1:
+                continue
+            for i in range(len(w)):
+                nxt.add(w[:i] + w[i + 1:])
+        nxt -= out
+        out |= nxt
+        frontier = nxt
+    return out
+
+
+class NameLexicon:
+    def __init__(self, words: List[str], freq: List[int], deletes: Dict[str, Tuple[int, ...]],
+                 max_distance: int = DEFAULT_MAX_DISTANCE, prefix_length: int = DEFAULT_PREFIX_LENGTH):
+        self.words = words
+        self.freq = freq
+        self.folded = [fold(w) for w in words]
+        # быстрый путь: токен совпал со словом с точностью до путаницы букв
+        self.by_folded: Dict[str, List[int]] = {}
+        for idx, key in enumerate(self.folded):
+            self.by_folded.setdefault(key, []).append(idx)
+        self.deletes = deletes
+        self.max_distance = max_distance
+        self.prefix_length = prefix_length
+
+    # --- построение и хранение ---
+
+    @classmethod
+    def build(cls, names: Iterable[Tuple[str, int]], max_distance: int = DEFAULT_MAX_DISTANCE,
+              prefix_length: int = DEFAULT_PREFIX_LENGTH) -> "NameLexicon":
+        """names — пары (имя, частота); повторы суммируются."""
+        counts: Dict[str, int] = {}
+        for name, count in names:
+            name = name.strip().upper()
+            if len(name) >= 2:
+                counts[name] = counts.get(name, 0) + max(1, int(count))
+        words = sorted(counts)
+        freq = [counts[w] for w in words]
+
+        index: Dict[str, List[int]] = {}
+        for idx, word in enumerate(words):
+            for variant in _deletes(fold(word)[:prefix_length], max_distance):
+                index.setdefault(variant, []).append(idx)
+        deletes = {k: tuple(v) for k, v in index.items()}
+        return cls(words, freq, deletes, max_distance, prefix_length)
+
+    def dump(self, path: str):
+        data = {
+            "version": FORMAT_VERSION,
+            "max_distance": self.max_distance,
+            "prefix_length": self.prefix_length,
+            "words": self.words,
+            "freq": self.freq,
+            "deletes": self.deletes,
+        }
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str) -> "NameLexicon":
+        with open(path, "rb") as f:
+            data = pickle.load(f)
+        if data.get("version") != FORMAT_VERSION:
+            raise ValueError(f"{path}: версия индекса {data.get('version')}, нужна {FORMAT_VERSION}")
+        return cls(data["words"], data["freq"], data["deletes"], data["max_distance"], data["prefix_length"])
+
+    def __len__(self):
+        return len(self.words)
+
+    # --- поиск ---
+
+    def lookup(self, token: str) -> Optional[Tuple[str, float]]:
+        """
+        (словарное слово, уверенность) для токена или None.
+        Неоднозначные совпадения (разные слова на одном расстоянии и с одной
+        частотой) — None.
+        """
+        token = token.upper()
+        key = fold(token)
+        candidates = self.by_folded.get(key)
+        if not candidates:
+            candidates = set()
+            for variant in _deletes(key[:self.prefix_length], self.max_distance):
+                candidates.update(self.deletes.get(variant, ()))
+        if not candidates:
+            return None
+
+        best_dist, best = self.max_distance + 1, []
+        for idx in candidates:
+            dist = 0 if self.folded[idx] == key else osa_distance(key, self.folded[idx], self.max_distance)
+            if dist < best_dist:
+                best_dist, best = dist, [idx]
+            elif dist == best_dist:
+                best.append(idx)
+        if not best:
+            return None
+
+        if len(best) == 1:
+            idx = best[0]
+        else:
+            # при равном расстоянии по классам — ближе по буквам, затем чаще встречается
+            ranked = sorted(
+                ((osa_distance(token, self.words[i], len(token)), -self.freq[i]), i) for i in best
+            )
+            if ranked[0][0] == ranked[1][0]:
+                return None
+            idx = ranked[0][1]
+        dist = best_dist
+        word = self.words[idx]
+        confidence = 1.0 - dist / max(len(key), len(self.folded[idx]))
+        return word, round(confidence, 3)
+
+    def snap(self, token: str, min_confidence: float = DEFAULT_MIN_CONFIDENCE) -> str:
+        """Токен -> словарное слово (в верхнем регистре), если уверенно; иначе как был."""
+        if len(token) < MIN_TOKEN_LENGTH:
+            return token
+        if "-" in token:
+            return "-".join(self.snap(part, min_confidence) for part in token.split("-"))
+        found = self.lookup(token)
+        if found is None or found[1] < min_confidence:
+            return token
+        if _without_yo(found[0]) == _without_yo(token):
+            return token
+        return found[0]
+
+
+def builtin_names() -> List[Tuple[str, int]]:
+    """
+    Имена генератора synthetic.py со всеми формами, которые он порождает
+    (женские фамилии, отчества). Только для замеров на синтетике: на живых
+    документах такой маленький словарь стягивает чужие имена к своим.
+    """
+    from . import synthetic as syn
+
+    names = []
+    for surname in syn.KZ_SURNAMES + syn.RU_SURNAMES:
+        names += [(surname, 1), (surname + "а", 1)]
+    for first in syn.KZ_MALE_NAMES + syn.KZ_FEMALE_NAMES + syn.RU_MALE_NAMES + syn.RU_FEMALE_NAMES:
+        names.append((first, 1))
+    for father in syn.KZ_MALE_NAMES:
+        names += [(father + "ұлы", 1), (father + "қызы", 1)]
+    for male, female in syn.RU_PATRONYMICS:
+        names += [(male, 1), (female, 1)]
+    return names
+
+
+def read_names(path: str) -> List[Tuple[str, int]]:
+    """Файл имён: по строке «имя» или «имя<TAB>частота»; # — комментарий."""
+    names = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            name, _, count = line.partition("\t")
+            names.append((name.strip(), int(count) if count.strip().isdigit() else 1))
+    return names
+
+# ---------------------
+# ЗАГРУЗКА
+# ---------------------
+
+_lexicon: Optional[NameLexicon] = None
+_loaded = False
+_lock = threading.Lock()
+
+
+def lexicon_path() -> str:
+    return getattr(settings, "DOCUMENTS_NAME_LEXICON", os.path.join(settings.BASE_DIR, "name_lexicon.pkl"))
+
+
+def min_confidence() -> float:
+    return float(getattr(settings, "DOCUMENTS_NAME_LEXICON_MIN_CONFIDENCE", DEFAULT_MIN_CONFIDENCE))
+
+
+def get_lexicon() -> Optional[NameLexicon]:
+    """Индекс процесса (загружается один раз); None — файла нет или он не читается."""
+    global _lexicon, _loaded
+    if not _loaded:
+        with _lock:
+            if not _loaded:
+                path = lexicon_path()
+                if path and os.path.exists(path):
+                    t0 = time.perf_counter()
+                    try:
+                        _lexicon = NameLexicon.load(path)
+                        logger.info("Name lexicon: %d слов за %.1f мс", len(_lexicon),
+                                    (time.perf_counter() - t0) * 1000.0)
+                    except Exception:
+                        logger.exception("Failed to load name lexicon %s", path)
+                _loaded = True
+    return _lexicon
+
+
+def reset():
+    """Перечитать индекс при следующем обращении (после пересборки)."""
+    global _lexicon, _loaded
+    with _lock:
+        _lexicon, _loaded = None, False
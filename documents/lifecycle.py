@@ -0,0 +1,186 @@
+# lifecycle.py
+"""
+Жизненный цикл файлов в MEDIA_ROOT.
+
+У документа есть исходник (pdf_file / jpg_file) и производные файлы:
+фото и его размеры (photo, photo_variants) и промежуточные артефакты
+(artifacts: {"page": растр страницы PDF, ...}). Всё, что документ создал,
+перечислено в document_files() и удаляется вместе с ним.
+
+Растр страницы по умолчанию удаляется сразу после OCR
+(DOCUMENTS_KEEP_PAGE_RASTER=True — оставить и записать в artifacts).
+
+find_orphans() потоково обходит каталоги хранилища и пачками отдаёт файлы,
+на которые не ссылается ни один документ (manage.py gc_media).
+"""
+import os
+import logging
+from datetime import timedelta
+from typing import Iterator, List, Optional, Set
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+
+from .derivatives import delete_files
+
+logger = logging.getLogger(__name__)
+
+# Каталоги хранилища, которые ведёт приложение (upload_to полей Document
+# и недописанные загрузки uploads.STAGING_DIR)
+MANAGED_DIRS = ("pdfs", "jpgs", "photos", "uploads_tmp")
+
+# Моложе этого файлы не считаем сиротами: загрузка может быть ещё в процессе
+DEFAULT_MIN_AGE = timedelta(hours=24)
+
+
+def keep_page_raster() -> bool:
+    return getattr(settings, "DOCUMENTS_KEEP_PAGE_RASTER", False)
+
+
+def storage_name(path: str) -> Optional[str]:
+    """Абсолютный путь внутри MEDIA_ROOT -> имя в хранилище (None, если снаружи)."""
+    root = os.path.abspath(settings.MEDIA_ROOT)
+    path = os.path.abspath(path)
+    if os.path.commonpath([root, path]) != root:
+        return None
+    return os.path.relpath(path, root).replace(os.sep, "/")
+
+
+def discard_path(path: Optional[str]):
+    """Удаляет промежуточный файл по пути (растр страницы, временный файл)."""
+    if not path:
+        return
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+    except OSError:
+        logger.warning("Failed to remove %s", path, exc_info=True)
+
+# ---------------------
+# ФАЙЛЫ ДОКУМЕНТА
+# ---------------------
+
+def document_files(document, source: bool = True) -> Set[str]:
+    """Имена всех файлов документа в хранилище: исходник (source=True) + производные."""
+    names = set((document.photo_variants or {}).values()) | set((document.artifacts or {}).values())
+    if document.photo:
+        names.add(document.photo.name)
+    if source:
+        names.update(f.name for f in (document.pdf_file, document.jpg_file) if f)
+    return {n for n in names if n}
+
+
+def delete_document_files(document, source: bool = True):
+    """
+    Удаляет файлы документа после коммита (откат не оставит битых ссылок).
+    Фото адресуется по содержимому и может принадлежать и другому документу —
+    такое не трогаем.
+    """
+    from .models import Document
+
+    names = document_files(document, source=source)
+    if document.photo:
+        shared = Document.objects.filter(photo=document.photo.name).exclude(pk=document.pk).exists()
+        if shared:
+            names -= set((document.photo_variants or {}).values()) | {document.photo.name}
+    if not names:
+        return
+
+    storage = default_storage
+    transaction.on_commit(lambda: delete_files(names, storage))
+
+
+def discard_failed(document):
+    """Загрузка не обработалась: удаляем документ (файлы — через post_delete)."""
+    try:
+        if document.pk:
+            document.delete()
+        else:
+            delete_document_files(document)
+    except Exception:
+        logger.exception("Failed to discard document %s", document.pk)
+
+# ---------------------
+# СИРОТЫ
+# ---------------------
+
+def referenced_names(chunk_size: int = 2000) -> Set[str]:
+    """Все имена файлов, на которые ссылаются документы (читаем БД потоково)."""
+    from .models import Document
+
+    names: Set[str] = set()
+    rows = Document.objects.values_list(
+        "pdf_file", "jpg_file", "photo", "photo_variants", "artifacts",
+    ).iterator(chunk_size=chunk_size)
+    for pdf, jpg, photo, variants, artifacts in rows:
+        names.update(n for n in (pdf, jpg, photo) if n)
+        names.update((variants or {}).values())
+        names.update((artifacts or {}).values())
+    return names
+
+
+def _relative_name(storage, path: str) -> str:
+    return os.path.relpath(path, storage.location).replace(os.sep, "/")
+
+
+def iter_storage(storage=None, prefix: str = "") -> Iterator[str]:
+    """
+    Имена файлов под prefix. Для файловой системы — os.scandir (без чтения
+    всего дерева в память), для прочих хранилищ — listdir по каталогам.
+    """
+    storage = storage or default_storage
+    try:
+        root = storage.path(prefix)
+    except NotImplementedError:
+        root = None
+
+    if root is not None:
+        if not os.path.isdir(root):
+            return
+        stack = [root]
+        while stack:
+            with os.scandir(stack.pop()) as it:
+                for entry in it:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        yield _relative_name(storage, entry.path)
+        return
+
+    dirs, files = storage.listdir(prefix)
+    for f in files:
+        yield f"{prefix}/{f}" if prefix else f
+    for d in dirs:
+        yield from iter_storage(storage, f"{prefix}/{d}" if prefix else d)
+
+
+def find_orphans(
+    storage=None,
+    prefixes=MANAGED_DIRS,
+    batch_size: int = 500,
+    min_age: timedelta = DEFAULT_MIN_AGE,
+) -> Iterator[List[str]]:
+    """Пачки файлов без ссылок из БД, старше min_age."""
+    storage = storage or default_storage
+    referenced = referenced_names()
+    cutoff = timezone.now() - min_age
+
+    batch: List[str] = []
+    for prefix in prefixes:
+        for name in iter_storage(storage, prefix):
+            if name in referenced:
+                continue
+            try:
+                if storage.get_modified_time(name) > cutoff:
+                    continue
+            except (NotImplementedError, OSError):
+                pass
+            batch.append(name)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+    if batch:
+        yield batch
@@ -0,0 +1,141 @@
+import json
+import os
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from documents.benchmark import summarize
+from documents.lexicon import (
+    CONFUSION_CLASSES,
+    DEFAULT_MAX_DISTANCE,
+    DEFAULT_PREFIX_LENGTH,
+    NameLexicon,
+    builtin_names,
+    lexicon_path,
+    min_confidence,
+    read_names,
+    reset,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Сборка индекса имён для коррекции ФИО (lexicon.py) и замер: время загрузки "
+        "pickle, скорость поиска и точность на токенах с типичными ошибками OCR."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--names", action="append", default=[],
+                            help="Файл имён (строка: имя или имя<TAB>частота); можно несколько")
+        parser.add_argument("--builtin", action="store_true",
+                            help="Добавить имена генератора synthetic.py (для замеров на синтетике)")
+        parser.add_argument("--output", help="Куда записать индекс (по умолчанию DOCUMENTS_NAME_LEXICON)")
+        parser.add_argument("--max-distance", type=int, default=DEFAULT_MAX_DISTANCE)
+        parser.add_argument("--prefix-length", type=int, default=DEFAULT_PREFIX_LENGTH)
+        parser.add_argument("--bench", type=int, default=20000, help="Сколько поисков замерить (0 — без замера)")
+        parser.add_argument("--seed", type=int, default=7)
+        parser.add_argument("--report", help="Куда записать JSON с замерами")
+
+    def handle(self, *args, **opts):
+        names = builtin_names() if opts["builtin"] else []
+        for path in opts["names"]:
+            if not os.path.isfile(path):
+                raise CommandError(f"Нет файла {path}")
+            names += read_names(path)
+        if not names:
+            raise CommandError("Пустой словарь: укажите --names (или --builtin для синтетики)")
+
+        output = opts["output"] or lexicon_path()
+        t0 = time.perf_counter()
+        lexicon = NameLexicon.build(names, opts["max_distance"], opts["prefix_length"])
+        build_s = time.perf_counter() - t0
+        lexicon.dump(output)
+        reset()
+
+        report = {
+            "path": output,
+            "words": len(lexicon),
+            "delete_keys": len(lexicon.deletes),
+            "file_bytes": os.path.getsize(output),
+            "max_distance": lexicon.max_distance,
+            "prefix_length": lexicon.prefix_length,
+            "build_ms": round(build_s * 1000.0, 2),
+            "load_ms": self._load_ms(output),
+        }
+        if opts["bench"]:
+            report["lookup"] = self._bench(lexicon, opts["bench"], random.Random(opts["seed"]))
+
+        if opts["report"]:
+            with open(opts["report"], "w", encoding="utf-8") as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+
+        self.stdout.write(
+            f"{output}: {report['words']} слов, {report['delete_keys']} ключей, "
+            f"{report['file_bytes'] // 1024} КБ; сборка {report['build_ms']} мс, загрузка {report['load_ms']} мс"
+        )
+        if "lookup" in report:
+            lk = report["lookup"]
+            self.stdout.write(
+                f"поиск: {lk['lookups_per_sec']} в секунду, p50 {lk['latency']['p50_ms'] * 1000:.1f} мкс, "
+                f"p95 {lk['latency']['p95_ms'] * 1000:.1f} мкс; исправлено {lk['corrected']}/{lk['noisy']} "
+                f"искажённых, ложных замен {lk['false_snaps']}/{lk['clean']} верных"
+            )
+
+    @staticmethod
+    def _load_ms(path, repeats=5):
+        """Медиана времени загрузки pickle (как при старте воркера)."""
+        times = []
+        for _ in range(repeats):
+            t0 = time.perf_counter()
+            NameLexicon.load(path)
+            times.append(time.perf_counter() - t0)
+        return round(sorted(times)[len(times) // 2] * 1000.0, 2)
+
+    @staticmethod
+    def _noisy(word, rng):
+        """Искажение как у OCR: перепутанная буква из класса путаницы и/или потерянная буква."""
+        peers = {ch: cls for cls in CONFUSION_CLASSES for ch in cls}
+        chars = list(word)
+        swappable = [i for i, ch in enumerate(chars) if ch in peers and len(peers[ch]) > 1]
+        if swappable:
+            i = rng.choice(swappable)
+            chars[i] = rng.choice([c for c in peers[chars[i]] if c != chars[i]])
+        if len(chars) > 6 and rng.random() < 0.3:
+            del chars[rng.randrange(1, len(chars))]
+        return "".join(chars)
+
+    def _bench(self, lexicon, count, rng):
+        threshold = min_confidence()
+        samples = []
+        for _ in range(count):
+            word = rng.choice(lexicon.words)
+            # половина — уже верные токены (их трогать нельзя), половина — искажённые
+            token = word if rng.random() < 0.5 else self._noisy(word, rng)
+            samples.append((token, word))
+
+        timings = []
+        corrected = noisy = false_snaps = clean = 0
+        t_all = time.perf_counter()
+        for token, word in samples:
+            t0 = time.perf_counter()
+            out = lexicon.snap(token, threshold)
+            timings.append(time.perf_counter() - t0)
+            if token == word:
+                clean += 1
+                false_snaps += out != word
+            else:
+                noisy += 1
+                corrected += out == word
+        total = time.perf_counter() - t_all
+
+        return {
+            "count": count,
+            "min_confidence": threshold,
+            "lookups_per_sec": round(count / total) if total else 0,
+            "latency": summarize(timings),
+            "noisy": noisy,
+            "corrected": corrected,
+            "clean": clean,
+            "false_snaps": false_snaps,
+        }
@@ -0,0 +1,51 @@
+from datetime import timedelta
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from documents.derivatives import delete_files
+from documents.lifecycle import MANAGED_DIRS, find_orphans
+
+
+class Command(BaseCommand):
+    help = (
+        "Поиск файлов в MEDIA_ROOT, на которые не ссылается ни один документ. "
+        "По умолчанию только отчёт; --delete удаляет."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--delete", action="store_true", help="Удалить найденные файлы")
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument("--min-age-hours", type=float, default=24.0,
+                            help="Файлы моложе не трогаем (загрузка может быть в процессе)")
+        parser.add_argument("--dirs", default=",".join(MANAGED_DIRS),
+                            help="Каталоги хранилища через запятую")
+        parser.add_argument("--list", action="store_true", help="Печатать имена найденных файлов")
+
+    def handle(self, *args, **opts):
+        storage = default_storage
+        prefixes = [d.strip().strip("/") for d in opts["dirs"].split(",") if d.strip()]
+        found = size = 0
+
+        for batch in find_orphans(
+            storage,
+            prefixes=prefixes,
+            batch_size=opts["batch_size"],
+            min_age=timedelta(hours=opts["min_age_hours"]),
+        ):
+            for name in batch:
+                try:
+                    size += storage.size(name)
+                except OSError:
+                    pass
+                if opts["list"]:
+                    self.stdout.write(f"  {name}")
+            found += len(batch)
+            if opts["delete"]:
+                delete_files(batch, storage)
+            self.stdout.write(f"... {found} файлов")
+
+        action = "удалено" if opts["delete"] else "найдено (без удаления)"
+        self.stdout.write(self.style.SUCCESS(
+            f"Сирот {action}: {found}, {size / (1024 * 1024):.1f} МБ"
+        ))
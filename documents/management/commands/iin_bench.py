@@ -0,0 +1,83 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from PIL import Image
+
+from documents.benchmark import summarize
+from documents.digits import recognize_iin
+from documents.jpg_parser import JPGCoordinateParser
+from documents.synthetic import load_corpus
+from documents.utils import convert_pdf_to_jpg
+
+
+class Command(BaseCommand):
+    help = "Сравнение движков ИИН на ROI корпуса: _ocr (tesseract), hOCR + checksum, шаблонный распознаватель"
+
+    def add_arguments(self, parser):
+        parser.add_argument("corpus_dir")
+        parser.add_argument("--limit", type=int, default=None)
+        parser.add_argument("--output", help="Куда записать JSON-отчёт")
+
+    def handle(self, *args, **opts):
+        samples = [s for s in load_corpus(opts["corpus_dir"]) if s.get("truth", {}).get("iin")]
+        if opts["limit"]:
+            samples = samples[:opts["limit"]]
+        if not samples:
+            raise CommandError("Нет документов с эталонным ИИН")
+
+        parser = JPGCoordinateParser()
+        coords = parser.coordinates["iin"]
+        engines = {
+            "tesseract": lambda img: parser._clean("iin", parser._ocr(img, "iin")),
+            "tesseract_checksum": lambda img: parser._clean("iin", parser._ocr_iin(img)[0]),
+            "template": lambda img: recognize_iin(img),
+        }
+        timings = {name: [] for name in engines}
+        hits = {name: 0 for name in engines}
+        template_sure = template_sure_hits = 0
+
+        for sample in samples:
+            path = sample.get("jpg") or convert_pdf_to_jpg(sample["pdf"])
+            if not path:
+                continue
+            image = Image.open(path)
+            w, h = image.size
+            roi = image.crop(parser._to_pixels(coords, w, h))
+            enhanced = parser._enhance_for_ocr(roi, "iin")
+            truth = sample["truth"]["iin"]
+
+            for name, engine in engines.items():
+                t0 = time.perf_counter()
+                out = engine(enhanced)
+                timings[name].append(time.perf_counter() - t0)
+                if name == "template":
+                    if out["sure"]:
+                        template_sure += 1
+                        template_sure_hits += out["iin"] == truth
+                    out = out["iin"]
+                hits[name] += out == truth
+
+        n = len(timings["tesseract"])
+        report = {
+            "documents": n,
+            "engines": {
+                name: {"accuracy": round(hits[name] / n, 4) if n else 0.0, **summarize(timings[name])}
+                for name in engines
+            },
+            "template_sure_rate": round(template_sure / n, 4) if n else 0.0,
+            "template_sure_accuracy": round(template_sure_hits / template_sure, 4) if template_sure else 0.0,
+        }
+
+        if opts["output"]:
+            with open(opts["output"], "w", encoding="utf-8") as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+
+        for name, stats in report["engines"].items():
+            self.stdout.write(
+                f"{name:<20} точность {stats['accuracy']:.2%}  p50={stats['p50_ms']}ms p95={stats['p95_ms']}ms"
+            )
+        self.stdout.write(
+            f"template уверен в {report['template_sure_rate']:.2%} случаев, "
+            f"точность при уверенности {report['template_sure_accuracy']:.2%}"
+        )
@@ -0,0 +1,43 @@
+import json
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from documents.synthetic import generate_corpus
+
+
+class Command(BaseCommand):
+    help = "Генерирует синтетические удостоверения (PDF + JPG) с эталонной разметкой"
+
+    def add_arguments(self, parser):
+        parser.add_argument("out_dir", help="Каталог для корпуса")
+        parser.add_argument("--count", type=int, default=50)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--noise", type=float, default=0.0, help="Сила шума 0..1")
+        parser.add_argument("--blur", type=float, default=0.0, help="Радиус размытия, px")
+        parser.add_argument("--rotation", type=float, default=0.0, help="Макс. угол поворота, градусы")
+        parser.add_argument(
+            "--fonts-dir",
+            default=os.path.join(settings.BASE_DIR, "static", "fonts"),
+            help="Каталог со шрифтами HelveticaNeue-*.otf",
+        )
+
+    def handle(self, *args, **opts):
+        coords_file = os.path.join(settings.BASE_DIR, "coordinate_config.json")
+        with open(coords_file, "r", encoding="utf-8") as f:
+            coordinates = json.load(f)
+
+        manifest = generate_corpus(
+            opts["out_dir"],
+            opts["count"],
+            coordinates,
+            opts["fonts_dir"],
+            seed=opts["seed"],
+            noise=opts["noise"],
+            blur=opts["blur"],
+            rotation=opts["rotation"],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Сгенерировано {len(manifest['samples'])} документов в {opts['out_dir']}"
+        ))
@@ -0,0 +1,49 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from documents.benchmark import DEFAULT_FIELDS, compare, run_benchmark
+from documents.synthetic import load_corpus
+
+
+class Command(BaseCommand):
+    help = "Бенчмарк extract_data_from_pdf: латентность по стадиям, docs/sec, точность полей"
+
+    def add_arguments(self, parser):
+        parser.add_argument("corpus_dir", help="Каталог корпуса (manifest.json или <имя>.pdf + <имя>.json)")
+        parser.add_argument("--limit", type=int, default=None)
+        parser.add_argument("--warmup", type=int, default=1)
+        parser.add_argument("--fields", default=",".join(DEFAULT_FIELDS),
+                            help="Поля для сравнения через запятую")
+        parser.add_argument("--output", help="Куда записать JSON-отчёт")
+        parser.add_argument("--compare", dest="compare_with", help="JSON-отчёт для сравнения")
+
+    def handle(self, *args, **opts):
+        samples = load_corpus(opts["corpus_dir"])
+        if opts["limit"]:
+            samples = samples[:opts["limit"]]
+        if not samples:
+            raise CommandError(f"В {opts['corpus_dir']} нет размеченных документов")
+
+        fields = [f.strip() for f in opts["fields"].split(",") if f.strip()]
+        report = run_benchmark(samples, fields=fields, warmup=opts["warmup"])
+
+        if opts["compare_with"]:
+            with open(opts["compare_with"], "r", encoding="utf-8") as f:
+                report["diff"] = compare(report, json.load(f))
+
+        if opts["output"]:
+            with open(opts["output"], "w", encoding="utf-8") as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+
+        self.stdout.write(f"Документов: {report['documents']}, {report['docs_per_sec']} docs/sec")
+        for stage, stats in report["stages"].items():
+            self.stdout.write(
+                f"  {stage:<8} p50={stats['p50_ms']}ms p95={stats['p95_ms']}ms p99={stats['p99_ms']}ms"
+            )
+        acc = report["accuracy"]
+        self.stdout.write(f"Точность: {acc['overall']:.2%} (все поля верны: {acc['documents_all_correct']:.2%})")
+        for field, value in acc["fields"].items():
+            self.stdout.write(f"  {field:<12} {value:.2%}")
+        if "diff" in report:
+            self.stdout.write(json.dumps(report["diff"], ensure_ascii=False, indent=2))
@@ -0,0 +1,89 @@
+import json
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from documents.benchmark import DEFAULT_FIELDS, run_parallel
+from documents.synthetic import load_corpus
+
+
+class Command(BaseCommand):
+    help = (
+        "Регрессионный прогон золотого корпуса через extract_data_from_pdf. "
+        "Код выхода != 0, если точность упала или p95 вырос сверх порогов."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("corpus_dir", help="Каталог корпуса (manifest.json или <имя>.pdf + <имя>.json)")
+        parser.add_argument("--baseline", help="Базовый JSON (по умолчанию <corpus_dir>/baseline.json)")
+        parser.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+        parser.add_argument("--fields", default=",".join(DEFAULT_FIELDS))
+        parser.add_argument("--max-accuracy-drop", type=float, default=0.01,
+                            help="Допустимое падение точности (абсолютное, по общему и по каждому полю)")
+        parser.add_argument("--max-p95-growth", type=float, default=0.15,
+                            help="Допустимый относительный рост p95 общей латентности (0.15 = +15%%)")
+        parser.add_argument("--update-baseline", action="store_true",
+                            help="Записать текущий прогон как новый baseline")
+        parser.add_argument("--output", help="Куда записать JSON-отчёт текущего прогона")
+
+    def handle(self, *args, **opts):
+        samples = load_corpus(opts["corpus_dir"])
+        if not samples:
+            raise CommandError(f"В {opts['corpus_dir']} нет размеченных документов")
+
+        baseline_path = opts["baseline"] or os.path.join(opts["corpus_dir"], "baseline.json")
+        fields = [f.strip() for f in opts["fields"].split(",") if f.strip()]
+
+        report = run_parallel(samples, fields=fields, workers=opts["workers"])
+
+        if opts["output"]:
+            with open(opts["output"], "w", encoding="utf-8") as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+
+        acc = report["accuracy"]
+        p95 = report["stages"]["total"]["p95_ms"]
+        self.stdout.write(
+            f"Документов: {report['documents']}, точность {acc['overall']:.2%}, "
+            f"p95 {p95} мс, {report['docs_per_sec']} docs/sec"
+        )
+
+        if opts["update_baseline"]:
+            report.pop("runs", None)  # в baseline храним только сводку
+            with open(baseline_path, "w", encoding="utf-8") as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Baseline обновлён: {baseline_path}"))
+            return
+
+        if not os.path.exists(baseline_path):
+            raise CommandError(f"Нет baseline {baseline_path}; запустите с --update-baseline")
+        with open(baseline_path, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+
+        if baseline.get("meta", {}).get("workers") != opts["workers"]:
+            self.stdout.write(self.style.WARNING(
+                f"Baseline снят с workers={baseline.get('meta', {}).get('workers')}, "
+                f"текущий прогон — {opts['workers']}: латентность может быть несопоставима"
+            ))
+
+        failures = []
+        max_drop = opts["max_accuracy_drop"]
+        base_acc = baseline.get("accuracy", {})
+
+        drop = base_acc.get("overall", 0) - acc["overall"]
+        if drop > max_drop:
+            failures.append(f"общая точность {base_acc.get('overall', 0):.2%} -> {acc['overall']:.2%}")
+        for field, value in acc["fields"].items():
+            base_value = base_acc.get("fields", {}).get(field)
+            if base_value is not None and base_value - value > max_drop:
+                failures.append(f"точность {field} {base_value:.2%} -> {value:.2%}")
+
+        base_p95 = baseline.get("stages", {}).get("total", {}).get("p95_ms")
+        if base_p95:
+            growth = (p95 - base_p95) / base_p95
+            self.stdout.write(f"p95: {base_p95} -> {p95} мс ({growth:+.1%})")
+            if growth > opts["max_p95_growth"]:
+                failures.append(f"p95 вырос на {growth:.1%} (порог {opts['max_p95_growth']:.0%})")
+
+        if failures:
+            raise CommandError("Регрессия: " + "; ".join(failures))
+        self.stdout.write(self.style.SUCCESS("Регрессий нет"))
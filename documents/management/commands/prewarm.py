@@ -0,0 +1,43 @@
+import subprocess
+import sys
+
+from django.core.management.base import BaseCommand
+
+from documents.warmup import prewarm
+
+# Модули, время импорта которых показываем отдельно
+HEAVY_MODULES = ("weasyprint", "pdf2image", "pytesseract", "PIL.Image", "documents.views")
+
+
+class Command(BaseCommand):
+    help = "Прогрев зависимостей OCR/экспорта и отчёт о времени импорта"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--no-ocr", action="store_true")
+        parser.add_argument("--no-pdf", action="store_true")
+        parser.add_argument("--import-times", action="store_true",
+                            help="Замерить холодный импорт тяжёлых модулей в отдельных процессах")
+
+    def handle(self, *args, **opts):
+        if opts["import_times"]:
+            self.stdout.write("Холодный импорт (отдельный интерпретатор на модуль):")
+            for module in HEAVY_MODULES:
+                self.stdout.write(f"  {module:<18} {self._cold_import_ms(module)}")
+
+        timings = prewarm(ocr=not opts["no_ocr"], pdf_export=not opts["no_pdf"])
+        self.stdout.write("Прогрев:")
+        for step, ms in timings.items():
+            self.stdout.write(f"  {step:<18} {ms} мс")
+
+    @staticmethod
+    def _cold_import_ms(module: str) -> str:
+        code = (
+            "import os, time, django;"
+            "os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'datas.settings');"
+            "django.setup();"
+            "t = time.perf_counter();"
+            f"import {module};"
+            "print(round((time.perf_counter() - t) * 1000, 2))"
+        )
+        out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True)
+        return f"{out.stdout.strip()} мс" if out.returncode == 0 else "ошибка импорта"
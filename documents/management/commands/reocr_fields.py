@@ -0,0 +1,101 @@
+import json
+import time
+from collections import Counter
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from documents.coordinates import field_versions, stale_fields
+from documents.jpg_parser import JPGCoordinateParser
+from documents.models import Document
+from documents.reocr import reocr_document
+
+
+class Command(BaseCommand):
+    help = (
+        "После перекалибровки ROI: перечитывает только поля, распознанные со старыми "
+        "рамками (extraction_meta), и только у затронутых документов. "
+        "Старые размеры фото после перечитывания photo удалит gc_media."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--fields", help="Ограничиться полями (через запятую)")
+        parser.add_argument("--include-unversioned", action="store_true",
+                            help="Перечитывать и поля без записанной версии (документы до версионирования)")
+        parser.add_argument("--dry-run", action="store_true", help="Только посчитать затронутые документы")
+        parser.add_argument("--batch-size", type=int, default=100)
+        parser.add_argument("--limit", type=int, default=0, help="Не больше N документов (0 — все)")
+        parser.add_argument("--output", help="Куда записать JSON со статистикой")
+
+    def handle(self, *args, **opts):
+        parser = JPGCoordinateParser()
+        current = field_versions(parser.coordinates)
+        fields = None
+        if opts["fields"]:
+            fields = [f.strip() for f in opts["fields"].split(",") if f.strip()]
+            unknown = [f for f in fields if f not in current]
+            if unknown:
+                raise CommandError(f"Нет рамок для полей: {', '.join(unknown)}")
+
+        # 1) какие документы и поля устарели — читаем только extraction_meta
+        plan = []
+        rows = Document.objects.only("id", "extraction_meta").order_by("id").iterator(chunk_size=2000)
+        for document in rows:
+            stale = stale_fields(document, current, fields, opts["include_unversioned"])
+            if stale:
+                plan.append((document.pk, stale))
+                if opts["limit"] and len(plan) >= opts["limit"]:
+                    break
+
+        by_field = Counter(f for _, stale in plan for f in stale)
+        stats = {
+            "documents": len(plan),
+            "ocr_calls": sum(by_field.values()),
+            "by_field": dict(by_field),
+            "dry_run": opts["dry_run"],
+        }
+        self.stdout.write(
+            f"Устарело: {stats['documents']} документов, {stats['ocr_calls']} полей {dict(by_field)}"
+        )
+        if opts["dry_run"] or not plan:
+            self._report(stats, opts)
+            return
+
+        # 2) перечитываем пачками, пишем bulk_update
+        t0 = time.perf_counter()
+        updated, skipped = 0, 0
+        for start in range(0, len(plan), opts["batch_size"]):
+            chunk = dict(plan[start:start + opts["batch_size"]])
+            documents = Document.objects.in_bulk(list(chunk))
+            done, columns = [], set()
+            for pk, stale in chunk.items():
+                document = documents.get(pk)
+                if document is None:
+                    continue
+                changed = reocr_document(document, stale, parser)
+                if changed is None:
+                    skipped += 1
+                    continue
+                done.append(document)
+                columns.update(changed)
+            if done and columns:
+                with transaction.atomic():
+                    Document.objects.bulk_update(done, sorted(columns))
+            updated += len(done)
+            self.stdout.write(f"  {start + len(chunk)}/{len(plan)}")
+
+        seconds = time.perf_counter() - t0
+        stats.update({
+            "updated": updated,
+            "skipped": skipped,
+            "seconds": round(seconds, 3),
+            "docs_per_sec": round(updated / seconds, 3) if seconds else 0.0,
+        })
+        self.stdout.write(f"Обновлено {updated}, пропущено {skipped} за {stats['seconds']} с")
+        self._report(stats, opts)
+
+    @staticmethod
+    def _report(stats, opts):
+        if opts["output"]:
+            with open(opts["output"], "w", encoding="utf-8") as f:
+                json.dump(stats, f, ensure_ascii=False, indent=2)
@@ -0,0 +1,112 @@
+import http.client
+import json
+import os
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+from documents.benchmark import summarize
+
+
+class Command(BaseCommand):
+    help = (
+        "Нагрузочный тест загрузки: N одновременных клиентов шлют файл на /api/upload/. "
+        "--slow-kbps имитирует медленных клиентов (телефоны). "
+        "Запускать против одного и того же приложения под WSGI и под ASGI и сравнить отчёты."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("url", help="Например http://127.0.0.1:8000/api/upload/")
+        parser.add_argument("file", help="PDF или JPG/PNG для загрузки")
+        parser.add_argument("--concurrency", type=int, default=20)
+        parser.add_argument("--requests", type=int, default=100)
+        parser.add_argument("--slow-kbps", type=float, default=0.0,
+                            help="Скорость отправки тела одним клиентом, КБ/с (0 — без ограничения)")
+        parser.add_argument("--timeout", type=float, default=120.0)
+        parser.add_argument("--label", default="", help="Подпись прогона в отчёте (wsgi/asgi)")
+        parser.add_argument("--output", help="Куда записать JSON-отчёт")
+
+    def handle(self, *args, **opts):
+        if not os.path.isfile(opts["file"]):
+            raise CommandError(f"Нет файла {opts['file']}")
+        with open(opts["file"], "rb") as f:
+            payload = f.read()
+
+        body, content_type = self._multipart(os.path.basename(opts["file"]), payload)
+        target = urlsplit(opts["url"])
+
+        def one(_):
+            return self._send(target, body, content_type, opts["slow_kbps"], opts["timeout"])
+
+        t0 = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=opts["concurrency"]) as pool:
+            results = list(pool.map(one, range(opts["requests"])))
+        wall = time.perf_counter() - t0
+
+        ok = [r["seconds"] for r in results if r["status"] == 200]
+        statuses = {}
+        for r in results:
+            statuses[str(r["status"])] = statuses.get(str(r["status"]), 0) + 1
+
+        report = {
+            "label": opts["label"],
+            "url": opts["url"],
+            "concurrency": opts["concurrency"],
+            "requests": opts["requests"],
+            "slow_kbps": opts["slow_kbps"],
+            "wall_seconds": round(wall, 3),
+            "requests_per_sec": round(len(ok) / wall, 3) if wall else 0.0,
+            "statuses": statuses,
+            "latency": summarize(ok),
+        }
+
+        if opts["output"]:
+            with open(opts["output"], "w", encoding="utf-8") as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+
+        lat = report["latency"]
+        self.stdout.write(
+            f"{opts['label'] or opts['url']}: {report['requests_per_sec']} req/s, "
+            f"p50 {lat['p50_ms']} мс, p95 {lat['p95_ms']} мс, статусы {statuses}"
+        )
+
+    @staticmethod
+    def _multipart(filename: str, payload: bytes):
+        boundary = uuid.uuid4().hex
+        head = (
+            f"--{boundary}\r\n"
+            f'Content-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+            f"Content-Type: application/octet-stream\r\n\r\n"
+        ).encode()
+        tail = f"\r\n--{boundary}--\r\n".encode()
+        return head + payload + tail, f"multipart/form-data; boundary={boundary}"
+
+    @staticmethod
+    def _chunks(body: bytes, kbps: float, chunk: int = 16 * 1024):
+        delay = chunk / (kbps * 1024.0) if kbps > 0 else 0.0
+        for i in range(0, len(body), chunk):
+            yield body[i:i + chunk]
+            if delay:
+                time.sleep(delay)
+
+    def _send(self, target, body: bytes, content_type: str, kbps: float, timeout: float):
+        conn_cls = http.client.HTTPSConnection if target.scheme == "https" else http.client.HTTPConnection
+        conn = conn_cls(target.netloc, timeout=timeout)
+        t0 = time.perf_counter()
+        try:
+            conn.request(
+                "POST", target.path or "/",
+                body=self._chunks(body, kbps),
+                headers={"Content-Type": content_type, "Content-Length": str(len(body))},
+            )
+            resp = conn.getresponse()
+            resp.read()
+            status = resp.status
+        except (OSError, http.client.HTTPException):
+            status = 0
+        finally:
+            conn.close()
+        return {"status": status, "seconds": time.perf_counter() - t0}
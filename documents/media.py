@@ -0,0 +1,227 @@
+# media.py
+"""
+Отдача файлов из MEDIA_ROOT с проверкой доступа.
+
+Файл отдаётся только вошедшему пользователю и только если на него
+ссылается документ, который ему можно смотреть (см. can_view_document).
+Остальные файлы хранилища (недописанные загрузки, сироты) — 404.
+Аватары профилей (users/) — любому вошедшему.
+
+Байты Python не гоняет, если задан DOCUMENTS_MEDIA_ACCEL:
+- "nginx"  — X-Accel-Redirect на DOCUMENTS_MEDIA_ACCEL_PREFIX + имя:
+      location /protected-media/ { internal; alias <MEDIA_ROOT>/; }
+- "apache" — X-Sendfile с абсолютным путём (mod_xsendfile).
+Без него — FileResponse (sendfile через wsgi.file_wrapper) и 206 на Range.
+
+Размеры фото адресуются по содержимому (derivatives.py): у них сильный
+ETag из имени и Cache-Control immutable на год — браузер больше не
+спрашивает их при повторных открытиях списка и карточки. У прочих файлов
+ETag из размера и mtime, браузер перепроверяет их (304 без тела).
+"""
+import mimetypes
+import os
+import posixpath
+import re
+from typing import Optional, Tuple
+
+from django.conf import settings
+from django.contrib.auth.decorators import login_required
+from django.core.files.storage import default_storage
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from django.views.decorators.http import require_safe
+
+from .derivatives import DERIVATIVE_NAME, main_name
+
+# Размеры фото (derivatives.DERIVATIVE_NAME) — содержимое под именем никогда не меняется
+IMMUTABLE_CACHE = "private, max-age=31536000, immutable"
+REVALIDATE_CACHE = "private, no-cache"
+
+RANGE_HEADER = re.compile(r"^bytes=(\d*)-(\d*)$")
+STREAM_CHUNK = 64 * 1024
+
+# Каталоги, файлы из которых принадлежат документам
+DOCUMENT_DIRS = ("pdfs/", "jpgs/", "photos/")
+# Аватары профилей (account.Profile.photo)
+PROFILE_DIRS = ("users/",)
+
+
+def accel_mode() -> Optional[str]:
+    return getattr(settings, "DOCUMENTS_MEDIA_ACCEL", None)
+
+
+def can_view_document(user, document) -> bool:
+    """
+    Доступ к документу: как у document_detail — любой вошедший;
+    DOCUMENTS_MEDIA_PERMISSION (например "documents.view_document") —
+    дополнительно нужно это право.
+    """
+    perm = getattr(settings, "DOCUMENTS_MEDIA_PERMISSION", None)
+    return user.is_authenticated and (not perm or user.has_perm(perm))
+
+
+def document_for_file(name: str):
+    """
+    Документ, которому принадлежит файл (исходник, фото, размер фото, растр), или None.
+    Запрос — по одной индексированной колонке, выбранной по каталогу файла:
+    на странице списка каждая миниатюра — отдельный запрос сюда.
+    """
+    from .models import Document
+
+    qs = Document.objects.only("pk", "photo", "photo_variants", "artifacts")
+    if name.startswith("photos/"):
+        match = DERIVATIVE_NAME.match(name)
+        if match is None:
+            # фото, сохранённое до derivatives.py
+            return qs.filter(photo=name).first()
+        # все размеры одного кропа ищем по основному файлу (Document.photo)
+        document = qs.filter(photo=main_name(match.group("key"))).first()
+        if document is None:
+            return None
+        if name != document.photo.name and name not in (document.photo_variants or {}).values():
+            return None
+        return document
+    if name.startswith("jpgs/"):
+        return qs.filter(jpg_file=name).first()
+    if name.startswith("pdfs/"):
+        stem, ext = posixpath.splitext(name)
+        if ext.lower() == ".pdf":
+            return qs.filter(pdf_file=name).first()
+        # растр страницы лежит рядом с PDF: pdfs/<имя>.jpg (utils.convert_pdf_to_jpg)
+        document = qs.filter(pdf_file__in=[stem + ".pdf", stem + ".PDF"]).first()
+        if document is None or (document.artifacts or {}).get("page") != name:
+            return None
+        return document
+    return None
+
+
+def _clean_name(path: str) -> Optional[str]:
+    name = posixpath.normpath(path).lstrip("/")
+    if name.startswith("..") or "/../" in f"/{name}/" or name in ("", "."):
+        return None
+    return name
+
+
+def _etag(name: str, stat: os.stat_result) -> Tuple[str, bool]:
+    """(ETag, неизменяемый ли файл)."""
+    match = DERIVATIVE_NAME.match(name)
+    if match:
+        # webp и jpg одного размера — разное содержимое: расширение входит в ETag
+        return f'"{posixpath.basename(name)}"', True
+    return f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"', False
+
+
+def _byte_range(request, size: int, etag: str) -> Optional[Tuple[int, int]]:
+    """
+    Один диапазон из Range: (начало, конец включительно). None — отдать файл целиком.
+    If-Range с другим ETag — тоже целиком. Несколько диапазонов не поддерживаем.
+    """
+    header = request.headers.get("Range", "")
+    if not header or size == 0:
+        return None
+    if_range = request.headers.get("If-Range")
+    if if_range and if_range != etag:
+        return None
+    match = RANGE_HEADER.match(header.replace(" ", ""))
+    if not match or match.groups() == ("", ""):
+        return None
+    first, last = match.groups()
+    if first == "":
+        # bytes=-N — последние N байт
+        start, end = max(0, size - int(last)), size - 1
+    else:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    if start > end or start >= size:
+        raise _Unsatisfiable()
+    return start, end
+
+
+class _Unsatisfiable(Exception):
+    pass
+
+
+def _read_range(path: str, start: int, length: int):
+    with open(path, "rb") as f:
+        f.seek(start)
+        while length > 0:
+            chunk = f.read(min(STREAM_CHUNK, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def _set_cache_headers(response, etag: str, immutable: bool, stat: os.stat_result):
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(stat.st_mtime)
+    response["Cache-Control"] = IMMUTABLE_CACHE if immutable else REVALIDATE_CACHE
+    response["Accept-Ranges"] = "bytes"
+    return response
+
+
+def _accel_response(name: str, path: str, content_type: str):
+    response = HttpResponse(content_type=content_type)
+    if accel_mode() == "apache":
+        response["X-Sendfile"] = path
+    else:
+        prefix = getattr(settings, "DOCUMENTS_MEDIA_ACCEL_PREFIX", "/protected-media/")
+        response["X-Accel-Redirect"] = prefix.rstrip("/") + "/" + name
+    return response
+
+
+def serve_file(request, name: str):
+    """Отдаёт файл хранилища: 304 / X-Accel / 206 / FileResponse."""
+    path = default_storage.path(name)
+    try:
+        stat = os.stat(path)
+    except OSError:
+        raise Http404("Файл не найден")
+
+    etag, immutable = _etag(name, stat)
+    not_modified = get_conditional_response(request, etag=etag, last_modified=int(stat.st_mtime))
+    if not_modified is not None:
+        return _set_cache_headers(not_modified, etag, immutable, stat)
+
+    content_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+
+    # Range, If-Range и Content-Length front-сервер обработает сам
+    if accel_mode():
+        return _set_cache_headers(_accel_response(name, path, content_type), etag, immutable, stat)
+
+    try:
+        byte_range = _byte_range(request, stat.st_size, etag)
+    except _Unsatisfiable:
+        response = HttpResponse(status=416)
+        response["Content-Range"] = f"bytes */{stat.st_size}"
+        return response
+
+    if byte_range is None:
+        response = FileResponse(open(path, "rb"), content_type=content_type)
+    else:
+        start, end = byte_range
+        length = end - start + 1
+        response = StreamingHttpResponse(
+            _read_range(path, start, length), status=206, content_type=content_type
+        )
+        response["Content-Length"] = str(length)
+        response["Content-Range"] = f"bytes {start}-{end}/{stat.st_size}"
+    return _set_cache_headers(response, etag, immutable, stat)
+
+
+@require_safe
+@login_required
+def protected_media(request, path):
+    name = _clean_name(path)
+    if name is None:
+        raise Http404("Файл не найден")
+
+    if name.startswith(DOCUMENT_DIRS):
+        document = document_for_file(name)
+        if document is None or not can_view_document(request.user, document):
+            raise Http404("Файл не найден")
+    elif not name.startswith(PROFILE_DIRS):
+        raise Http404("Файл не найден")
+
+    return serve_file(request, name)
@@ -0,0 +1,175 @@
+# metrics.py
+"""
+Тайминги стадий обработки и внутрипроцессные метрики.
+
+span() замеряет стадию, пишет длительность в debug_info["timings"]
+и в гистограмму; счётчики — через inc(), текущие значения — set_gauge(). render_prometheus() отдаёт всё
+в текстовом формате Prometheus (метрики свои у каждого воркера).
+"""
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+
+# Границы корзин гистограмм, секунды
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+STAGE_METRIC = "documents_stage_duration_seconds"
+
+HELP = {
+    STAGE_METRIC: "Длительность стадий обработки документа",
+    "documents_iin_checksum_failures_total": "ИИН не прошёл проверку контрольной суммы",
+    "documents_empty_fields_total": "Поле после OCR осталось пустым",
+    "documents_quality_issues_total": "Проблемы качества скана до OCR",
+    "documents_ocr_tier_total": "На какой ступени OCR завершилось поле",
+    "documents_name_corrections_total": "Токен ФИО заменён словарным (lexicon.py)",
+    "documents_admission_in_flight": "Тяжёлых запросов (OCR/экспорт) выполняется сейчас",
+    "documents_admission_queue_depth": "Тяжёлых запросов ждёт свободного слота",
+    "documents_admission_rejected_total": "Отказано с 429 (очередь полна или истекло ожидание)",
+    "documents_admission_wait_seconds": "Ожидание слота перед OCR/экспортом",
+}
+
+_lock = threading.Lock()
+_histograms: Dict[Tuple[str, Tuple], "Histogram"] = {}
+_counters: Dict[Tuple[str, Tuple], float] = {}
+_gauges: Dict[Tuple[str, Tuple], float] = {}
+
+# Сборщик стадий текущего запроса (используется профилировщиком)
+_current_spans: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("documents_spans", default=None)
+
+
+class Histogram:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        for i, bound in enumerate(BUCKETS):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.sum += value
+        self.count += 1
+
+
+def _key(name: str, labels: Dict[str, str]) -> Tuple[str, Tuple]:
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items() if v is not None))
+
+
+def observe(name: str, value: float, **labels):
+    key = _key(name, labels)
+    with _lock:
+        hist = _histograms.get(key)
+        if hist is None:
+            hist = _histograms[key] = Histogram()
+        hist.observe(value)
+
+
+def inc(name: str, value: float = 1.0, **labels):
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0.0) + value
+
+
+def set_gauge(name: str, value: float, **labels):
+    key = _key(name, labels)
+    with _lock:
+        _gauges[key] = value
+
+
+@contextmanager
+def span(stage: str, debug_info: Optional[Dict] = None, field: Optional[str] = None):
+    """
+    Замер стадии. В debug_info["timings"] пишется «stage» или «stage.field» в мс.
+    """
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - t0
+        name = f"{stage}.{field}" if field else stage
+        observe(STAGE_METRIC, elapsed, stage=stage, field=field)
+        if debug_info is not None:
+            # повторные замеры той же стадии (ступени OCR) суммируются
+            timings = debug_info.setdefault("timings", {})
+            timings[name] = round(timings.get(name, 0.0) + elapsed * 1000.0, 2)
+        collected = _current_spans.get()
+        if collected is not None:
+            collected.append((name, elapsed))
+
+
+@contextmanager
+def collect_spans():
+    """Собирает все стадии, выполненные внутри блока (в текущем контексте)."""
+    collected: List[Tuple[str, float]] = []
+    token = _current_spans.set(collected)
+    try:
+        yield collected
+    finally:
+        _current_spans.reset(token)
+
+# ---------------------
+# ЭКСПОРТ
+# ---------------------
+
+def _fmt_labels(labels: Tuple, extra: Tuple = ()) -> str:
+    items = list(labels) + list(extra)
+    if not items:
+        return ""
+    body = ",".join('{}="{}"'.format(k, v.replace("\\", "\\\\").replace('"', '\\"')) for k, v in items)
+    return "{" + body + "}"
+
+
+def _fmt_value(v: float) -> str:
+    return repr(float(v)) if v != int(v) else str(int(v))
+
+
+def render_prometheus() -> str:
+    with _lock:
+        histograms = {k: (list(h.counts), h.sum, h.count) for k, h in _histograms.items()}
+        counters = dict(_counters)
+        gauges = dict(_gauges)
+
+    lines = []
+    seen = set()
+
+    for (name, labels), value in sorted(counters.items()):
+        if name not in seen:
+            seen.add(name)
+            lines.append(f"# HELP {name} {HELP.get(name, name)}")
+            lines.append(f"# TYPE {name} counter")
+        lines.append(f"{name}{_fmt_labels(labels)} {_fmt_value(value)}")
+
+    for (name, labels), value in sorted(gauges.items()):
+        if name not in seen:
+            seen.add(name)
+            lines.append(f"# HELP {name} {HELP.get(name, name)}")
+            lines.append(f"# TYPE {name} gauge")
+        lines.append(f"{name}{_fmt_labels(labels)} {_fmt_value(value)}")
+
+    for (name, labels), (counts, total, count) in sorted(histograms.items()):
+        if name not in seen:
+            seen.add(name)
+            lines.append(f"# HELP {name} {HELP.get(name, name)}")
+            lines.append(f"# TYPE {name} histogram")
+        cumulative = 0
+        for bound, c in zip(BUCKETS, counts):
+            cumulative += c
+            lines.append(f"{name}_bucket{_fmt_labels(labels, (('le', repr(bound)),))} {cumulative}")
+        lines.append(f"{name}_bucket{_fmt_labels(labels, (('le', '+Inf'),))} {count}")
+        lines.append(f"{name}_sum{_fmt_labels(labels)} {total!r}")
+        lines.append(f"{name}_count{_fmt_labels(labels)} {count}")
+
+    return "\n".join(lines) + "\n"
+
+
+def reset():
+    """Сброс всех метрик (для бенчмарков)."""
+    with _lock:
+        _histograms.clear()
+        _counters.clear()
+        _gauges.clear()
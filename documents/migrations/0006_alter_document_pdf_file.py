@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-19 09:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0005_document_test_date'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='document',
+            name='pdf_file',
+            field=models.FileField(blank=True, upload_to='pdfs/', verbose_name='PDF файл'),
+        ),
+    ]
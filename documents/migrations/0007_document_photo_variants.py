@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-19 09:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0006_alter_document_pdf_file'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='document',
+            name='photo_variants',
+            field=models.JSONField(blank=True, default=dict, verbose_name='Размеры фото'),
+        ),
+    ]
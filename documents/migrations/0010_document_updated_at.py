@@ -0,0 +1,41 @@
+# Generated by Django 5.2.5 on 2026-10-19 09:00
+
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import F
+
+
+def backfill_updated_at(apps, schema_editor):
+    # у старых документов «изменён» = «создан», а не время миграции
+    Document = apps.get_model('documents', 'Document')
+    Document.objects.update(updated_at=F('created_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0009_document_sha256'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='document',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now, verbose_name='Изменён'),
+            preserve_default=False,
+        ),
+        migrations.RunPython(backfill_updated_at, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='document',
+            name='iin',
+            field=models.CharField(blank=True, db_index=True, max_length=12, verbose_name='ИИН'),
+        ),
+        migrations.AddIndex(
+            model_name='document',
+            index=models.Index(fields=['created_at', 'id'], name='documents_created_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='document',
+            index=models.Index(fields=['updated_at', 'id'], name='documents_updated_id_idx'),
+        ),
+    ]
@@ -4,8 +4,10 @@ from django.utils import timezone
 
 class Document(models.Model):
     # Загруженные файлы
-    pdf_file = models.FileField(upload_to='pdfs/', verbose_name="PDF файл")
+    pdf_file = models.FileField(upload_to='pdfs/', blank=True, verbose_name="PDF файл")
     jpg_file = models.ImageField(upload_to='jpgs/', blank=True, null=True, verbose_name="JPG изображение")
+    # SHA-256 исходного файла (считается при приёме загрузки, см. uploads.py)
+    sha256 = models.CharField(max_length=64, blank=True, db_index=True, verbose_name="SHA-256 файла")
 
     # Дата экзамена
     test_date = models.DateTimeField(
@@ -17,7 +19,7 @@ class Document(models.Model):
     first_name = models.CharField(max_length=100, blank=True, verbose_name="Имя")
     last_name = models.CharField(max_length=100, blank=True, verbose_name="Фамилия")
     patronymic = models.CharField(max_length=100, blank=True, verbose_name="Отчество")
-    iin = models.CharField(max_length=12, blank=True, verbose_name="ИИН")
+    iin = models.CharField(max_length=12, blank=True, db_index=True, verbose_name="ИИН")
 
     # Дополнительные данные
     birth_place = models.CharField(max_length=200, blank=True, verbose_name="Место рождения")
@@ -32,15 +34,33 @@ class Document(models.Model):
 
     # Медиа
     photo = models.ImageField(upload_to='photos/', blank=True, null=True, verbose_name="Фото")
+    # Размеры фото (см. derivatives.py): {"thumb": имя, "detail": имя, "print": имя}
+    photo_variants = models.JSONField(default=dict, blank=True, verbose_name="Размеры фото")
+    # Прочие производные файлы (см. lifecycle.py): {"page": растр страницы PDF, ...}
+    artifacts = models.JSONField(default=dict, blank=True, verbose_name="Производные файлы")
+    # Как распознаны поля (см. coordinates.py): {"coordinates": {поле: версия рамки}}
+    extraction_meta = models.JSONField(default=dict, blank=True, verbose_name="Метаданные распознавания")
 
     # Служебные поля
     raw_text = models.TextField(blank=True, verbose_name="Извлеченный текст")
     created_at = models.DateTimeField(auto_now_add=True)
+    # auto_now срабатывает только при save(); в update_fields и bulk_update
+    # 'updated_at' надо перечислять явно (по нему API отдаёт изменения)
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Изменён")
 
     class Meta:
         verbose_name = "Документ"
         verbose_name_plural = "Документы"
         ordering = ['-created_at']
+        # ключи keyset-пагинации API (см. api.py)
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='documents_created_id_idx'),
+            models.Index(fields=['updated_at', 'id'], name='documents_updated_id_idx'),
+            # владелец файла при отдаче медиа (см. media.document_for_file)
+            models.Index(fields=['photo'], name='documents_photo_idx'),
+            models.Index(fields=['pdf_file'], name='documents_pdf_file_idx'),
+            models.Index(fields=['jpg_file'], name='documents_jpg_file_idx'),
+        ]
 
     def __str__(self):
         if self.first_name or self.last_name:
@@ -48,4 +68,24 @@ class Document(models.Model):
             if self.patronymic:
                 full_name += f" {self.patronymic}"
             return f"{full_name} ({self.iin})"
-        return f"Документ #{self.id}"
\ No newline at end of file
+        return f"Документ #{self.id}"
+
+    def photo_url(self, size):
+        """URL фото нужного размера; для старых документов без размеров — оригинал."""
+        name = (self.photo_variants or {}).get(size)
+        if name:
+            return self.photo.storage.url(name)
+        return self.photo.url if self.photo else None
+
+    @property
+    def photo_thumb_url(self):
+        return self.photo_url('thumb')
+
+    @property
+    def photo_detail_url(self):
+        return self.photo_url('detail')
+
+    @property
+    def source_file(self):
+        """Загруженный оригинал: PDF или фото/скан."""
+        return self.pdf_file or self.jpg_file
\ No newline at end of file
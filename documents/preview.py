@@ -0,0 +1,118 @@
+# preview.py
+"""
+Предпросмотр калибровки: OCR одной рамки на странице документа-образца.
+
+Страница документа рендерится (или читается готовый растр, см.
+reocr.open_source) один раз и остаётся в LRU-кэше процесса вместе с
+результатом привязки ROI (registration) — дальше каждый запрос это
+только crop + _enhance_for_ocr + один вызов tesseract на первой ступени,
+то есть десятки-сотни миллисекунд.
+
+Размер кэша — DOCUMENTS_PREVIEW_CACHE_SIZE страниц (по умолчанию 8;
+страница 220 DPI в RGB — ~10 МБ).
+"""
+import base64
+import threading
+from collections import OrderedDict
+from io import BytesIO
+from typing import Dict, List, Optional, Tuple
+
+from django.conf import settings
+from PIL import Image
+
+from . import registration
+from .lifecycle import discard_path
+from .metrics import span
+
+_lock = threading.Lock()
+_pages: "OrderedDict[Tuple, Tuple[Image.Image, Optional[Dict]]]" = OrderedDict()
+
+
+def cache_size() -> int:
+    return int(getattr(settings, "DOCUMENTS_PREVIEW_CACHE_SIZE", 8))
+
+
+def _cache_key(document) -> Tuple:
+    source = document.source_file
+    return document.pk, source.name if source else "", (document.artifacts or {}).get("page", "")
+
+
+def page_for(document, debug: Dict) -> Tuple[Optional[Image.Image], Optional[Dict]]:
+    """(страница, преобразование привязки) из кэша или с рендером."""
+    from .reocr import open_source
+
+    key = _cache_key(document)
+    with _lock:
+        cached = _pages.get(key)
+        if cached is not None:
+            _pages.move_to_end(key)
+            debug["cache"] = "hit"
+            return cached
+
+    debug["cache"] = "miss"
+    image, temp_path, _ = open_source(document, debug)
+    discard_path(temp_path)
+    if image is None:
+        return None, None
+
+    transform = None
+    if registration.enabled():
+        with span("register", debug):
+            transform = registration.estimate_transform(image)
+
+    with _lock:
+        _pages[key] = (image, transform)
+        _pages.move_to_end(key)
+        while len(_pages) > cache_size():
+            _pages.popitem(last=False)
+    return image, transform
+
+
+def clear_cache():
+    with _lock:
+        _pages.clear()
+
+
+def _data_url(img: Image.Image) -> str:
+    bio = BytesIO()
+    img.save(bio, format="PNG", optimize=False)
+    return "data:image/png;base64," + base64.b64encode(bio.getvalue()).decode("ascii")
+
+
+def preview_field(document, field: str, box: List[float], parser) -> Dict:
+    """
+    OCR рамки box поля field на странице document.
+    Возвращает text/cleaned/confidence, bbox в пикселях и обработанный crop (data URL).
+    """
+    debug: Dict = {}
+    image, transform = page_for(document, debug)
+    if image is None:
+        return {"success": False, "error": "У документа нет читаемого изображения"}
+
+    coordinates = {field: box}
+    if transform:
+        coordinates = registration.warp_coordinates(coordinates, transform)
+
+    width, height = image.size
+    l, t, r, b = parser._to_pixels(coordinates[field], width, height)
+    if not parser._is_valid_box(l, t, r, b, width, height):
+        return {"success": False, "error": "Рамка вне изображения"}
+    roi = image.crop((l, t, r, b))
+
+    result = {"success": True, "field": field, "bbox": [l, t, r, b]}
+    if field == "photo":
+        result["crop"] = _data_url(roi)
+    else:
+        with span("enhance", debug, field=field):
+            enhanced = parser._enhance_for_ocr(roi, field)
+        with span("ocr", debug, field=field):
+            text, confidence = parser._ocr_with_confidence(enhanced, field)
+        result.update({
+            "text": text,
+            "cleaned": parser._clean(field, text),
+            "confidence": confidence,
+            "crop": _data_url(enhanced),
+        })
+    result["timings"] = debug.get("timings", {})
+    result["cache"] = debug.get("cache")
+    return result
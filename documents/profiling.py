@@ -0,0 +1,202 @@
+# profiling.py
+"""
+Профилирование отдельных запросов по запросу (без передеплоя).
+
+Декоратор @profile_request включает профилировщик, если:
+- запрос попал в выборку PROFILE_SAMPLE_RATE (0..1, по умолчанию 0), или
+- staff-пользователь прислал заголовок X-Profile: 1.
+
+Профиль (pyinstrument, если установлен, иначе cProfile) и JSON с
+request id и таймингами стадий пишутся в PROFILE_DIR; хранятся последние
+PROFILE_KEEP снимков.
+"""
+import json
+import logging
+import os
+import random
+import re
+import time
+import uuid
+from datetime import datetime, timezone
+from functools import wraps
+from typing import Dict, List
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+
+from .metrics import collect_spans
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = "HTTP_X_PROFILE"
+
+# X-Request-ID идёт в имя файла: только безопасные символы
+REQUEST_ID_UNSAFE = re.compile(r"[^A-Za-z0-9_-]")
+REQUEST_ID_MAX_LENGTH = 64
+
+
+def profile_dir() -> str:
+    return getattr(settings, "PROFILE_DIR", os.path.join(settings.BASE_DIR, "profiles"))
+
+
+def _should_profile(request, user=None) -> bool:
+    user = user if user is not None else request.user
+    if request.META.get(PROFILE_HEADER) and getattr(user, "is_staff", False):
+        return True
+    rate = getattr(settings, "PROFILE_SAMPLE_RATE", 0.0)
+    return rate > 0 and random.random() < rate
+
+
+def _start_profiler():
+    try:
+        from pyinstrument import Profiler
+        profiler = Profiler()
+        profiler.start()
+        return "pyinstrument", profiler
+    except ImportError:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+        return "cprofile", profiler
+
+
+def _stop_profiler(kind: str, profiler, base_path: str) -> str:
+    if kind == "pyinstrument":
+        profiler.stop()
+        path = base_path + ".html"
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(profiler.output_html())
+        return path
+
+    profiler.disable()
+    path = base_path + ".prof"
+    profiler.dump_stats(path)
+    return path
+
+
+def _request_id(request) -> str:
+    """X-Request-ID клиента (очищенный) или случайный."""
+    raw = request.META.get("HTTP_X_REQUEST_ID") or ""
+    request_id = REQUEST_ID_UNSAFE.sub("", raw)[:REQUEST_ID_MAX_LENGTH]
+    return request_id or uuid.uuid4().hex[:16]
+
+
+def _rotate(directory: str, keep: int):
+    """Удаляет самые старые снимки сверх лимита keep."""
+    metas = sorted(
+        (e for e in os.scandir(directory) if e.name.endswith(".json")),
+        key=lambda e: e.stat().st_mtime,
+    )
+    for entry in metas[:max(0, len(metas) - keep)]:
+        stem = entry.path[:-len(".json")]
+        for ext in (".json", ".prof", ".html"):
+            try:
+                os.remove(stem + ext)
+            except FileNotFoundError:
+                pass
+
+
+class _Capture:
+    """Один снимок: профилировщик + метаданные запроса."""
+
+    def __init__(self, request, view):
+        self.request = request
+        self.view = view
+        self.request_id = _request_id(request)
+        self.directory = profile_dir()
+        os.makedirs(self.directory, exist_ok=True)
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S")
+        self.base_path = os.path.join(self.directory, f"{stamp}_{view.__name__}_{self.request_id}")
+        self.kind, self.profiler = _start_profiler()
+        self.t0 = time.perf_counter()
+        self.status = None
+
+    def tag(self, response):
+        self.status = response.status_code
+        response["X-Request-ID"] = self.request_id
+        return response
+
+    def save(self, spans, user=None):
+        elapsed = time.perf_counter() - self.t0
+        request = self.request
+        user = user if user is not None else request.user
+        try:
+            profile_path = _stop_profiler(self.kind, self.profiler, self.base_path)
+            meta = {
+                "request_id": self.request_id,
+                "view": self.view.__name__,
+                "method": request.method,
+                "path": request.path,
+                "user": getattr(user, "username", None) or None,
+                "status": self.status,
+                "duration_ms": round(elapsed * 1000.0, 2),
+                "profiler": self.kind,
+                "profile_file": os.path.basename(profile_path),
+                "stages": [{"stage": name, "ms": round(sec * 1000.0, 2)} for name, sec in spans],
+                "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            }
+            with open(self.base_path + ".json", "w", encoding="utf-8") as f:
+                json.dump(meta, f, ensure_ascii=False, indent=2)
+            _rotate(self.directory, getattr(settings, "PROFILE_KEEP", 50))
+        except Exception:
+            logger.exception("Не удалось сохранить профиль %s", self.request_id)
+
+
+def profile_request(view):
+    """
+    Декоратор view: профилирует выбранные запросы.
+    Для async-view стадии из пула (executor.run_blocking) попадают в снимок,
+    а сам профилировщик видит только код event loop.
+    """
+    if iscoroutinefunction(view):
+        @wraps(view)
+        async def async_wrapper(request, *args, **kwargs):
+            auser = getattr(request, "auser", None)
+            user = await auser() if auser else None
+            if not _should_profile(request, user):
+                return await view(request, *args, **kwargs)
+
+            capture = _Capture(request, view)
+            spans = []
+            try:
+                with collect_spans() as spans:
+                    return capture.tag(await view(request, *args, **kwargs))
+            finally:
+                capture.save(spans, user)
+
+        return async_wrapper
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not _should_profile(request):
+            return view(request, *args, **kwargs)
+
+        capture = _Capture(request, view)
+        spans = []
+        try:
+            with collect_spans() as spans:
+                return capture.tag(view(request, *args, **kwargs))
+        finally:
+            capture.save(spans)
+
+    return wrapper
+
+
+def list_captures(limit: int = 100) -> List[Dict]:
+    """Последние снимки (новые сверху) — метаданные из JSON."""
+    directory = profile_dir()
+    if not os.path.isdir(directory):
+        return []
+    metas = sorted(
+        (e for e in os.scandir(directory) if e.name.endswith(".json")),
+        key=lambda e: e.stat().st_mtime,
+        reverse=True,
+    )[:limit]
+    captures = []
+    for entry in metas:
+        try:
+            with open(entry.path, "r", encoding="utf-8") as f:
+                captures.append(json.load(f))
+        except (OSError, ValueError):
+            continue
+    return captures
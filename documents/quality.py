@@ -0,0 +1,124 @@
+# quality.py
+"""
+Быстрая проверка качества скана до OCR — на уменьшенной серой миниатюре:
+- резкость: дисперсия лапласиана;
+- экспозиция: средняя яркость, доля пересвеченных пикселей (блики) в ROI текста;
+- заполненность ROI: доля «чернил» в текстовых ROI (не та обрезка/пустой скан).
+
+Режим DOCUMENTS_QUALITY_GATE:
+- "flag" (по умолчанию) — OCR идёт, проблемы только пишутся в debug_info;
+- "reject" — при грубых проблемах OCR не запускается (включать явно,
+  когда пороги откалиброваны на своих сканах);
+- "off" — проверка выключена.
+"""
+from typing import Dict, List
+
+from django.conf import settings
+from PIL import Image, ImageFilter, ImageStat
+
+THUMB_SIDE = 512
+
+# Пороги по умолчанию (переопределяются DOCUMENTS_QUALITY_THRESHOLDS)
+DEFAULT_THRESHOLDS = {
+    "min_sharpness": 25.0,     # дисперсия лапласиана на миниатюре
+    "min_brightness": 40.0,    # средняя яркость 0..255
+    "max_brightness": 235.0,
+    "max_glare": 0.25,         # доля пикселей >= 250 в текстовых ROI
+    "min_ink": 0.01,           # доля тёмных пикселей в текстовом ROI
+    "min_inked_rois": 0.5,     # доля текстовых ROI, где есть «чернила»
+}
+
+# Проблемы, при которых OCR заведомо бесполезен
+HARD_REASONS = {"blurry", "too_dark", "too_bright", "empty_rois"}
+
+REASON_MESSAGES = {
+    "blurry": "изображение размыто",
+    "too_dark": "изображение слишком тёмное",
+    "too_bright": "изображение пересвечено",
+    "glare": "блики на полях с текстом",
+    "empty_rois": "поля документа пустые — возможно, неверная обрезка или не та сторона",
+}
+
+TEXT_FIELDS = ("last_name", "first_name", "patronymic", "iin")
+
+_LAPLACIAN = ImageFilter.Kernel((3, 3), [0, 1, 0, 1, -4, 1, 0, 1, 0], scale=1, offset=128)
+
+
+def gate_mode() -> str:
+    return getattr(settings, "DOCUMENTS_QUALITY_GATE", "flag")
+
+
+def thresholds() -> Dict[str, float]:
+    return {**DEFAULT_THRESHOLDS, **getattr(settings, "DOCUMENTS_QUALITY_THRESHOLDS", {})}
+
+
+def _thumbnail(image: Image.Image) -> Image.Image:
+    # reduce() — целочисленное прореживание, заметно дешевле resize на больших кадрах
+    factor = max(1, max(image.size) // THUMB_SIDE)
+    small = image.reduce(factor) if factor > 1 else image
+    return small.convert("L")
+
+
+def _ink_and_glare(region: Image.Image):
+    hist = region.histogram()
+    total = max(1, sum(hist))
+    return sum(hist[:100]) / total, sum(hist[250:]) / total
+
+
+def assess_quality(image: Image.Image, coordinates: Dict) -> Dict:
+    """
+    Возвращает {"ok": bool, "reject": bool, "reasons": [...], "metrics": {...}}.
+    reject — есть «жёсткие» причины (решение об отказе принимает вызывающий код).
+    """
+    limits = thresholds()
+    thumb = _thumbnail(image)
+    w, h = thumb.size
+
+    sharpness = ImageStat.Stat(thumb.filter(_LAPLACIAN)).var[0]
+    brightness = ImageStat.Stat(thumb).mean[0]
+
+    inks: List[float] = []
+    glares: List[float] = []
+    for field in TEXT_FIELDS:
+        coords = coordinates.get(field)
+        if not coords:
+            continue
+        l, t, r, b = int(coords[0] * w), int(coords[1] * h), int(coords[2] * w), int(coords[3] * h)
+        if r - l < 2 or b - t < 2:
+            continue
+        ink, glare = _ink_and_glare(thumb.crop((l, t, r, b)))
+        inks.append(ink)
+        glares.append(glare)
+
+    inked = sum(1 for v in inks if v >= limits["min_ink"]) / len(inks) if inks else 1.0
+    glare = max(glares) if glares else 0.0
+
+    reasons = []
+    if sharpness < limits["min_sharpness"]:
+        reasons.append("blurry")
+    if brightness < limits["min_brightness"]:
+        reasons.append("too_dark")
+    elif brightness > limits["max_brightness"]:
+        reasons.append("too_bright")
+    if glare > limits["max_glare"]:
+        reasons.append("glare")
+    if inked < limits["min_inked_rois"]:
+        reasons.append("empty_rois")
+
+    return {
+        "ok": not reasons,
+        "reject": any(r in HARD_REASONS for r in reasons),
+        "reasons": reasons,
+        "metrics": {
+            "sharpness": round(sharpness, 2),
+            "brightness": round(brightness, 2),
+            "glare": round(glare, 4),
+            "inked_rois": round(inked, 3),
+            "thumb_size": [w, h],
+        },
+    }
+
+
+def describe(reasons: List[str]) -> str:
+    """Человекочитаемое описание причин для сообщения пользователю."""
+    return ", ".join(REASON_MESSAGES.get(r, r) for r in reasons)
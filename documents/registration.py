@@ -0,0 +1,174 @@
+# registration.py
+"""
+Привязка ROI к реальному положению карты на скане.
+
+Нормированные ROI из coordinate_config.json рассчитаны на идеально
+обрезанную карту. На уменьшенной копии (~400 px) ищем края карты по
+профилям границ (FIND_EDGES), оцениваем аффинное преобразование
+(сдвиг + масштаб + небольшой поворот) и переносим им только координаты
+ROI — само изображение не трансформируется. Стоимость — единицы мс.
+
+Край карты — длинная сплошная линия (строка/столбец краевых пикселей
+без разрывов), а не просто «много краевых пикселей»: иначе за край
+принимается строка текста шапки. Преобразование возвращается, только
+если найдены все четыре края; иначе, как и для уже обрезанной карты, —
+None (ROI не трогаем). По умолчанию выключено (DOCUMENTS_REGISTRATION).
+"""
+import math
+from typing import Dict, List, Optional, Tuple
+
+from django.conf import settings
+from PIL import Image, ImageFilter, ImageOps
+
+THUMB_SIDE = 400
+
+# Доля «краевых» пикселей в строке/столбце для оценки наклона
+EDGE_FRACTION = 0.35
+EDGE_THRESHOLD = 40
+# Край карты: сплошной отрезок не короче этой доли кадра...
+MIN_LINE_FRACTION = 0.45
+# ...и не короче этой доли найденной стороны карты
+LINE_COVERAGE = 0.8
+
+# Пропорции карты ID-1 и допуск
+CARD_ASPECT = 85.6 / 54.0
+ASPECT_TOLERANCE = 0.25
+
+# Если все края ближе этого к рамке кадра — карта уже обрезана, ничего не делаем
+FRAME_MARGIN = 0.05
+MAX_ANGLE_DEG = 8.0
+
+
+def enabled() -> bool:
+    return getattr(settings, "DOCUMENTS_REGISTRATION", False)
+
+
+def _profile(edges: Image.Image, axis: int) -> List[float]:
+    w, h = edges.size
+    size = (w, 1) if axis == 0 else (1, h)
+    return [v / 255.0 for v in edges.resize(size, Image.Resampling.BOX).getdata()]
+
+
+def _lines(edges: Image.Image) -> List[bytes]:
+    w, h = edges.size
+    data = edges.tobytes()
+    return [data[y * w:(y + 1) * w] for y in range(h)]
+
+
+def _longest_run(line: bytes) -> int:
+    """Длина самого длинного сплошного отрезка краевых пикселей."""
+    return max(map(len, line.split(b"\0")))
+
+
+def _first_line(lines: List[bytes], indices, min_run: float) -> Optional[int]:
+    for i in indices:
+        # count дешевле разбиения: большинство строк отсеивается им
+        if lines[i].count(255) >= min_run and _longest_run(lines[i]) >= min_run:
+            return i
+    return None
+
+
+def _find_edges(edges: Image.Image) -> Optional[Tuple[int, int, int, int]]:
+    """Края карты (в пикселях миниатюры) или None, если хоть один не найден."""
+    w, h = edges.size
+    rows = _lines(edges)
+    cols = _lines(edges.transpose(Image.Transpose.TRANSPOSE))
+
+    top = _first_line(rows, range(0, h // 3), w * MIN_LINE_FRACTION)
+    bottom = _first_line(rows, range(h - 1, h - h // 3, -1), w * MIN_LINE_FRACTION)
+    left = _first_line(cols, range(0, w // 3), h * MIN_LINE_FRACTION)
+    right = _first_line(cols, range(w - 1, w - w // 3, -1), h * MIN_LINE_FRACTION)
+    if None in (top, bottom, left, right):
+        return None
+
+    # стороны карты должны тянуться почти на всю её ширину/высоту
+    if min(_longest_run(rows[top]), _longest_run(rows[bottom])) < LINE_COVERAGE * (right - left + 1):
+        return None
+    if min(_longest_run(cols[left]), _longest_run(cols[right])) < LINE_COVERAGE * (bottom - top + 1):
+        return None
+    return left, top, right, bottom
+
+
+def _skew(edges: Image.Image, left: int, top: int, right: int) -> float:
+    """Наклон верхнего края: положение края в левой и правой половине карты."""
+    h = edges.height
+    band = (max(0, top - h // 10), min(h, top + h // 10))
+    mid = (left + right) // 2
+    ys = []
+    for x0, x1 in ((left, mid), (mid, right)):
+        if x1 - x0 < 4 or band[1] - band[0] < 2:
+            return 0.0
+        half = edges.crop((x0, band[0], x1, band[1]))
+        prof = _profile(half, 1)
+        peak = max(range(len(prof)), key=lambda i: prof[i])
+        if prof[peak] < EDGE_FRACTION:
+            return 0.0
+        ys.append(band[0] + peak)
+    dx = (right - left) / 2.0
+    angle = math.degrees(math.atan2(ys[1] - ys[0], dx)) if dx else 0.0
+    return angle if abs(angle) <= MAX_ANGLE_DEG else 0.0
+
+
+def estimate_transform(image: Image.Image) -> Optional[Dict]:
+    """
+    Аффинное преобразование из нормированных координат карты в нормированные
+    координаты изображения: x = a*u + b*v + c, y = d*u + e*v + f.
+    None — карта уже совпадает с кадром или края не найдены надёжно.
+    """
+    W, H = image.size
+    factor = max(1, max(W, H) // THUMB_SIDE)
+    thumb = (image.reduce(factor) if factor > 1 else image).convert("L")
+    edges = thumb.filter(ImageFilter.FIND_EDGES).point(lambda p: 255 if p >= EDGE_THRESHOLD else 0)
+    tw, th = thumb.size
+    # FIND_EDGES не трогает рамку в 1 px — на светлом фоне она вся «край»; гасим её
+    edges = ImageOps.expand(edges.crop((1, 1, tw - 1, th - 1)), border=1, fill=0)
+
+    found = _find_edges(edges)
+    if found is None:
+        return None
+    left, top, right, bottom = found
+    x0, y0, x1, y1 = left / tw, top / th, (right + 1) / tw, (bottom + 1) / th
+
+    if x0 < FRAME_MARGIN and y0 < FRAME_MARGIN and x1 > 1 - FRAME_MARGIN and y1 > 1 - FRAME_MARGIN:
+        return None
+
+    card_w, card_h = (x1 - x0) * W, (y1 - y0) * H
+    if card_w <= 0 or card_h <= 0 or card_w * card_h < 0.25 * W * H:
+        return None
+    # пропорции должны быть как у ID-1 или как у кадра, под который калибровались ROI
+    aspect = card_w / card_h
+    if all(abs(aspect / ref - 1.0) > ASPECT_TOLERANCE for ref in (CARD_ASPECT, W / H)):
+        return None
+
+    angle = _skew(edges, left, top, right)
+    theta = math.radians(angle)
+    cos_t, sin_t = math.cos(theta), math.sin(theta)
+    cx, cy = (x0 + x1) / 2 * W, (y0 + y1) / 2 * H
+
+    # пиксели: X = cx + cos*(u-0.5)*cw - sin*(v-0.5)*ch ; Y = cy + sin*(u-0.5)*cw + cos*(v-0.5)*ch
+    a, b = cos_t * card_w / W, -sin_t * card_h / W
+    d, e = sin_t * card_w / H, cos_t * card_h / H
+    c = cx / W - 0.5 * a - 0.5 * b
+    f = cy / H - 0.5 * d - 0.5 * e
+
+    return {
+        "matrix": [round(v, 6) for v in (a, b, c, d, e, f)],
+        "card_box": [round(v, 4) for v in (x0, y0, x1, y1)],
+        "angle": round(angle, 3),
+    }
+
+
+def warp_coordinates(coordinates: Dict[str, List[float]], transform: Dict) -> Dict[str, List[float]]:
+    """Переносит ROI: четыре угла через аффинное преобразование, затем охватывающий прямоугольник."""
+    a, b, c, d, e, f = transform["matrix"]
+    warped = {}
+    for field, (l, t, r, btm) in coordinates.items():
+        xs, ys = [], []
+        for u, v in ((l, t), (r, t), (l, btm), (r, btm)):
+            xs.append(a * u + b * v + c)
+            ys.append(d * u + e * v + f)
+        warped[field] = [
+            max(0.0, min(xs)), max(0.0, min(ys)),
+            min(1.0, max(xs)), min(1.0, max(ys)),
+        ]
+    return warped
@@ -0,0 +1,97 @@
+# reocr.py
+"""
+Повторное распознавание отдельных полей после перекалибровки ROI.
+
+У документа в extraction_meta["coordinates"] записано, с какой версией
+рамки читалось каждое поле (coordinates.py). После правки
+coordinate_config.json устаревшими считаются только поля с другой
+версией — их и перечитываем, остальные поля документа не трогаем.
+
+Источник изображения — по возможности уже готовый растр:
+1) сохранённый растр страницы PDF (artifacts["page"]);
+2) загруженное фото/скан (jpg_file);
+3) иначе страница PDF рендерится заново (и, при DOCUMENTS_KEEP_PAGE_RASTER,
+   сохраняется как артефакт для следующих перекалибровок).
+"""
+import logging
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.core.files.storage import default_storage
+from PIL import Image
+
+from .ingest import apply_extracted
+from .lifecycle import discard_path, keep_page_raster, storage_name
+from .metrics import span
+
+logger = logging.getLogger(__name__)
+
+
+def open_source(document, debug: Dict) -> Tuple[Optional[Image.Image], Optional[str], Dict]:
+    """
+    (изображение, временный файл для удаления или None, новые artifacts).
+    Изображение None — источника нет или он не читается.
+    """
+    from .imaging import open_for_ocr, ImageRejected
+    from .utils import convert_pdf_to_jpg, locate_id_page
+
+    page = (document.artifacts or {}).get("page")
+    if page and default_storage.exists(page):
+        debug["source"] = "page_raster"
+        with span("decode", debug):
+            image = Image.open(default_storage.path(page))
+            image.load()
+        return image, None, {}
+
+    if document.jpg_file:
+        debug["source"] = "jpg"
+        try:
+            with span("decode", debug):
+                return open_for_ocr(document.jpg_file.path), None, {}
+        except ImageRejected as e:
+            debug.setdefault("warnings", []).append(str(e))
+            return None, None, {}
+
+    if not document.pdf_file:
+        return None, None, {}
+
+    debug["source"] = "pdf_render"
+    pdf_path = document.pdf_file.path
+    with span("locate", debug):
+        page_no = locate_id_page(pdf_path, debug)
+    with span("render", debug):
+        jpg_path = convert_pdf_to_jpg(pdf_path, page=page_no)
+    if not jpg_path:
+        return None, None, {}
+    with span("decode", debug):
+        image = Image.open(jpg_path)
+        image.load()
+
+    name = storage_name(jpg_path) if keep_page_raster() else None
+    if name:
+        return image, None, {"page": name}
+    return image, jpg_path, {}
+
+
+def reocr_document(document, fields: Iterable[str], parser) -> Optional[List[str]]:
+    """
+    Перечитывает только fields по текущим рамкам parser.
+    Возвращает изменённые колонки (для bulk_update) или None, если
+    источник не открылся или скан отклонён проверкой качества —
+    тогда прежние значения остаются.
+    """
+    debug: Dict = {}
+    image, temp_path, artifacts = open_source(document, debug)
+    if image is None:
+        logger.warning("reocr: документ %s без читаемого источника", document.pk)
+        return None
+    try:
+        lazy = parser.extract_lazy(image, fields, debug)
+        if lazy.rejected:
+            logger.warning("reocr: документ %s отклонён проверкой качества", document.pk)
+            return None
+        extracted = lazy.to_dict()
+        if artifacts:
+            extracted["artifacts"] = artifacts
+        return apply_extracted(document, extracted)
+    finally:
+        discard_path(temp_path)
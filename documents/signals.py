@@ -0,0 +1,48 @@
+# signals.py
+"""
+Удаление файлов вместе с документом (см. lifecycle.py) и настройка
+соединений SQLite.
+"""
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from .lifecycle import delete_document_files
+from .models import Document
+
+
+@receiver(post_delete, sender=Document)
+def delete_document_storage(sender, instance, **kwargs):
+    """Исходник, фото со всеми размерами и промежуточные артефакты."""
+    delete_document_files(instance)
+
+
+# WAL: читатели не ждут писателя; synchronous=NORMAL в WAL безопасен при сбое
+# процесса (при сбое питания можно потерять последние транзакции, но не базу)
+DEFAULT_SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": 5000,
+    "temp_store": "MEMORY",
+}
+
+
+def sqlite_pragmas():
+    """DOCUMENTS_SQLITE_PRAGMAS: True — DEFAULT_SQLITE_PRAGMAS, dict — свои, иначе выключено."""
+    value = getattr(settings, "DOCUMENTS_SQLITE_PRAGMAS", False)
+    if value is True:
+        return DEFAULT_SQLITE_PRAGMAS
+    return value or {}
+
+
+@receiver(connection_created)
+def tune_sqlite(sender, connection, **kwargs):
+    if connection.vendor != "sqlite":
+        return
+    pragmas = sqlite_pragmas()
+    if not pragmas:
+        return
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name} = {value}")
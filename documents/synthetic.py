@@ -0,0 +1,308 @@
+# synthetic.py
+"""
+Генератор синтетических удостоверений личности с известной разметкой.
+
+Рисует ФИО, ИИН и прочие поля в ROI из coordinate_config.json шрифтами
+из static/fonts и сохраняет PDF + JPG + manifest.json с эталонными
+значениями. Используется бенчмарком (ocr_bench) и регрессионным прогоном.
+"""
+import json
+import os
+import random
+from datetime import date, timedelta
+from typing import Dict, List, Tuple
+
+from PIL import Image, ImageDraw, ImageFilter, ImageFont
+
+from .iin import check_digit
+
+# Размер карты ID-1 (85.6 x 54 мм) в пикселях исходного растра
+CARD_WIDTH_PX = 1400
+CARD_HEIGHT_PX = int(CARD_WIDTH_PX * 54 / 85.6)
+CARD_WIDTH_MM = 85.6
+
+MANIFEST_NAME = "manifest.json"
+
+# ---------------------
+# СЛОВАРИ ИМЁН
+# ---------------------
+
+KZ_SURNAMES = [
+    "Әбдіқадыров", "Жұмабеков", "Қасымов", "Нұрланов", "Сәрсенбаев",
+    "Төлеубаев", "Ержанов", "Мұхамеджанов", "Оспанов", "Бекмұхамбетов",
+    "Ахметов", "Серікбаев", "Қуанышев", "Байжанов", "Тұрсынов",
+]
+RU_SURNAMES = [
+    "Иванов", "Смирнов", "Кузнецов", "Попов", "Васильев",
+    "Петров", "Соколов", "Михайлов", "Новиков", "Фёдоров",
+]
+KZ_MALE_NAMES = [
+    "Әлихан", "Нұрсұлтан", "Ерлан", "Данияр", "Қайрат",
+    "Мұхтар", "Бауыржан", "Серік", "Асқар", "Тимур", "Ержан", "Арман",
+]
+KZ_FEMALE_NAMES = [
+    "Әйгерім", "Айгүл", "Гүлнар", "Жанар", "Қарлығаш",
+    "Ұлжан", "Динара", "Сәуле", "Меруерт", "Аружан", "Іңкәр",
+]
+RU_MALE_NAMES = ["Алексей", "Дмитрий", "Сергей", "Андрей", "Михаил", "Николай"]
+RU_FEMALE_NAMES = ["Анна", "Елена", "Ольга", "Наталья", "Мария", "Татьяна"]
+# Русские отчества (мужское, женское)
+RU_PATRONYMICS = [
+    ("Иванович", "Ивановна"),
+    ("Сергеевич", "Сергеевна"),
+    ("Петрович", "Петровна"),
+    ("Михайлович", "Михайловна"),
+    ("Николаевич", "Николаевна"),
+]
+
+BIRTH_PLACES = [
+    "Алматы", "Астана", "Шымкент", "Қарағанды", "Ақтөбе",
+    "Павлодар", "Өскемен", "Семей", "Тараз", "Қызылорда",
+]
+NATIONALITIES = ["ҚАЗАҚ", "ОРЫС", "ҰЙҒЫР", "ТАТАР", "ӨЗБЕК"]
+ISSUERS = ["ҚР ІІМ", "МВД РК", "ӘДІЛЕТ МИНИСТРЛІГІ", "МЮ РК"]
+
+# Подписи над полями (то, что парсер должен вырезать через bad_labels)
+FIELD_LABELS = {
+    "last_name": "ТЕГІ / ФАМИЛИЯ",
+    "first_name": "АТЫ / ИМЯ",
+    "patronymic": "ӘКЕСІНІҢ АТЫ / ОТЧЕСТВО",
+    "birth_date": "ТУҒАН КҮНІ / ДАТА РОЖДЕНИЯ",
+    "iin": "ЖСН / ИИН",
+}
+
+# ---------------------
+# ИИН
+# ---------------------
+
+def random_iin(rng: random.Random, birth: date, male: bool) -> str:
+    """ИИН с корректной датой рождения, разрядом века/пола и контрольной суммой."""
+    century = 1 if birth.year < 1900 else (3 if birth.year < 2000 else 5)
+    gender_digit = century if male else century + 1
+    prefix = f"{birth:%y%m%d}{gender_digit}"
+    while True:
+        first11 = prefix + f"{rng.randrange(10000):04d}"
+        check = check_digit(first11)
+        if check is not None:
+            return first11 + str(check)
+
+
+def _random_date(rng: random.Random, start: date, end: date) -> date:
+    return start + timedelta(days=rng.randrange((end - start).days))
+
+
+def random_identity(rng: random.Random) -> Dict[str, str]:
+    """
+    Случайная личность. Значения — в том виде, в каком их должен вернуть парсер
+    (ФИО — Title Case, даты — ДД.ММ.ГГГГ).
+    """
+    male = rng.random() < 0.5
+    kazakh = rng.random() < 0.7
+
+    if kazakh:
+        surname = rng.choice(KZ_SURNAMES)
+        first = rng.choice(KZ_MALE_NAMES if male else KZ_FEMALE_NAMES)
+        father = rng.choice(KZ_MALE_NAMES)
+        patronymic = father + ("ұлы" if male else "қызы")
+    else:
+        surname = rng.choice(RU_SURNAMES)
+        first = rng.choice(RU_MALE_NAMES if male else RU_FEMALE_NAMES)
+        patronymic = rng.choice(RU_PATRONYMICS)[0 if male else 1]
+    if not male:
+        surname += "а"
+
+    birth = _random_date(rng, date(1960, 1, 1), date(2008, 12, 31))
+    issue = _random_date(rng, date(2015, 1, 1), date(2024, 12, 31))
+    expiry = issue.replace(year=issue.year + 10)
+
+    return {
+        "last_name": surname,
+        "first_name": first,
+        "patronymic": patronymic,
+        "birth_date": f"{birth:%d.%m.%Y}",
+        "iin": random_iin(rng, birth, male),
+        "birth_place": rng.choice(BIRTH_PLACES),
+        "nationality": rng.choice(NATIONALITIES),
+        "document_number": f"{rng.randrange(10 ** 9):09d}",
+        "issued_by": rng.choice(ISSUERS),
+        "issue_date": f"{issue:%d.%m.%Y}",
+        "expiry_date": f"{expiry:%d.%m.%Y}",
+    }
+
+# ---------------------
+# РИСОВАНИЕ
+# ---------------------
+
+def _load_font(path: str, size: int) -> ImageFont.FreeTypeFont:
+    try:
+        return ImageFont.truetype(path, size)
+    except OSError:
+        return ImageFont.load_default()
+
+
+def _fit_font(draw: ImageDraw.ImageDraw, text: str, font_path: str, box_w: int, box_h: int):
+    """Подбирает кегль, чтобы текст поместился в ROI (по высоте ~80%)."""
+    size = max(8, int(box_h * 0.8))
+    font = _load_font(font_path, size)
+    while size > 8:
+        l, t, r, b = draw.textbbox((0, 0), text, font=font)
+        if r - l <= box_w and b - t <= box_h:
+            break
+        size -= 1
+        font = _load_font(font_path, size)
+    return font
+
+
+def render_card(
+    identity: Dict[str, str],
+    coordinates: Dict[str, List[float]],
+    fonts_dir: str,
+    size: Tuple[int, int] = (CARD_WIDTH_PX, CARD_HEIGHT_PX),
+) -> Image.Image:
+    """Рисует «чистую» карту: фон, подписи, значения полей в ROI и фото."""
+    w, h = size
+    img = Image.new("RGB", (w, h), (233, 240, 236))
+    draw = ImageDraw.Draw(img)
+
+    regular = os.path.join(fonts_dir, "HelveticaNeue-Roman.otf")
+    bold = os.path.join(fonts_dir, "HelveticaNeue-Bold.otf")
+
+    # шапка
+    header_font = _load_font(bold, int(h * 0.045))
+    draw.text((int(w * 0.05), int(h * 0.04)), "ҚАЗАҚСТАН РЕСПУБЛИКАСЫ", fill=(20, 60, 110), font=header_font)
+    draw.text((int(w * 0.05), int(h * 0.095)), "ЖЕКЕ КУӘЛІК / УДОСТОВЕРЕНИЕ ЛИЧНОСТИ",
+              fill=(20, 60, 110), font=_load_font(regular, int(h * 0.03)))
+
+    label_font = _load_font(regular, max(8, int(h * 0.016)))
+    for field, coords in coordinates.items():
+        l, t, r, b = (int(coords[0] * w), int(coords[1] * h), int(coords[2] * w), int(coords[3] * h))
+
+        if field == "photo":
+            draw.rectangle((l, t, r, b), fill=(200, 205, 210))
+            cx, cy = (l + r) // 2, (t + b) // 2
+            rw, rh = (r - l) // 4, (b - t) // 5
+            draw.ellipse((cx - rw, cy - rh * 2, cx + rw, cy), fill=(90, 90, 95))
+            draw.ellipse((cx - rw * 2, cy + rh // 2, cx + rw * 2, b + rh), fill=(90, 90, 95))
+            continue
+
+        value = identity.get(field)
+        if not value:
+            continue
+
+        label = FIELD_LABELS.get(field)
+        if label:
+            draw.text((l, t - label_font.size - 2), label, fill=(90, 100, 110), font=label_font)
+
+        text = value.upper() if field in ("last_name", "first_name", "patronymic") else value
+        font = _fit_font(draw, text, bold, r - l, b - t)
+        tl, tt, _, tb = draw.textbbox((0, 0), text, font=font)
+        y = t + ((b - t) - (tb - tt)) // 2 - tt
+        draw.text((l - tl, y), text, fill=(15, 15, 20), font=font)
+
+    return img
+
+
+def degrade(
+    img: Image.Image,
+    rng: random.Random,
+    noise: float = 0.0,
+    blur: float = 0.0,
+    rotation: float = 0.0,
+) -> Image.Image:
+    """
+    Имитация скана:
+    - noise: сила гауссова шума (0..1)
+    - blur: радиус гауссова размытия в пикселях
+    - rotation: максимальный угол поворота в градусах (берётся случайный ±)
+    """
+    if rotation:
+        angle = rng.uniform(-rotation, rotation)
+        img = img.rotate(angle, resample=Image.Resampling.BICUBIC, fillcolor=(255, 255, 255))
+    if blur:
+        img = img.filter(ImageFilter.GaussianBlur(blur))
+    if noise:
+        sigma = 8 + 64 * noise
+        grain = Image.effect_noise(img.size, sigma).convert("RGB")
+        img = Image.blend(img, grain, min(0.5, noise * 0.5))
+    return img
+
+# ---------------------
+# КОРПУС
+# ---------------------
+
+def generate_corpus(
+    out_dir: str,
+    count: int,
+    coordinates: Dict[str, List[float]],
+    fonts_dir: str,
+    seed: int = 0,
+    noise: float = 0.0,
+    blur: float = 0.0,
+    rotation: float = 0.0,
+) -> Dict:
+    """
+    Генерирует count документов в out_dir:
+      pdf/<id>.pdf, jpg/<id>.jpg, manifest.json
+    PDF и JPG лежат в разных каталогах: convert_pdf_to_jpg пишет JPG рядом с PDF.
+    """
+    rng = random.Random(seed)
+    pdf_dir = os.path.join(out_dir, "pdf")
+    jpg_dir = os.path.join(out_dir, "jpg")
+    os.makedirs(pdf_dir, exist_ok=True)
+    os.makedirs(jpg_dir, exist_ok=True)
+
+    # PDF-страница = размер карты, чтобы нормированные ROI совпадали после рендера
+    pdf_resolution = CARD_WIDTH_PX / (CARD_WIDTH_MM / 25.4)
+
+    samples = []
+    for i in range(count):
+        sample_id = f"synthetic_{seed}_{i:05d}"
+        identity = random_identity(rng)
+        img = degrade(render_card(identity, coordinates, fonts_dir), rng,
+                      noise=noise, blur=blur, rotation=rotation)
+
+        pdf_rel = os.path.join("pdf", f"{sample_id}.pdf")
+        jpg_rel = os.path.join("jpg", f"{sample_id}.jpg")
+        img.save(os.path.join(out_dir, pdf_rel), "PDF", resolution=pdf_resolution)
+        img.save(os.path.join(out_dir, jpg_rel), "JPEG", quality=92)
+
+        samples.append({"id": sample_id, "pdf": pdf_rel, "jpg": jpg_rel, "truth": identity})
+
+    manifest = {
+        "seed": seed,
+        "params": {"noise": noise, "blur": blur, "rotation": rotation},
+        "coordinates": coordinates,
+        "samples": samples,
+    }
+    with open(os.path.join(out_dir, MANIFEST_NAME), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    return manifest
+
+
+def load_corpus(corpus_dir: str) -> List[Dict]:
+    """
+    Загружает размеченный корпус.
+    Поддерживает manifest.json генератора и «ручную» разметку:
+    <имя>.pdf + <имя>.json с эталонными полями рядом.
+    """
+    manifest_path = os.path.join(corpus_dir, MANIFEST_NAME)
+    if os.path.exists(manifest_path):
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        return [
+            {**s, "pdf": os.path.join(corpus_dir, s["pdf"]),
+             "jpg": os.path.join(corpus_dir, s["jpg"]) if s.get("jpg") else None}
+            for s in manifest.get("samples", [])
+        ]
+
+    samples = []
+    for entry in sorted(os.scandir(corpus_dir), key=lambda e: e.name):
+        if not entry.name.lower().endswith(".pdf"):
+            continue
+        label_path = os.path.splitext(entry.path)[0] + ".json"
+        if not os.path.exists(label_path):
+            continue
+        with open(label_path, "r", encoding="utf-8") as f:
+            truth = json.load(f)
+        samples.append({"id": os.path.splitext(entry.name)[0], "pdf": entry.path, "jpg": None, "truth": truth})
+    return samples
@@ -0,0 +1,369 @@
+import asyncio
+import hashlib
+import json
+import os
+import random
+import tempfile
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.http import JsonResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from PIL import Image, ImageDraw
+
+from . import api, media, registration, synthetic
+from .derivatives import PhotoDerivatives
+from .iin import decode_iin, validate_iin
+from .lexicon import NameLexicon, builtin_names
+from .models import Document
+from .uploads import MISMATCH_MESSAGE, UploadSizeLimit, streaming_upload
+
+# ---------------------
+# ИИН
+# ---------------------
+
+VALID_IIN = "900101300126"
+
+
+def _choices(iin, conf=0.99):
+    return [[(ch, conf)] for ch in iin]
+
+
+class DecodeIinTests(SimpleTestCase):
+    def test_valid_top1_kept(self):
+        decoded = decode_iin(_choices(VALID_IIN))
+        self.assertEqual(decoded["iin"], VALID_IIN)
+        self.assertEqual(decoded["corrected"], [])
+
+    def test_fixed_from_tesseract_alternative(self):
+        """Ошибка в позиции, где верная цифра — второй вариант распознавателя."""
+        candidates = _choices(VALID_IIN)
+        candidates[4] = [("7", 0.55), ("0", 0.40)]
+        decoded = decode_iin(candidates)
+        self.assertEqual(decoded["iin"], VALID_IIN)
+        self.assertEqual(decoded["corrected"], [4])
+
+    def test_no_alternatives_not_fixed(self):
+        """Цифр, которых распознаватель не предлагал, не подставляем."""
+        candidates = _choices(VALID_IIN)
+        candidates[4] = [("7", 0.55)]
+        self.assertFalse(validate_iin("".join(c[0][0] for c in candidates)))
+        self.assertIsNone(decode_iin(candidates))
+
+    def test_unlikely_alternative_rejected(self):
+        candidates = _choices(VALID_IIN)
+        candidates[4] = [("7", 0.97), ("0", 0.02)]
+        self.assertIsNone(decode_iin(candidates))
+
+# ---------------------
+# ПРИВЯЗКА ROI
+# ---------------------
+
+CARD_BOX = (80, 60, 719, 463)
+
+
+def _scan(background, card):
+    img = Image.new("RGB", (800, 512), (background,) * 3)
+    ImageDraw.Draw(img).rectangle(CARD_BOX, fill=(card,) * 3)
+    return img
+
+
+class RegistrationTests(SimpleTestCase):
+    def _assert_card_found(self, img):
+        transform = registration.estimate_transform(img)
+        self.assertIsNotNone(transform)
+        expected = (80 / 800, 60 / 512, 720 / 800, 464 / 512)
+        for got, want in zip(transform["card_box"], expected):
+            self.assertAlmostEqual(got, want, delta=0.01)
+
+    def test_dark_background(self):
+        self._assert_card_found(_scan(0, 200))
+
+    def test_light_background(self):
+        """Рамка кадра после FIND_EDGES не должна считаться краем карты."""
+        self._assert_card_found(_scan(255, 30))
+        self._assert_card_found(_scan(120, 30))
+
+    def test_cropped_card_untouched(self):
+        self.assertIsNone(registration.estimate_transform(Image.new("RGB", (800, 512), (200,) * 3)))
+
+
+ROI = {
+    "last_name": [0.35, 0.30, 0.80, 0.36],
+    "first_name": [0.35, 0.40, 0.80, 0.46],
+    "iin": [0.05, 0.85, 0.40, 0.91],
+    "photo": [0.05, 0.25, 0.30, 0.75],
+}
+
+
+class RenderedCardRegistrationTests(SimpleTestCase):
+    """Карта из synthetic.render_card: шапка и фото не должны приниматься за края."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        identity = synthetic.random_identity(random.Random(0))
+        fonts_dir = os.path.join(settings.BASE_DIR, "static", "fonts")
+        cls.card = synthetic.render_card(identity, ROI, fonts_dir)
+
+    def test_framed_card_untouched(self):
+        self.assertIsNone(registration.estimate_transform(self.card))
+
+    def test_faint_border_untouched(self):
+        """Край карты на белом фоне не виден — лучше не сдвигать ROI, чем сдвинуть к рамке кадра."""
+        scan = Image.new("RGB", (1800, 1200), (255,) * 3)
+        scan.paste(self.card, (200, 160))
+        self.assertIsNone(registration.estimate_transform(scan))
+
+    def test_card_on_dark_scan(self):
+        scan = Image.new("RGB", (1800, 1200), (20,) * 3)
+        scan.paste(self.card, (200, 160))
+        transform = registration.estimate_transform(scan)
+        self.assertIsNotNone(transform)
+        warped = registration.warp_coordinates(ROI, transform)
+        w, h = self.card.size
+        for field, (l, t, r, b) in ROI.items():
+            expected = ((200 + l * w) / 1800, (160 + t * h) / 1200, (200 + r * w) / 1800, (160 + b * h) / 1200)
+            for got, want in zip(warped[field], expected):
+                self.assertAlmostEqual(got, want, delta=0.005, msg=field)
+
+# ---------------------
+# СЛОВАРЬ ИМЁН
+# ---------------------
+
+class NameLexiconTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.lexicon = NameLexicon.build(builtin_names())
+
+    def test_ocr_confusions_fixed(self):
+        self.assertEqual(self.lexicon.snap("ДАНИЯP"), "ДАНИЯР")
+        self.assertEqual(self.lexicon.snap("АЙГYЛ"), "АЙГҮЛ")
+        self.assertEqual(self.lexicon.snap("CЕРГЕЕВИЧ"), "СЕРГЕЕВИЧ")
+
+    def test_correct_names_untouched(self):
+        """Верно прочитанные реальные имена (в том числе вне словаря) не заменяются."""
+        for name in ("СЕРГЕЕВИЧ", "НИКОЛАЕВИЧ", "МИХАЙЛОВИЧ", "ПЕТРОВИЧ", "ФЕДОРОВ", "ДАНИЯ", "АЙГУЛЬ"):
+            with self.subTest(name=name):
+                self.assertEqual(self.lexicon.snap(name), name)
+
+# ---------------------
+# МЕДИА
+# ---------------------
+
+class MediaTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.derivatives = PhotoDerivatives.from_image(Image.new("RGB", (300, 400), (120, 80, 40)), webp=False)
+        cls.names = {size: name for size, (name, _) in cls.derivatives.files.items()}
+        cls.document = Document.objects.create(
+            pdf_file="pdfs/scan.pdf",
+            photo=cls.names["print"],
+            photo_variants=cls.names,
+            artifacts={"page": "pdfs/scan.jpg"},
+        )
+        Document.objects.create(jpg_file="jpgs/other.jpg")
+
+    def test_derivatives_are_immutable(self):
+        stat = os.stat(__file__)
+        for name in self.names.values():
+            with self.subTest(name=name):
+                etag, immutable = media._etag(name, stat)
+                self.assertTrue(immutable)
+                self.assertIn(self.derivatives.key, etag)
+
+    def test_other_files_revalidate(self):
+        self.assertFalse(media._etag("pdfs/scan.pdf", os.stat(__file__))[1])
+
+    def test_owner_lookup(self):
+        for name in [*self.names.values(), "pdfs/scan.pdf", "pdfs/scan.jpg"]:
+            with self.subTest(name=name), self.assertNumQueries(1):
+                self.assertEqual(media.document_for_file(name).pk, self.document.pk)
+
+    def test_unknown_files(self):
+        key = self.derivatives.key
+        for name in (f"photos/{key}_huge.jpg", "pdfs/other.jpg", "photos/{0}_thumb.jpg".format("0" * 20)):
+            with self.subTest(name=name):
+                self.assertIsNone(media.document_for_file(name))
+
+# ---------------------
+# ЗАГРУЗКИ
+# ---------------------
+
+PDF_BYTES = b"%PDF-1.4\n" + b"0" * 5000
+JPEG_BYTES = b"\xff\xd8\xff\xe0" + b"0" * 5000
+
+
+@streaming_upload(csrf=False)
+def upload_view(request):
+    upload = request.FILES.get("file")
+    sha256 = None
+    if upload:
+        sha256 = upload.sha256
+        upload.close()
+    return JsonResponse({"sha256": sha256, "rejected": getattr(request, "upload_rejected", "")})
+
+
+class DocumentUploadHandlerTests(SimpleTestCase):
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        override = override_settings(MEDIA_ROOT=media_root.name, DOCUMENTS_MAX_UPLOAD_SIZE=10 * 1024)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def _upload(self, name, content):
+        request = RequestFactory().post("/upload/", {"file": SimpleUploadedFile(name, content)})
+        return json.loads(upload_view(request).content)
+
+    def test_accepted_with_sha256(self):
+        result = self._upload("scan.pdf", PDF_BYTES)
+        self.assertEqual(result["sha256"], hashlib.sha256(PDF_BYTES).hexdigest())
+        self.assertEqual(result["rejected"], "")
+
+    def test_signature_mismatch(self):
+        result = self._upload("scan.pdf", JPEG_BYTES)
+        self.assertIsNone(result["sha256"])
+        self.assertEqual(result["rejected"], MISMATCH_MESSAGE)
+
+    def test_unknown_extension(self):
+        result = self._upload("scan.gif", PDF_BYTES)
+        self.assertIsNone(result["sha256"])
+        self.assertIn("PDF, JPG или PNG", result["rejected"])
+
+    def test_file_over_limit(self):
+        """Content-Length в пределах запаса на multipart — отказ на лишнем чанке."""
+        result = self._upload("scan.pdf", PDF_BYTES + b"0" * 20 * 1024)
+        self.assertIsNone(result["sha256"])
+        self.assertIn("слишком большой", result["rejected"])
+
+    def test_content_length_over_limit(self):
+        """Отказ по Content-Length — до чтения тела."""
+        result = self._upload("scan.pdf", PDF_BYTES + b"0" * 200 * 1024)
+        self.assertIsNone(result["sha256"])
+        self.assertIn("слишком большой", result["rejected"])
+
+
+@override_settings(DOCUMENTS_MAX_UPLOAD_SIZE=1024)
+class UploadSizeLimitTests(SimpleTestCase):
+    """ASGI-обёртка: 413 до того, как приложение начнёт читать тело."""
+
+    def _call(self, headers, chunks):
+        calls = []
+
+        async def app(scope, receive, send):
+            body = b""
+            while True:
+                message = await receive()
+                if message["type"] == "http.disconnect":
+                    return
+                body += message.get("body", b"")
+                if not message.get("more_body"):
+                    break
+            calls.append(len(body))
+            await send({"type": "http.response.start", "status": 200, "headers": []})
+            await send({"type": "http.response.body", "body": b"ok"})
+
+        messages = [
+            {"type": "http.request", "body": chunk, "more_body": i < len(chunks) - 1}
+            for i, chunk in enumerate(chunks)
+        ]
+        sent = []
+
+        async def receive():
+            return messages.pop(0)
+
+        async def send(message):
+            sent.append(message)
+
+        scope = {"type": "http", "method": "POST", "path": "/upload/", "headers": headers}
+        asyncio.run(UploadSizeLimit(app)(scope, receive, send))
+        status = next(m["status"] for m in sent if m["type"] == "http.response.start")
+        return status, calls
+
+    def test_small_body_passes(self):
+        self.assertEqual(self._call([(b"content-length", b"10")], [b"x" * 10]), (200, [10]))
+
+    def test_content_length_over_limit(self):
+        self.assertEqual(self._call([(b"content-length", b"999999")], [b"x"]), (413, []))
+
+    def test_chunked_body_over_limit(self):
+        self.assertEqual(self._call([], [b"x" * 40 * 1024] * 3), (413, []))
+
+# ---------------------
+# JSON API
+# ---------------------
+
+class DocumentApiTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("reader", password="x")
+        base = timezone.now() - timedelta(hours=1)
+        cls.documents = []
+        for i in range(5):
+            document = Document.objects.create(iin=f"90010130012{i}", last_name=f"ИВАНОВ{i}")
+            Document.objects.filter(pk=document.pk).update(
+                created_at=base + timedelta(minutes=i), updated_at=base + timedelta(minutes=i)
+            )
+            cls.documents.append(document)
+
+    def _request(self, headers=None, **params):
+        request = RequestFactory().get("/api/documents/", params, **(headers or {}))
+        request.user = self.user
+        return request
+
+    def _get(self, **params):
+        return api.document_list(self._request(**params))
+
+    def _pages(self, **params):
+        ids, cursor = [], None
+        while True:
+            query = dict(params, **({"cursor": cursor} if cursor else {}))
+            data = json.loads(self._get(**query).content)
+            ids += [row["id"] for row in data["results"]]
+            cursor = data["next_cursor"]
+            if not data["results"] or not data["has_more"]:
+                return ids, cursor
+
+    def test_cursor_round_trip(self):
+        ids, cursor = self._pages(limit=2, fields="id")
+        self.assertEqual(ids, [d.pk for d in reversed(self.documents)])
+        self.assertIsNone(cursor)
+
+    def test_sync_cursor_skips_rows_inside_lag(self):
+        fresh = Document.objects.create(iin="900101300126")
+        ids, cursor = self._pages(order="updated", limit=2, fields="id")
+        self.assertEqual(ids, [d.pk for d in self.documents])
+        self.assertNotIn(fresh.pk, ids)
+        # курсор остаётся на месте, пока свежая строка не выйдет из лага
+        data = json.loads(self._get(order="updated", fields="id", cursor=cursor).content)
+        self.assertEqual((data["results"], data["next_cursor"]), ([], cursor))
+
+    def test_fields_selection(self):
+        data = json.loads(self._get(fields="id,iin", limit=1).content)
+        self.assertEqual(set(data["results"][0]), {"id", "iin"})
+
+    def test_unknown_field_rejected(self):
+        self.assertEqual(self._get(fields="id,password").status_code, 400)
+
+    def test_bad_cursor_rejected(self):
+        self.assertEqual(self._get(cursor="garbage").status_code, 400)
+        _, cursor = self._pages(order="updated")
+        self.assertEqual(self._get(cursor=cursor).status_code, 400)
+
+    def test_not_modified(self):
+        response = self._get(fields="id", limit=2)
+        again = self._get(fields="id", limit=2, headers={"HTTP_IF_NONE_MATCH": response["ETag"]})
+        self.assertEqual(again.status_code, 304)
+        Document.objects.filter(pk=self.documents[-1].pk).update(updated_at=timezone.now())
+        changed = self._get(fields="id", limit=2, headers={"HTTP_IF_NONE_MATCH": response["ETag"]})
+        self.assertEqual(changed.status_code, 200)
+
+    def test_detail(self):
+        document = self.documents[0]
+        response = api.document_detail(self._request(), document.pk)
+        self.assertEqual(json.loads(response.content)["data"]["iin"], document.iin)
@@ -0,0 +1,252 @@
+# uploads.py
+"""
+Приём загрузок за один проход по потоку.
+
+DocumentUploadHandler заменяет стандартные обработчики Django на
+эндпоинтах загрузки документа:
+- запрос с Content-Length больше лимита отклоняется до чтения тела,
+  файл больше лимита — на первом лишнем чанке (StopUpload);
+- по первому чанку сверяются сигнатура (%PDF, JPEG, PNG) и расширение;
+- в том же проходе считается SHA-256;
+- чанки пишутся сразу во временный файл внутри MEDIA_ROOT, поэтому
+  FileSystemStorage кладёт файл на место переименованием, без копии.
+
+Причина отказа — в request.upload_rejected (её показывают view).
+
+Один проход и ранний отказ — только под WSGI. ASGIHandler Django сам
+вычитывает тело целиком во временный файл ещё до view, поэтому под
+ASGI (DOCUMENTS_ASYNC_VIEWS) размер ограничивает UploadSizeLimit в
+datas/asgi.py: по Content-Length — до чтения тела, без него — на первом
+сообщении сверх лимита. Остальное (сигнатура, SHA-256) работает так же,
+но уже по спуленному телу.
+"""
+import hashlib
+import os
+import tempfile
+from functools import wraps
+from typing import Optional
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.core.files.uploadedfile import TemporaryUploadedFile, UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler, SkipFile, StopUpload
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
+
+# Каталог для недописанных загрузок (та же ФС, что и pdfs/, jpgs/); сирот чистит gc_media
+STAGING_DIR = "uploads_tmp"
+
+# Запас на заголовки multipart поверх размера файла
+MULTIPART_OVERHEAD = 64 * 1024
+
+# Сигнатуры. PDF допускает мусор перед %PDF (до 1024 байт)
+PDF_MAGIC = b"%PDF-"
+IMAGE_MAGIC = (
+    (b"\xff\xd8\xff", "jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "png"),
+)
+EXT_KINDS = {".pdf": "pdf", ".jpg": "jpeg", ".jpeg": "jpeg", ".png": "png"}
+
+MISMATCH_MESSAGE = "Содержимое файла не соответствует расширению (PDF, JPG или PNG)"
+
+
+def max_upload_size() -> int:
+    return int(getattr(settings, "DOCUMENTS_MAX_UPLOAD_SIZE", 10 * 1024 * 1024))
+
+
+def sniff(head: bytes) -> Optional[str]:
+    """Тип файла по первым байтам: 'pdf', 'jpeg', 'png' или None."""
+    for magic, kind in IMAGE_MAGIC:
+        if head.startswith(magic):
+            return kind
+    if PDF_MAGIC in head[:1024]:
+        return "pdf"
+    return None
+
+
+def kind_for_name(name: str) -> Optional[str]:
+    return EXT_KINDS.get(os.path.splitext(name or "")[1].lower())
+
+
+class StagedUploadedFile(TemporaryUploadedFile):
+    """TemporaryUploadedFile во временном каталоге внутри MEDIA_ROOT."""
+
+    def __init__(self, name, content_type, size, charset, content_type_extra=None):
+        directory = os.path.join(settings.MEDIA_ROOT, STAGING_DIR)
+        os.makedirs(directory, exist_ok=True)
+        _, ext = os.path.splitext(name)
+        file = tempfile.NamedTemporaryFile(suffix=".upload" + ext, dir=directory)
+        UploadedFile.__init__(self, file, name, content_type, size, charset, content_type_extra)
+        self.sha256 = ""
+
+
+class DocumentUploadHandler(FileUploadHandler):
+    def __init__(self, request=None):
+        super().__init__(request)
+        self.limit = max_upload_size()
+        self.too_large = False
+        self.hasher = None
+        self.size = 0
+
+    def _reject(self, message: str):
+        if self.request is not None:
+            self.request.upload_rejected = message
+
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
+        # решение по Content-Length — в new_file (исключения отсюда Django не ловит)
+        self.too_large = content_length is not None and content_length > self.limit + MULTIPART_OVERHEAD
+
+    def new_file(self, field_name, file_name, content_type, content_length, charset=None, content_type_extra=None):
+        super().new_file(field_name, file_name, content_type, content_length, charset, content_type_extra)
+        if self.too_large:
+            self._reject(_size_message(self.limit))
+            raise StopUpload(connection_reset=True)
+        if kind_for_name(file_name) is None:
+            self._reject("Файл должен быть в формате PDF, JPG или PNG")
+            raise SkipFile()
+
+        self.hasher = hashlib.sha256()
+        self.size = 0
+        self.file = StagedUploadedFile(file_name, content_type, 0, charset, content_type_extra)
+
+    def receive_data_chunk(self, raw_data, start):
+        # первый чанк (64 КБ) покрывает всё окно сигнатуры
+        if start == 0 and sniff(raw_data) != kind_for_name(self.file_name):
+            self._reject(MISMATCH_MESSAGE)
+            raise SkipFile()
+
+        self.size += len(raw_data)
+        if self.size > self.limit:
+            self._reject(_size_message(self.limit))
+            raise StopUpload(connection_reset=True)
+
+        self.hasher.update(raw_data)
+        self.file.write(raw_data)
+        return None
+
+    def file_complete(self, file_size):
+        self.file.seek(0)
+        self.file.size = file_size
+        self.file.sha256 = self.hasher.hexdigest()
+        return self.file
+
+    def upload_interrupted(self):
+        if getattr(self, "file", None) is not None:
+            self.file.close()
+
+
+def _size_message(limit: int) -> str:
+    return f"Файл слишком большой. Максимальный размер: {limit // (1024 * 1024)} МБ"
+
+
+def file_sha256(upload) -> str:
+    """SHA-256 загрузки: из обработчика, если он уже посчитал, иначе проходом по чанкам."""
+    digest = getattr(upload, "sha256", "")
+    if digest:
+        return digest
+    hasher = hashlib.sha256()
+    for chunk in upload.chunks():
+        hasher.update(chunk)
+    upload.seek(0)
+    return hasher.hexdigest()
+
+
+def streaming_upload(csrf: bool = True):
+    """
+    Декоратор view: загрузка читается DocumentUploadHandler.
+    Обработчики надо подменить до того, как CSRF-middleware прочитает request.POST,
+    поэтому снаружи csrf_exempt, а проверка CSRF — внутри (csrf=False для API).
+    """
+    def decorator(view):
+        inner = csrf_protect(view) if csrf else view
+
+        if iscoroutinefunction(view):
+            @wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                request.upload_handlers = [DocumentUploadHandler(request)]
+                return await inner(request, *args, **kwargs)
+
+            return csrf_exempt(async_wrapper)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            request.upload_handlers = [DocumentUploadHandler(request)]
+            return inner(request, *args, **kwargs)
+
+        return csrf_exempt(wrapper)
+
+    return decorator
+
+
+# ---------------------
+# ASGI
+# ---------------------
+
+class UploadSizeLimit:
+    """
+    ASGI-обёртка приложения: 413 на тела больше лимита загрузки, пока
+    ASGIHandler не начал спулить их на диск. Лимит тот же, что у
+    DocumentUploadHandler (с запасом на multipart), других больших тел у
+    приложения нет.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        limit = max_upload_size() + MULTIPART_OVERHEAD
+        length = _content_length(scope)
+        if length is not None and length > limit:
+            return await _payload_too_large(send)
+
+        received = 0
+        exceeded = started = False
+
+        async def limited_receive():
+            nonlocal received, exceeded
+            if exceeded:
+                return {"type": "http.disconnect"}
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    # ASGIHandler на disconnect бросает чтение и view не зовёт
+                    exceeded = True
+                    return {"type": "http.disconnect"}
+            return message
+
+        async def tracked_send(message):
+            nonlocal started
+            if message["type"] == "http.response.start":
+                started = True
+            await send(message)
+
+        await self.app(scope, limited_receive, tracked_send)
+        if exceeded and not started:
+            await _payload_too_large(send)
+
+
+def _content_length(scope) -> Optional[int]:
+    for name, value in scope.get("headers", ()):
+        if name == b"content-length":
+            try:
+                return int(value)
+            except ValueError:
+                return None
+    return None
+
+
+async def _payload_too_large(send):
+    body = _size_message(max_upload_size()).encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": 413,
+        "headers": [
+            (b"content-type", b"text/plain; charset=utf-8"),
+            (b"content-length", str(len(body)).encode()),
+            (b"connection", b"close"),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
@@ -1,14 +1,28 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import api, views
+
+# Под ASGI тяжёлые view можно переключить на async-версии (см. async_views.py)
+if getattr(settings, 'DOCUMENTS_ASYNC_VIEWS', False):
+    from . import async_views as heavy
+else:
+    heavy = views
 
 urlpatterns = [
     path('', views.home, name='home'),
-    path('upload/', views.upload_document, name='upload_document'),
+    path('upload/', heavy.upload_document, name='upload_document'),
     path('documents/', views.document_list, name='document_list'),
     path('documents/<int:pk>/', views.document_detail, name='document_detail'),
     path('documents/<int:pk>/set_test_date/', views.set_test_date, name='set_test_date'),
-    path('documents/<int:pk>/export-pdf/', views.document_export_pdf, name='document_export_pdf'),
+    path('documents/<int:pk>/export-pdf/', heavy.document_export_pdf, name='document_export_pdf'),
     path('calibrate/', views.coordinate_calibration, name='coordinate_calibration'),
     path('api/save-coordinates/', views.save_coordinates, name='save_coordinates'),
+    path('calibrate/preview/', views.calibration_preview, name='calibration_preview'),
     path('api/get-coordinates/', views.get_coordinates, name='get_coordinates'),
+    path('api/upload/', heavy.api_upload_document, name='api_upload_document'),
+    path('api/documents/', api.document_list, name='api_document_list'),
+    path('api/documents/<int:pk>/', api.document_detail, name='api_document_detail'),
+    path('metrics', views.metrics, name='metrics'),
+    path('profiles/', views.profile_list, name='profile_list'),
+    path('profiles/<str:name>', views.profile_download, name='profile_download'),
 ]
\ No newline at end of file
@@ -1,23 +1,34 @@
 # utils.py
 import re
 import logging
-from typing import Optional, Dict
+import subprocess
+from typing import Optional, Dict, Iterable
 
-from pdf2image import convert_from_path
+from .metrics import span
+from .lifecycle import discard_path, keep_page_raster, storage_name
 
 logger = logging.getLogger(__name__)
 
-def convert_pdf_to_jpg(pdf_path: str, dpi: int = 220) -> Optional[str]:
+# Слова, по которым страницу с лицевой стороной удостоверения видно в текстовом слое
+ID_PAGE_KEYWORDS = ("ЖЕКЕ КУӘЛІК", "УДОСТОВЕРЕНИЕ ЛИЧНОСТИ", "ТЕГІ", "ФАМИЛИЯ", "ЖСН", "ИИН")
+
+# DPI миниатюр для поиска страницы: ~ 200 px по ширине A4, рендер за миллисекунды
+LOCATOR_THUMB_DPI = 24
+
+
+def convert_pdf_to_jpg(pdf_path: str, dpi: int = 220, page: int = 1) -> Optional[str]:
     """
-    Рендерит 1-ю страницу PDF в JPG. DPI=220 обычно достаточно и быстрее 300.
+    Рендерит страницу page PDF в JPG. DPI=220 обычно достаточно и быстрее 300.
     Вернёт путь к JPG либо None.
     """
+    from pdf2image import convert_from_path
+
     try:
         images = convert_from_path(
             pdf_path,
             dpi=dpi,
-            first_page=1,
-            last_page=1,
+            first_page=page,
+            last_page=page,
             fmt="jpeg"  # сразу JPEG
         )
         if not images:
@@ -31,35 +42,179 @@ def convert_pdf_to_jpg(pdf_path: str, dpi: int = 220) -> Optional[str]:
         return None
 
 
-def extract_data_from_pdf(pdf_path: str) -> Dict:
+def _pdf_page_count(pdf_path: str) -> int:
+    from pdf2image import pdfinfo_from_path
+
+    try:
+        return int(pdfinfo_from_path(pdf_path).get("Pages", 1))
+    except Exception:
+        logger.warning("pdfinfo failed for %s", pdf_path)
+        return 1
+
+
+def _locate_by_text(pdf_path: str) -> Optional[int]:
+    """
+    Страница по текстовому слою (pdftotext из poppler, страницы разделены \\f).
+    Для сканов без текстового слоя вернёт None.
+    """
+    try:
+        out = subprocess.run(
+            ["pdftotext", "-enc", "UTF-8", pdf_path, "-"],
+            capture_output=True, timeout=15,
+        )
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+    if out.returncode != 0:
+        return None
+
+    best_page, best_hits = None, 0
+    for idx, text in enumerate(out.stdout.decode("utf-8", "ignore").split("\f"), start=1):
+        up = text.upper()
+        hits = sum(1 for kw in ID_PAGE_KEYWORDS if kw in up)
+        if hits > best_hits:
+            best_page, best_hits = idx, hits
+    return best_page
+
+
+def _page_score(thumb, coordinates: Dict) -> float:
+    """
+    Похожесть миниатюры на лицевую сторону: в ROI фото — контрастное изображение,
+    в текстовых ROI — «чернила». На обороте/пустой странице оба сигнала слабые.
+    """
+    from PIL import ImageStat
+
+    w, h = thumb.size
+
+    def roi(coords):
+        l, t, r, b = int(coords[0] * w), int(coords[1] * h), int(coords[2] * w), int(coords[3] * h)
+        if r - l < 2 or b - t < 2:
+            return None
+        return thumb.crop((l, t, r, b))
+
+    photo_std = 0.0
+    if "photo" in coordinates:
+        region = roi(coordinates["photo"])
+        if region is not None:
+            photo_std = ImageStat.Stat(region).stddev[0]
+
+    ink = []
+    for field in ("last_name", "first_name", "iin"):
+        if field not in coordinates:
+            continue
+        region = roi(coordinates[field])
+        if region is not None:
+            hist = region.histogram()
+            ink.append(sum(hist[:128]) / max(1, sum(hist)))
+
+    return photo_std * (1.0 + sum(ink) / max(1, len(ink)))
+
+
+def locate_id_page(pdf_path: str, debug_info: Optional[Dict] = None) -> int:
     """
-    PDF -> JPG -> координатный OCR (только Фамилия, Имя, Отчество, ИИН).
+    Номер страницы (с 1) с лицевой стороной удостоверения.
+    Одна страница — сразу 1; иначе текстовый слой, затем миниатюры всех страниц.
+    Ошибка рендера миниатюр — тоже 1 (method "fallback" в debug_info).
     """
-    result = {'first_name': '', 'last_name': '', 'patronymic': '', 'iin': '', 'photo': None}
+    pages = _pdf_page_count(pdf_path)
+    if pages <= 1:
+        return 1
+
+    page = _locate_by_text(pdf_path)
+    method = "text"
+    if page is None:
+        from pdf2image import convert_from_path
+        from .jpg_parser import JPGCoordinateParser
+
+        method = "thumbnails"
+        try:
+            coordinates = JPGCoordinateParser().coordinates
+            thumbs = convert_from_path(pdf_path, dpi=LOCATOR_THUMB_DPI, grayscale=True)
+            scores = [_page_score(t, coordinates) for t in thumbs]
+            page = scores.index(max(scores)) + 1 if scores else 1
+        except Exception:
+            # поиск страницы — оптимизация: не смогли — разбираем первую
+            logger.exception("Page locator failed for %s, using page 1", pdf_path)
+            method, page = "fallback", 1
+
+    if debug_info is not None:
+        debug_info["page"] = {"selected": page, "pages": pages, "method": method}
+    return page
+
 
-    jpg_path = convert_pdf_to_jpg(pdf_path)
+def _empty_result(fields: Optional[Iterable[str]]) -> Dict:
+    from .jpg_parser import default_fields
+
+    fields = default_fields() if fields is None else fields
+    result = {f: ('' if f != 'photo' else None) for f in fields}
+    result['debug_info'] = {}
+    return result
+
+
+def extract_data_from_pdf(pdf_path: str, fields: Optional[Iterable[str]] = None) -> Dict:
+    """
+    PDF -> JPG -> координатный OCR запрошенных полей (None — DOCUMENTS_EXTRACT_FIELDS).
+    Для многостраничных PDF сначала дёшево ищется нужная страница (locate_id_page),
+    в полном DPI рендерится только она.
+    В debug_info["timings"] — длительности стадий в мс.
+    """
+    result = _empty_result(fields)
+
+    with span("locate", result['debug_info']):
+        page = locate_id_page(pdf_path, result['debug_info'])
+    with span("render", result['debug_info']):
+        jpg_path = convert_pdf_to_jpg(pdf_path, page=page)
     if not jpg_path:
         return result
 
     try:
         from .jpg_parser import extract_data_from_jpg_coordinates
-        coord_result = extract_data_from_jpg_coordinates(jpg_path)
+        with span("parse", result['debug_info']):
+            coord_result = extract_data_from_jpg_coordinates(jpg_path, fields)
         if coord_result:
             # оставим только нужные
-            for k in ('first_name', 'last_name', 'patronymic', 'iin', 'photo'):
-                result[k] = coord_result.get(k, result.get(k))
+            for k in result:
+                if k != 'debug_info':
+                    result[k] = coord_result.get(k, result[k])
+            timings = result['debug_info'].get('timings', {})
+            result['debug_info'].update(coord_result.get('debug_info', {}))
+            result['debug_info']['timings'] = {**coord_result.get('debug_info', {}).get('timings', {}), **timings}
     except Exception:
         logger.exception("extract_data_from_pdf: coordinate parser failed")
+    finally:
+        # Растр страницы — промежуточный файл: удаляем или отдаём документу как артефакт
+        name = storage_name(jpg_path) if keep_page_raster() else None
+        if name:
+            result['artifacts'] = {'page': name}
+        else:
+            discard_path(jpg_path)
 
     return result
 
 
-def extract_data_from_image(image_path: str) -> Dict:
-    from .jpg_parser import extract_data_from_jpg_coordinates
-    coord_result = extract_data_from_jpg_coordinates(image_path)
-    return {
-        'first_name': coord_result.get('first_name', ''),
-        'last_name': coord_result.get('last_name', ''),
-        'patronymic': coord_result.get('patronymic', ''),
-        'iin': coord_result.get('iin', '')
-    }
\ No newline at end of file
+def extract_data_from_image(image_path: str, fields: Optional[Iterable[str]] = None) -> Dict:
+    """
+    Фото/скан (JPEG/PNG) -> координатный OCR.
+    Декодирование с ограничением размера и поворотом по EXIF (см. imaging.py).
+    """
+    from .imaging import open_for_ocr, ImageRejected
+    from .jpg_parser import JPGCoordinateParser
+
+    result = _empty_result(fields)
+
+    try:
+        with span("decode", result['debug_info']):
+            image = open_for_ocr(image_path)
+    except ImageRejected as e:
+        result['debug_info'].setdefault('warnings', []).append(str(e))
+        return result
+
+    try:
+        with span("parse", result['debug_info']):
+            coord_result = JPGCoordinateParser().extract_data_from_image(image, result['debug_info'], fields)
+        for k in result:
+            if k != 'debug_info':
+                result[k] = coord_result.get(k, result[k])
+    except Exception:
+        logger.exception("extract_data_from_image: coordinate parser failed")
+
+    return result
@@ -3,80 +3,116 @@ from urllib.parse import quote
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import JsonResponse, HttpResponse
+from django.http import JsonResponse, HttpResponse, FileResponse, Http404
+from django.contrib.admin.views.decorators import staff_member_required
 from django.utils import timezone
 from django.utils.dateparse import parse_datetime
 from django.utils.text import slugify
 from django.views.decorators.csrf import csrf_exempt
 from datetime import datetime
 from django.conf import settings
-from weasyprint import HTML, CSS
-from weasyprint import default_url_fetcher
 from django.template.loader import get_template
 import os
+import logging
 from pathlib import Path
 from io import BytesIO
 
 from django.views.decorators.http import require_POST
 
+from account.api_auth import api_key_required
+
 from .models import Document
 from .forms import DocumentUploadForm
-from .utils import extract_data_from_pdf
+from .ingest import extract_for, apply_extracted
+from .metrics import render_prometheus, span
+from .admission import Overloaded, admission_controlled, admit, overloaded_response
+from .profiling import profile_request, list_captures, profile_dir
+from .uploads import streaming_upload
+from .quality import describe as describe_quality
+from .jpg_parser import TEXT_FIELDS, JPGCoordinateParser
+from .coordinates import changed_fields
+from .lifecycle import discard_failed, discard_path
+
+logger = logging.getLogger(__name__)
+
+def _requested_fields(request):
+    """
+    ?fields=iin,last_name (или POST fields) — распознать только эти поля.
+    Пусто — поля по умолчанию.
+    """
+    raw = request.POST.get('fields') or request.GET.get('fields')
+    if not raw:
+        return None
+    fields = [f.strip() for f in raw.split(',') if f.strip()]
+    return [f for f in fields if f in TEXT_FIELDS or f == 'photo'] or None
+
+
+def process_upload(form, fields=None):
+    """
+    Сохранение загрузки + OCR + сохранение результата (блокирующая часть
+    upload-view, общая для sync и async версий, см. async_views.py).
+    При ошибке документ и его файлы удаляются, исключение пробрасывается.
+    """
+    document = form.save()
+    try:
+        extracted = extract_for(document, fields)
+        changed = apply_extracted(document, extracted)
+
+        # только изменённые OCR колонки (исходный файл уже записан form.save())
+        with span("save", extracted.get('debug_info')):
+            if changed:
+                document.save(update_fields=changed)
+        logger.info("Документ %s: тайминги %s", document.pk, extracted.get('debug_info', {}).get('timings'))
+        return document, extracted
+    except Exception:
+        # не оставляем строку с файлами от необработанной загрузки
+        discard_failed(document)
+        raise
+
+
+def upload_result_redirect(request, document, extracted):
+    """Сообщения по результату распознавания и редирект на карточку."""
+    quality = extracted.get('debug_info', {}).get('quality')
+    if extracted.get('debug_info', {}).get('rejected'):
+        messages.error(
+            request,
+            f"Документ не распознан: {describe_quality(quality['reasons'])}. Загрузите более качественный скан."
+        )
+        return redirect('document_detail', pk=document.pk)
+    if quality and quality['reasons']:
+        messages.warning(request, f"Качество скана: {describe_quality(quality['reasons'])}")
+
+    # Сообщение
+    pretty_name = f"{document.first_name} {document.patronymic}".strip()
+    found = []
+    if document.last_name:  found.append(f"Фамилия: {document.last_name}")
+    if pretty_name:         found.append(f"Имя Отчество: {pretty_name}")
+    if document.iin:        found.append(f"ИИН: {document.iin}")
+    if document.photo:      found.append("Фото: ✓")
+
+    messages.success(request, "Документ обработан! " + (", ".join(found) if found else "Данных нет"))
+    return redirect('document_detail', pk=document.pk)
 
 
 @login_required
+@streaming_upload()
+@profile_request
 def upload_document(request):
     if request.method == 'POST':
         form = DocumentUploadForm(request.POST, request.FILES)
         if form.is_valid():
-            document = form.save(commit=False)
-            document.save()
-
             try:
-                pdf_path = document.pdf_file.path
-                print(f"Обрабатываем PDF: {pdf_path}")
-
-                extracted = extract_data_from_pdf(pdf_path)
-
-                # Записываем только нужное
-                document.last_name  = extracted.get('last_name', '')
-                document.first_name = extracted.get('first_name', '')
-                document.patronymic = extracted.get('patronymic', '')
-                document.iin        = extracted.get('iin', '')
-
-                # Сохраняем фото, если извлеклось
-                if extracted.get('photo'):
-                    document.photo = extracted['photo']
-
-                # Остальные поля чистим (НО фото НЕ трогаем)
-                document.birth_place     = ''
-                document.nationality     = ''
-                document.birth_date      = ''
-                document.issued_by       = ''
-                document.issue_date      = ''
-                document.expiry_date     = ''
-                document.document_number = ''
-                document.raw_text        = ''
-                document.jpg_file        = None
-
-                document.save()
-
-                # Сообщение
-                pretty_name = f"{document.first_name} {document.patronymic}".strip()
-                found = []
-                if document.last_name:  found.append(f"Фамилия: {document.last_name}")
-                if pretty_name:         found.append(f"Имя Отчество: {pretty_name}")
-                if document.iin:        found.append(f"ИИН: {document.iin}")
-                if document.photo:      found.append("Фото: ✓")
-
-                messages.success(request, "Документ обработан! " + (", ".join(found) if found else "Данных нет"))
-                return redirect('document_detail', pk=document.pk)
-
+                # слот OCR — только когда файл уже принят и проверен
+                with admit('upload'):
+                    document, extracted = process_upload(form)
+            except Overloaded as exc:
+                return overloaded_response(request, exc)
             except Exception as e:
                 messages.error(request, f'Ошибка при обработке документа: {str(e)}')
                 return redirect('upload_document')
+            return upload_result_redirect(request, document, extracted)
         else:
-            messages.error(request, 'Пожалуйста, исправьте ошибки в форме')
+            messages.error(request, upload_error(request) or 'Пожалуйста, исправьте ошибки в форме')
     else:
         form = DocumentUploadForm()
 
@@ -107,6 +143,7 @@ def document_detail(request, pk):
 
 
 @csrf_exempt
+@api_key_required(allow_session=True)
 def get_coordinates(request):
     try:
         import json, os
@@ -116,8 +153,8 @@ def get_coordinates(request):
         if os.path.exists(coords_file):
             with open(coords_file, 'r') as f:
                 raw = json.load(f)
-                # включаем photo
-                keys = {'last_name', 'first_name', 'patronymic', 'iin', 'photo'}
+                # все поля, которые читает парсер, + photo
+                keys = set(TEXT_FIELDS) | {'photo'}
                 coordinates = {k: v for k, v in raw.items() if k in keys}
         else:
             coordinates = {
@@ -141,10 +178,13 @@ def coordinate_admin(request):
 
 
 @csrf_exempt
+@api_key_required(allow_session=True)
 def save_coordinates(request):
     """
-    API для сохранения координат из калибровки
+    API для сохранения координат из калибровки (только staff, как предпросмотр)
     """
+    if not request.user.is_staff:
+        return JsonResponse({'success': False, 'error': 'Недостаточно прав'}, status=403)
     if request.method == 'POST':
         try:
             import json
@@ -157,10 +197,18 @@ def save_coordinates(request):
 
             coords_file = os.path.join(settings.BASE_DIR, 'coordinate_config.json')
 
+            # какие рамки сдвинулись: их поля у документов перечитает reocr_fields
+            previous = JPGCoordinateParser().coordinates
+
             with open(coords_file, 'w') as f:
                 json.dump(data, f, indent=2)
 
-            return JsonResponse({'success': True, 'message': 'Координаты сохранены'})
+            changed = changed_fields(previous, JPGCoordinateParser().coordinates)
+            return JsonResponse({
+                'success': True,
+                'message': 'Координаты сохранены',
+                'changed_fields': changed,
+            })
 
         except Exception as e:
             return JsonResponse({'success': False, 'error': str(e)})
@@ -168,52 +216,65 @@ def save_coordinates(request):
     return JsonResponse({'success': False, 'error': 'Только POST запросы'})
 
 
-@csrf_exempt
-def api_upload_document(request):
-    if request.method == 'POST' and request.FILES.get('pdf_file'):
-        try:
-            document = Document.objects.create(pdf_file=request.FILES['pdf_file'])
-
-            pdf_path = document.pdf_file.path
-            extracted = extract_data_from_pdf(pdf_path)
+def api_upload_form(request):
+    """
+    Форма для API-загрузки (разбор multipart — блокирующий).
+    None — в запросе нет файла.
+    """
+    # pdf_file — старое имя поля; file — PDF или JPG/PNG
+    upload = request.FILES.get('pdf_file') or request.FILES.get('file')
+    if request.method != 'POST' or not upload:
+        return None
+    return DocumentUploadForm(data={}, files={'file': upload})
+
+
+def api_upload_payload(document, extracted):
+    """Тело JSON-ответа API-загрузки."""
+    quality = extracted.get('debug_info', {}).get('quality')
+    return {
+        'success': not extracted.get('debug_info', {}).get('rejected', False),
+        'document_id': document.pk,
+        'quality': {
+            'reasons': quality['reasons'],
+            'message': describe_quality(quality['reasons']),
+            'metrics': quality['metrics'],
+        } if quality else None,
+        'data': {
+            **{f: getattr(document, f) for f in TEXT_FIELDS if f in extracted},
+            'photo_url': document.photo.url if document.photo else None,
+            'photo_thumb_url': document.photo_thumb_url,
+        }
+    }
 
-            document.last_name  = extracted.get('last_name', '')
-            document.first_name = extracted.get('first_name', '')
-            document.patronymic = extracted.get('patronymic', '')
-            document.iin        = extracted.get('iin', '')
 
-            # Сохраняем фото, если есть
-            if extracted.get('photo'):
-                document.photo = extracted['photo']
+def upload_error(request):
+    """Причина, по которой DocumentUploadHandler отклонил файл ещё в потоке (или None)."""
+    return getattr(request, 'upload_rejected', None)
 
-            # Чистим остальное (фото НЕ трогаем)
-            document.birth_place     = ''
-            document.nationality     = ''
-            document.birth_date      = ''
-            document.issued_by       = ''
-            document.issue_date      = ''
-            document.expiry_date     = ''
-            document.document_number = ''
-            document.raw_text        = ''
-            document.jpg_file        = None
 
-            document.save()
+def form_error(form):
+    return {'success': False, 'error': '; '.join(form.errors.get('file', []))}
 
-            return JsonResponse({
-                'success': True,
-                'document_id': document.pk,
-                'data': {
-                    'last_name': document.last_name,
-                    'first_name': document.first_name,
-                    'patronymic': document.patronymic,
-                    'iin': document.iin,
-                    'photo_url': document.photo.url if document.photo else None
-                }
-            })
-        except Exception as e:
-            return JsonResponse({'success': False, 'error': str(e)})
 
-    return JsonResponse({'success': False, 'error': 'Неправильный запрос'})
+@csrf_exempt
+@api_key_required
+@streaming_upload(csrf=False)
+@profile_request
+def api_upload_document(request):
+    form = api_upload_form(request)
+    if form is None:
+        return JsonResponse({'success': False, 'error': upload_error(request) or 'Неправильный запрос'})
+    if not form.is_valid():
+        return JsonResponse(form_error(form))
+    fields = _requested_fields(request)
+    try:
+        with admit('api_upload'):
+            document, extracted = process_upload(form, fields)
+    except Overloaded as exc:
+        return overloaded_response(request, exc)
+    except Exception as e:
+        return JsonResponse({'success': False, 'error': str(e)})
+    return JsonResponse(api_upload_payload(document, extracted))
 
 @login_required
 def coordinate_calibration(request):
@@ -223,6 +284,38 @@ def coordinate_calibration(request):
     return render(request, 'documents/coordinate_calibration.html')
 
 
+@staff_member_required
+@require_POST
+@admission_controlled('calibration_preview')
+def calibration_preview(request):
+    """
+    Предпросмотр рамки при калибровке: OCR одного поля на странице
+    документа-образца (страница кэшируется, см. preview.py).
+    Тело JSON: {"document_id": 1, "field": "patronymic", "box": [l, t, r, b]} (доли кадра).
+    """
+    import json
+    from .preview import preview_field
+
+    try:
+        data = json.loads(request.body)
+        field = data['field']
+        box = [float(v) for v in data['box']]
+        document_id = int(data['document_id'])
+        if len(box) != 4:
+            raise ValueError(box)
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse({'success': False, 'error': 'Нужны document_id, field и box из 4 чисел'}, status=400)
+    if field not in TEXT_FIELDS and field != 'photo':
+        return JsonResponse({'success': False, 'error': f'Неизвестное поле {field}'}, status=400)
+
+    document = Document.objects.filter(pk=document_id).first()
+    if document is None:
+        return JsonResponse({'success': False, 'error': 'Документ не найден'}, status=404)
+
+    result = preview_field(document, field, box, JPGCoordinateParser())
+    return JsonResponse(result, status=200 if result['success'] else 422)
+
+
 @login_required
 def test_jpg_parsing(request):
     """
@@ -235,16 +328,17 @@ def test_jpg_parsing(request):
             # Сохраняем временно
             import tempfile
             with tempfile.NamedTemporaryFile(delete=False, suffix='.jpg') as tmp:
+                tmp_path = tmp.name
                 for chunk in jpg_file.chunks():
                     tmp.write(chunk)
-                tmp_path = tmp.name
-
-            # Тестируем парсинг
-            from .jpg_parser import extract_data_from_jpg_coordinates
-            result = extract_data_from_jpg_coordinates(tmp_path)
 
-            # Удаляем временный файл
-            os.unlink(tmp_path)
+            try:
+                # Тестируем парсинг
+                from .jpg_parser import extract_data_from_jpg_coordinates
+                result = extract_data_from_jpg_coordinates(tmp_path)
+            finally:
+                # Удаляем временный файл (и при ошибке парсинга)
+                discard_path(tmp_path)
 
             return render(request, 'documents/test_jpg.html', {
                 'result': result,
@@ -281,7 +375,7 @@ def set_test_date(request, pk):
         dt = timezone.make_aware(dt, timezone.get_current_timezone())
 
     document.test_date = dt
-    document.save(update_fields=['test_date'])
+    document.save(update_fields=['test_date', 'updated_at'])
     messages.success(request, 'Дата тестирования обновлена.')
     return redirect('document_detail', pk=pk)
 
@@ -312,12 +406,22 @@ def weasy_url_fetcher(url: str):
         return {"file_obj": open(abs_path, "rb")}
 
     # относительные URL (без / в начале) будут резолвиться через base_url
+    from weasyprint import default_url_fetcher
     return default_url_fetcher(url)
 
 
 @login_required
+@admission_controlled('export_pdf')
+@profile_request
 def document_export_pdf(request, pk):
     document = get_object_or_404(Document, pk=pk)
+    return export_pdf_response(request, document)
+
+
+def export_pdf_response(request, document):
+    """Рендер карточки участника в PDF (блокирующая часть экспорта)."""
+    # WeasyPrint/Pango грузятся только при первом экспорте (или в prewarm)
+    from weasyprint import HTML, CSS
 
     # 1) контекст с данными
     context = {
@@ -341,10 +445,11 @@ def document_export_pdf(request, pk):
 
     # 5) генерация PDF
     pdf_io = BytesIO()
-    HTML(string=html_string, base_url=base_url, url_fetcher=weasy_url_fetcher).write_pdf(
-        pdf_io,
-        stylesheets=[extra_css],
-    )
+    with span("export_pdf"):
+        HTML(string=html_string, base_url=base_url, url_fetcher=weasy_url_fetcher).write_pdf(
+            pdf_io,
+            stylesheets=[extra_css],
+        )
 
     pdf_io.seek(0)
     # === Формируем название файла ===
@@ -371,6 +476,34 @@ def document_export_pdf(request, pk):
 
     return resp
 
+def metrics(request):
+    """
+    Метрики процесса в формате Prometheus.
+    Доступ: адреса из METRICS_ALLOWED_IPS (по умолчанию localhost) или staff.
+    """
+    allowed = getattr(settings, 'METRICS_ALLOWED_IPS', ('127.0.0.1', '::1'))
+    if request.META.get('REMOTE_ADDR') not in allowed and not request.user.is_staff:
+        return HttpResponse(status=403)
+    return HttpResponse(render_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+@staff_member_required
+def profile_list(request):
+    """
+    Последние снимки профилировщика
+    """
+    return render(request, 'documents/profile_list.html', {'captures': list_captures()})
+
+
+@staff_member_required
+def profile_download(request, name):
+    directory = profile_dir()
+    path = os.path.join(directory, os.path.basename(name))
+    if not name.endswith(('.prof', '.html', '.json')) or not os.path.isfile(path):
+        raise Http404
+    return FileResponse(open(path, 'rb'), as_attachment=True, filename=os.path.basename(path))
+
+
 def home(request):
     """
     Главная страница
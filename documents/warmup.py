@@ -0,0 +1,89 @@
+# warmup.py
+"""
+Прогрев воркера до прихода трафика.
+
+Тяжёлые зависимости (WeasyPrint, pdf2image, pytesseract, плагины PIL)
+импортируются лениво — по месту использования. prewarm() загружает их
+заранее и прогоняет по одному «холостому» вызову, чтобы первый реальный
+запрос не платил за холодный старт:
+
+- с gunicorn --preload: DOCUMENTS_PREWARM = True в settings — прогрев
+  выполнится в AppConfig.ready() мастер-процесса до fork();
+- вручную: ``python manage.py prewarm`` (печатает тайминги по шагам).
+"""
+import io
+import logging
+import os
+import time
+from typing import Dict
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+def _timed(timings: Dict[str, float], name: str, fn):
+    t0 = time.perf_counter()
+    try:
+        fn()
+    except Exception as e:
+        logger.warning("prewarm %s failed: %s", name, e)
+    timings[name] = round((time.perf_counter() - t0) * 1000.0, 2)
+
+
+def _import_pil():
+    from PIL import Image
+    Image.init()  # все плагины форматов сразу, а не при первом Image.open
+
+
+def _import_pdf2image():
+    import pdf2image  # noqa: F401
+
+
+def _warm_tesseract():
+    """
+    pytesseract запускает tesseract отдельным процессом, поэтому «держать»
+    модель в памяти воркера нельзя. Холостой вызов с нужными языками
+    поднимает traineddata в page cache ОС — последующие вызовы не ходят на диск.
+    """
+    import pytesseract
+    from PIL import Image
+
+    from .jpg_parser import JPGCoordinateParser
+
+    parser = JPGCoordinateParser()
+    blank = Image.new("L", (64, 24), 255)
+    pytesseract.image_to_string(blank, lang=parser.lang_text + "+eng", config="--oem 1 --psm 7")
+    pytesseract.image_to_string(blank, lang=parser.lang_digits, config="--oem 1 --psm 7")
+
+
+def _load_name_lexicon():
+    """Индекс имён (lexicon.py) — до fork(), чтобы воркеры делили страницы памяти."""
+    from .lexicon import get_lexicon
+    get_lexicon()
+
+
+def _warm_weasyprint():
+    """Импорт WeasyPrint/Pango + рендер крошечного HTML со шрифтами проекта (fontconfig-кэш)."""
+    from weasyprint import CSS, HTML
+
+    fonts_dir = os.path.join(settings.BASE_DIR, "static", "fonts")
+    css = CSS(string=f"""
+        @font-face {{ font-family: 'Helvetica Neue'; src: url('file://{fonts_dir}/HelveticaNeue-Roman.otf'); }}
+        body {{ font-family: 'Helvetica Neue', 'DejaVu Sans', sans-serif; }}
+    """)
+    HTML(string="<p>Прогрев ӘҒҚҢӨҰҮІ</p>").write_pdf(io.BytesIO(), stylesheets=[css])
+
+
+def prewarm(ocr: bool = True, pdf_export: bool = True) -> Dict[str, float]:
+    """Возвращает длительность каждого шага в мс."""
+    timings: Dict[str, float] = {}
+    _timed(timings, "import_pil", _import_pil)
+    _timed(timings, "import_pdf2image", _import_pdf2image)
+    if ocr:
+        _timed(timings, "tesseract", _warm_tesseract)
+        _timed(timings, "name_lexicon", _load_name_lexicon)
+    if pdf_export:
+        _timed(timings, "weasyprint", _warm_weasyprint)
+    logger.info("prewarm: %s", timings)
+    return timings